@@ -1,10 +1,11 @@
-from typing import Optional
+from typing import Optional, Literal
 
 from fastapi import APIRouter, Request, File, UploadFile
 
-from app.models.file_conversion import ConvertType
-from app.models.request_model import FileModelRequest
+from app.services.batch_convert import handle_batch_operation
 from app.services.file_manager import parse_file_request, handle_file_operation
+from app.services.text_extract import handle_extract_operation
+from app.utils.func_map import converter_registry
 from app.utils.logger import get_logger
 
 router = APIRouter()
@@ -22,16 +23,24 @@ async def download_file(request: Request, file: Optional[UploadFile] = File(None
     response = await handle_file_operation(request, file=file, mode="download")
     return response
 
+@router.get("/convert_types")
+async def convert_types():
+    return converter_registry.describe()
+
 @router.post("/convert_file/{convert_type}")
-async def docx2html(request: Request, convert_type: ConvertType = ConvertType.pdf2docx, file: Optional[UploadFile] = File(None)):
+async def docx2html(request: Request, convert_type: str = "pdf2docx", file: Optional[UploadFile] = File(None)):
     request = await parse_file_request(request)
     response = await handle_file_operation(request, file=file, mode="convert", convert_type=convert_type.lower())
     return response
 
+@router.post("/convert_batch/{convert_type}")
+async def convert_batch(request: Request, convert_type: str, output: Literal["ndjson", "zip"] = "ndjson"):
+    response = await handle_batch_operation(request, convert_type, output)
+    return response
+
 @router.post("/extract_text")
-async def extract_text(request: FileModelRequest, file: Optional[UploadFile] = File(None)):
-    request = await parse_file_request(request)
-    response = await handle_file_operation(request, file=file, mode="extract")
+async def extract_text(request: Request, file: Optional[UploadFile] = File(None)):
+    response = await handle_extract_operation(request, file)
     return response
 
 
@@ -0,0 +1,34 @@
+import traceback
+from typing import Optional
+
+from fastapi import APIRouter, Request, File, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.models.response_model import FileModelResponse
+from app.services.file_manager import parse_file_request
+from app.services.job_manager import job_manager
+from app.utils.exception import file_exception
+from app.utils.logger import get_logger
+
+router = APIRouter()
+logger = get_logger()
+
+@router.post("/convert")
+async def submit_convert_job(request: Request, convert_type: str, file: Optional[UploadFile] = File(None)):
+    try:
+        request = await parse_file_request(request)
+        job = await job_manager.submit(request, file, convert_type)
+        return JSONResponse(status_code=202, content=job.public())
+    except Exception as e:
+        code, status, msg = file_exception(e)
+        logger.error(traceback.format_exc())
+        content = FileModelResponse(code=code, messages=msg).model_dump()
+        return JSONResponse(status_code=status, content=content)
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        content = FileModelResponse(code=-1, messages=f"Job not found: {job_id}").model_dump()
+        return JSONResponse(status_code=404, content=content)
+    return job.public()
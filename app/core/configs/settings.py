@@ -1,4 +1,4 @@
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 from pydantic import field_validator, BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -52,9 +52,95 @@ class Settings(BaseSettings):
 
     # 数据库
     database_url: str
+    # 异步转换任务 (/jobs), 状态保存在 database_url 指向的数据库
+    job_workers: int = 2
+    job_retention_seconds: float = 7 * 24 * 3600  # 已结束任务及其输入/输出文件的保留时长, 0 表示不清理
+    job_result_inline_max: int = 64 * 1024  # 任务结果中 file_raw/file_base64 超过该长度时不入库
 
     static_root: str
     static_url: str
+    # 上传文件分块落盘的块大小
+    upload_chunk_size: int = 1024 * 1024
+    # 流式响应与 base64 编码的分块大小
+    stream_chunk_size: int = 1024 * 1024
+    # 非 UTF-8 文本只取前缀做编码检测
+    charset_detect_bytes: int = 64 * 1024
+
+    # 共享 HTTP 客户端 (file_url 下载)
+    http_http2: bool = True
+    http_timeout: float = 10.0
+    http_max_connections: int = 100
+    http_max_keepalive: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_per_host_limit: int = 10  # 单个远端主机的并发连接上限
+    download_max_bytes: int = 512 * 1024 * 1024
+    download_chunk_size: int = 1024 * 1024
+    # 远程文件下载缓存 (static_root/cache/downloads) 的总大小上限与过期时间 (秒, 0 表示不过期)
+    download_cache_bytes: int = 2 * 1024 * 1024 * 1024
+    download_cache_ttl: float = 24 * 3600
+
+    # 转换执行器: process 用进程池承载 CPU 密集引擎, thread 仅用线程池
+    convert_executor: str = "process"
+    convert_max_workers: int = 0  # 0 表示使用全部 CPU 核心
+    convert_mp_context: str = "spawn"
+    # 排队 + 执行中的转换任务上限, 超过后直接拒绝 (503)
+    convert_max_queue: int = 64
+    # 单个转换类型的并发上限, 如 {"pdf2docx": 2}; 未配置的类型使用默认值
+    convert_default_concurrency: int = 4
+    convert_concurrency_limits: Dict[str, int] = {}
+    # 启动时预热的转换引擎 (见 app/services/engines.py), 其余引擎在首次使用时导入
+    engine_preload: List[str] = []
+    # 复用的引擎实例的配置, 创建时固定 (见 engines.engine_factories): MarkItDown 是否启用第三方插件, MarkdownIt 的预设
+    markitdown_enable_plugins: bool = False
+    markdown_it_preset: str = "commonmark"
+    # pdf2docx 按页分块并行: 页数超过 pdf_chunk_pages 时拆块交给工作进程解析, 再按页序合并;
+    # pdf_parallel_workers 为单个文档同时解析的块数上限, 0 表示与 convert_max_workers 相同, 1 表示关闭
+    pdf_chunk_pages: int = 20
+    pdf_parallel_workers: int = 0
+    # /convert_batch 中同时处理的文件数上限
+    batch_concurrency: int = 8
+    # HTML 中 base64 图片的解码/哈希线程数; image_max_dimension > 0 时长边超过该值的图片等比缩小 (需要 Pillow)
+    image_workers: int = 4
+    image_max_dimension: int = 0
+    # format_html 的实现: bs4 (html.parser) 或 lxml (输出与 bs4 一致, 见 app/utils/html_lxml.py)
+    html_processor: str = "bs4"
+    # /extract_text: 分块的字符数范围 (即 split_texts 的 min_tokens/max_tokens, 请求 extra 中可覆盖), pdf 每批提取的页数
+    extract_min_tokens: int = 100
+    extract_max_tokens: int = 500
+    extract_pdf_batch_pages: int = 8
+
+    # 日志: text 或 json (每行一个 JSON 对象); enqueue 时由后台线程写出; diagnose 在异常回溯中打印局部变量 (仅调试时开启);
+    # 过长字段 (base64/raw) 截断到 log_max_field_chars; 每个请求的 info 日志按 log_request_sample_rate 采样 (1 为全部记录)
+    log_format: str = "text"
+    log_enqueue: bool = True
+    log_diagnose: bool = False
+    log_max_field_chars: int = 200
+    log_request_sample_rate: float = 1.0
+    # /status 的后台采样: 间隔 (秒), 环形缓冲区保留的采样点数; 只有安装了 GPUtil 且存在 nvidia-smi 时才探测 GPU
+    status_sample_interval: float = 2.0
+    status_history_size: int = 300
+    status_gpu_enabled: bool = True
+    # 在响应中附加 Server-Timing 头 (各阶段耗时, 见 app/utils/metrics.py); 指标本身始终在 /metrics 输出
+    server_timing_enabled: bool = True
+
+    # LibreOffice 常驻实例池 (docx2pdf), soffice_pool_size=0 时每次请求冷启动 soffice
+    soffice_path: str = "libreoffice"
+    soffice_pool_size: int = 2
+    soffice_base_port: int = 2002
+    soffice_profile_root: str = "/tmp/docflow_soffice"
+    soffice_max_jobs: int = 200  # 每个实例转换多少次后回收重启
+    soffice_timeout: float = 120
+    soffice_startup_timeout: float = 30
+    soffice_health_interval: float = 30
+    # 外部转换客户端命令模板, 为空时使用 python-uno
+    soffice_convert_cmd: List[str] = []
+
+    # 转换结果缓存: 内存 LRU + 磁盘层 (默认位于 static_root/cache/conversions)
+    conversion_cache_enabled: bool = True
+    conversion_cache_memory_bytes: int = 256 * 1024 * 1024
+    conversion_cache_disk_bytes: int = 2 * 1024 * 1024 * 1024
+    conversion_cache_ttl: float = 7 * 24 * 3600  # 秒, 0 表示不过期
+    conversion_cache_dir: str = ""
 
     @field_validator("cors_origins", mode="before")
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> List[str]:
@@ -3,6 +3,12 @@ from datetime import datetime
 
 from fastapi import FastAPI
 
+from app.services.conversion_cache import conversion_cache
+from app.services.conversion_executor import conversion_executor
+from app.services.job_manager import job_manager
+from app.services.soffice_pool import soffice_pool
+from app.services.status_sampler import status_sampler
+from app.utils.http_client import init_http_client, close_http_client
 from app.utils.logger import setup_logger, get_logger
 
 
@@ -11,6 +17,12 @@ async def lifespan(_: FastAPI):
     setup_logger("console")
     logger = get_logger()
     logger.info("Successfully mounted clients: WeChat MP and Feishu Robot")  # 合并日志
+    conversion_executor.start()
+    await conversion_cache.load_index()
+    await soffice_pool.start()
+    init_http_client()
+    await job_manager.start()
+    await status_sampler.start()
     # 记录启动时间
     start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     logger.info(f"Application started at {start_time}")
@@ -21,6 +33,11 @@ async def lifespan(_: FastAPI):
     finally:
         logger.warning("Application shutting down, starting cleanup...")
         # 关闭客户端（关闭阶段）
+        await status_sampler.stop()
+        await job_manager.stop()
+        conversion_executor.shutdown()
+        await soffice_pool.stop()
+        await close_http_client()
         logger.info("All clients closed successfully: WeChat MP and Feishu Robot")  # 合并日志
         # 记录关闭时间并清理日志
         end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,156 @@
+import asyncio
+import abc
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.models.job_model import JobModel
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class JobStore(abc.ABC):
+    """异步任务持久化接口; 内存实现仅用于未配置数据库时, 重启后任务会丢失"""
+
+    async def init(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def save(self, job: JobModel) -> None:
+        """保存整个任务 (提交、完成、失败时)"""
+
+    @abc.abstractmethod
+    async def update_progress(self, job: JobModel) -> None:
+        """执行过程中只更新 status/progress/stage"""
+
+    @abc.abstractmethod
+    async def get(self, job_id: str) -> Optional[JobModel]:
+        pass
+
+    @abc.abstractmethod
+    async def list_unfinished(self) -> List[JobModel]:
+        pass
+
+    @abc.abstractmethod
+    async def purge(self, before: float) -> List[JobModel]:
+        """删除 updated_at 早于 before 的已结束任务, 返回被删除的任务 (用于清理输出文件)"""
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs: Dict[str, JobModel] = {}
+
+    async def save(self, job: JobModel) -> None:
+        self._jobs[job.job_id] = job.model_copy()
+
+    async def get(self, job_id: str) -> Optional[JobModel]:
+        job = self._jobs.get(job_id)
+        return job.model_copy() if job else None
+
+    async def update_progress(self, job: JobModel) -> None:
+        await self.save(job)
+
+    async def list_unfinished(self) -> List[JobModel]:
+        return [job.model_copy() for job in self._jobs.values() if job.status in ("queued", "running")]
+
+    async def purge(self, before: float) -> List[JobModel]:
+        expired = [job for job in self._jobs.values() if job.status in ("done", "failed") and job.updated_at < before]
+        for job in expired:
+            self._jobs.pop(job.job_id, None)
+        return expired
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite 持久化: 每个任务一行, 整个 JobModel 以 JSON 保存; 执行中的进度单独成列, 只更新这几列.
+    读写放到线程中执行, 不阻塞事件循环"""
+
+    _columns = "data, status, progress, stage, updated_at"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _execute(self, sql: str, args: tuple = ()) -> list:
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+            self._conn.commit()
+            return rows
+
+    async def init(self) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        await asyncio.to_thread(self._execute, "CREATE TABLE IF NOT EXISTS jobs ("
+                                               "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, "
+                                               "created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+                                               "progress REAL NOT NULL DEFAULT 0, stage TEXT NOT NULL DEFAULT '')")
+        # 旧版本建的表没有进度列
+        columns = {row[1] for row in await asyncio.to_thread(self._execute, "PRAGMA table_info(jobs)")}
+        for column, definition in (("progress", "REAL NOT NULL DEFAULT 0"), ("stage", "TEXT NOT NULL DEFAULT ''")):
+            if column not in columns:
+                await asyncio.to_thread(self._execute, f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        await asyncio.to_thread(self._execute, "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        logger.info(f"SQLite job store initialized: {self.path}")
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def save(self, job: JobModel) -> None:
+        job.updated_at = time.time()
+        await asyncio.to_thread(self._execute, "INSERT OR REPLACE INTO jobs "
+                                               "(job_id, status, data, created_at, updated_at, progress, stage) "
+                                               "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (job.job_id, job.status, job.model_dump_json(), job.created_at, job.updated_at,
+                                 job.progress, job.stage))
+
+    async def update_progress(self, job: JobModel) -> None:
+        job.updated_at = time.time()
+        await asyncio.to_thread(self._execute, "UPDATE jobs SET status = ?, progress = ?, stage = ?, updated_at = ? "
+                                               "WHERE job_id = ?",
+                                (job.status, job.progress, job.stage, job.updated_at, job.job_id))
+
+    @staticmethod
+    def _load(row: tuple) -> JobModel:
+        # 进度列比 data 中的 JSON 新
+        data, status, progress, stage, updated_at = row
+        return JobModel.model_validate_json(data).model_copy(
+            update={"status": status, "progress": progress, "stage": stage, "updated_at": updated_at})
+
+    async def get(self, job_id: str) -> Optional[JobModel]:
+        rows = await asyncio.to_thread(self._execute, f"SELECT {self._columns} FROM jobs WHERE job_id = ?", (job_id,))
+        return self._load(rows[0]) if rows else None
+
+    async def list_unfinished(self) -> List[JobModel]:
+        rows = await asyncio.to_thread(self._execute, f"SELECT {self._columns} FROM jobs "
+                                                      "WHERE status IN ('queued', 'running') ORDER BY created_at")
+        return [self._load(row) for row in rows]
+
+    def _purge(self, before: float) -> list:
+        where = "WHERE status IN ('done', 'failed') AND updated_at < ?"
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {self._columns} FROM jobs {where}", (before,)).fetchall()
+            self._conn.execute(f"DELETE FROM jobs {where}", (before,))
+            self._conn.commit()
+        return rows
+
+    async def purge(self, before: float) -> List[JobModel]:
+        rows = await asyncio.to_thread(self._purge, before)
+        return [self._load(row) for row in rows]
+
+
+def create_job_store(database_url: str) -> JobStore:
+    """按 database_url 选择持久化后端, 目前支持 sqlite:///path; 其他地址退回内存存储"""
+    if database_url.startswith("sqlite:///"):
+        return SQLiteJobStore(database_url[len("sqlite:///"):])
+    logger.warning(f"Unsupported job store url '{database_url.split('://')[0]}://...', jobs will be kept in memory only.")
+    return MemoryJobStore()
@@ -2,7 +2,7 @@ import json
 from datetime import datetime
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, Path, Depends, Request
+from fastapi import FastAPI, HTTPException, Path, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response, JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
@@ -12,7 +12,12 @@ from app.core.configs.settings import settings
 from app.core.lifespan import lifespan
 from app.dependencies.auth_dependencies import bearer_auth_dependency
 from app.middlewares.log_middleware import log_request_middleware
-from app.utils.status import get_system_status
+from app.middlewares.metrics_middleware import metrics_middleware
+from app.services.conversion_cache import conversion_cache
+from app.services.conversion_executor import conversion_executor
+from app.services.job_manager import job_manager
+from app.services.status_sampler import status_sampler
+from app.utils.metrics import CONTENT_TYPE, Gauge, collectors, render_metrics
 
 
 def create_app() -> FastAPI:
@@ -20,6 +25,7 @@ def create_app() -> FastAPI:
         openapi_url=f"{settings.api_prefix_v1}/openapi.json", docs_url="/docs", redoc_url="/redoc", lifespan=lifespan)
     init_app.add_middleware(CORSMiddleware, allow_origins=settings.cors_origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])  # 设置CORS
     init_app.middleware("http")(log_request_middleware)
+    init_app.middleware("http")(metrics_middleware)
     init_app.mount("/static/public", StaticFiles(directory="app/static/public"), name="public-static")
     init_app.mount("/static/temp", StaticFiles(directory="app/static/temp"), name="temp-static")
     # 添加请求日志中间件 - 简化版，不读取请求体
@@ -64,12 +70,41 @@ async def health():
     return JSONResponse(content=health_data, status_code=200)
 
 @app.get("/status")
-def fetch_system_status():
-    """获取电脑运行状态"""
-    status_data = get_system_status()
+async def fetch_system_status():
+    """获取电脑运行状态 (后台采样的最近一次快照)"""
+    status_data = status_sampler.latest() or await status_sampler.sample()
     status_json = json.dumps(status_data, indent=4, ensure_ascii=False)
     return Response(content=status_json, media_type="application/json")
 
+@app.get("/status/history")
+async def fetch_status_history(limit: int = Query(0, ge=0)):
+    """最近的状态时间序列, limit=0 返回缓冲区中的全部采样点"""
+    history_data = {"interval": status_sampler.interval, "samples": status_sampler.history(limit)}
+    return JSONResponse(content=history_data, status_code=200)
+
+executor_gauge = Gauge("docflow_conversion_executor", "Conversion executor counters and queue depth.", ("field",))
+executor_type_gauge = Gauge("docflow_conversion_executor_tasks", "Conversion tasks per convert type.", ("convert_type", "state"))
+cache_gauge = Gauge("docflow_conversion_cache", "Conversion cache counters and sizes.", ("field",))
+jobs_gauge = Gauge("docflow_jobs", "Async job queue.", ("field",))
+
+def collect_component_stats() -> None:
+    executor_stats = conversion_executor.stats()
+    for field in ("pending", "submitted", "completed", "failed", "rejected"):
+        executor_gauge.set(executor_stats[field], field=field)
+    for convert_type, counts in executor_stats["per_type"].items():
+        for state in ("waiting", "running"):
+            executor_type_gauge.set(counts[state], convert_type=convert_type, state=state)
+    for field, value in conversion_cache.stats().items():
+        cache_gauge.set(float(value), field=field)
+    jobs_gauge.set(job_manager.stats()["queued"], field="queued")
+
+collectors.append(collect_component_stats)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指标"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
 @app.get("/monitor")
 async def monitor_system_status():
     """获取电脑运行状态"""
@@ -1,20 +1,24 @@
-from datetime import datetime
+import random
+import uuid
 
 from fastapi import Request
 
-from app.utils.logger import get_logger
+from app.core.configs.settings import settings
+from app.utils.logger import bind_request, get_logger
 
 logger = get_logger()
 
 async def log_request_middleware(request: Request, call_next):
-    """仅记录请求路径的简化中间件"""
-    request_id = datetime.now().timestamp()  # 使用datetime获取时间戳
+    """仅记录请求路径的简化中间件; 生成 request_id (或沿用请求头 X-Request-ID) 并按采样率决定是否记录该请求的 info 日志"""
+    request_id = request.headers.get("x-request-id", "")[:64] or uuid.uuid4().hex[:16]
+    bind_request(request_id, random.random() < settings.log_request_sample_rate)
     path = request.url.path
     method = request.method
     # 只记录基本信息
-    logger.info(f"[{request_id}] {method} {path}")
+    logger.info(f"{method} {path}")
     # 直接转发到下一个处理器
     response = await call_next(request)
     # 记录响应状态
-    logger.info(f"[{request_id}] Response: {response.status_code}")
-    return response
\ No newline at end of file
+    logger.info(f"Response: {response.status_code}")
+    response.headers["X-Request-ID"] = request_id
+    return response
@@ -0,0 +1,23 @@
+import time
+
+from fastapi import Request
+
+from app.core.configs.settings import settings
+from app.utils.metrics import REQUEST_SECONDS, server_timing_header, start_request_timings
+
+
+async def metrics_middleware(request: Request, call_next):
+    """记录请求耗时, 并把本次请求各阶段的耗时 (见 metrics.stage) 写入 Server-Timing 响应头"""
+    timings = start_request_timings()
+    start_time, status = time.perf_counter(), 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start_time
+        # 按路由模板而不是实际路径聚合, 避免 /jobs/{job_id} 之类的路径产生无限多的标签值
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(elapsed, method=request.method, route=getattr(route, "path", "unmatched"), status=status)
+    if settings.server_timing_enabled:
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
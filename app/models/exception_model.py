@@ -7,3 +7,32 @@ class SigIntException(ShutdownSignalException):
 
 class SigTermException(ShutdownSignalException):
     pass
+
+# DocFlow 业务异常: status 为返回的 HTTP 状态码, file_exception 直接按类型映射, 不需要检查调用栈.
+# 同时继承对应的内置异常 (ValueError/TimeoutError/RuntimeError), 已有的 except 分支不受影响.
+class DocFlowError(Exception):
+    status = 500
+
+class InputError(DocFlowError, ValueError):
+    """请求或输入文件不合法 (参数错误、扩展名不匹配、超过大小限制等)"""
+    status = 400
+
+class UnsupportedTypeError(InputError):
+    """不支持的转换类型或文件类型"""
+    status = 415
+
+class UpstreamFetchError(DocFlowError):
+    """file_url 下载失败 (远端返回错误状态或连接失败)"""
+    status = 502
+
+class ConverterTimeoutError(DocFlowError, TimeoutError):
+    """转换器执行超时"""
+    status = 504
+
+class ConverterCrashError(DocFlowError, RuntimeError):
+    """转换器异常退出 (工作进程崩溃、外部命令失败)"""
+    status = 500
+
+class ConversionQueueFullError(DocFlowError):
+    """转换队列已满, 拒绝新的转换任务"""
+    status = 503
@@ -1,8 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from enum import Enum
-from typing import Union, Optional, TextIO, BinaryIO, Literal
+from typing import Union, Optional, TextIO, BinaryIO, Literal, List
 
 from pydantic import BaseModel
 
@@ -19,6 +18,7 @@ class FileDataModel(BaseModel):
         return not any([self.file_name, self.file_base64, self.file_raw, self.file_url, self.file_path])
 
 Policy = Literal["remove", "url", "path", "base64"]
+SheetSelector = Union[str, int]
 
 @dataclass
 class ConvertExtraParams:
@@ -26,43 +26,31 @@ class ConvertExtraParams:
     policy: Policy = "url"
     category: str = "knowledgebase"
     name: str = "AI"
+    # 表格读取范围 (含义与 pandas.read_excel 的同名参数一致), 未选中的工作表与超出 nrows 的行不会被解析
+    sheets: Optional[Union[SheetSelector, List[SheetSelector]]] = None  # 工作表名或从 0 开始的序号, 字符串可用逗号分隔
+    usecols: Optional[Union[str, List[SheetSelector]]] = None  # Excel 列范围 "A:C,E", 或列名/列序号列表
+    nrows: Optional[int] = None  # 每个表最多读取的数据行数
+    skiprows: Optional[int] = None  # 表头之前跳过的行数
+    header_row: Optional[int] = 0  # 跳过 skiprows 之后表头所在的行, None 表示没有表头
+    steps: Optional[List[str]] = None  # 多阶段转换的各阶段转换类型, 如 ["xlsx2html", "html2pdf-v2"], 不指定时按最短路径规划
+
+    def table_options(self) -> dict:
+        return {"sheets": self.sheets, "usecols": self.usecols, "nrows": self.nrows, "skiprows": self.skiprows,
+                "header_row": self.header_row}
 
 @dataclass
 class FileConvertParams:
     convert_type: str
+    engine: str = ""  # 注册表解析出的引擎名, 转换器据此选择实现
     input_path: str = ""
     input_raw: Optional[Union[str, bytes, TextIO, BinaryIO]] = None
     input_stream: Optional[Union[str, bytes, TextIO, BinaryIO]] = None
     output_path: str = ""
     extra: Optional[ConvertExtraParams] = field(default_factory=ConvertExtraParams)
+    meta: dict = field(default_factory=dict)  # 转换器产出的附加信息 (如工作表行列数), 合并到响应的 extra
 
     @staticmethod
     def from_dict(data: dict) -> FileConvertParams:
         if isinstance(data.get("extra"), dict):
             data["extra"] = ConvertExtraParams(**data["extra"])
         return FileConvertParams(**data)
-
-class ConvertType(str, Enum):
-    pdf2docx = "pdf2docx"
-    docx2html = "docx2html"
-    pdf2html = "pdf2html"
-    html2docx = "html2docx"
-    docx2pdf = "docx2pdf"
-    html2pdf = "html2pdf"
-    csv2xlsx = "csv2xlsx"
-    csv2html = "csv2html"
-    csv2md = "csv2md"
-    xls2xlsx = "xls2xlsx"
-    xls2html = "xls2html"
-    xls2md = "xls2md"
-    xlsx2csv = "xlsx2csv"
-    xlsx2html = "xlsx2html"
-    xlsx2md = "xlsx2md"
-    html2xlsx = "html2xlsx"
-    html2csv = "html2csv"
-    html2html = "html2html"
-    html2md = "html2md"
-    md2xlsx = "md2xlsx"
-    md2html = "md2html"
-    # 将来新增支持类型：md2html, xls2csv, 等等
-
@@ -0,0 +1,23 @@
+from typing import Optional, Dict, Any, Literal
+
+from pydantic import BaseModel, Field
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+
+class JobModel(BaseModel):
+    job_id: str
+    convert_type: str
+    status: JobStatus = "queued"
+    progress: float = 0.0
+    stage: str = ""
+    # 提交时的请求与已落盘的输入 (get_raw 结果, raw 不入库), 重启后据此重新执行
+    request: Dict[str, Any] = Field(default_factory=dict)
+    source: Dict[str, Any] = Field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: str = ""
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    def public(self) -> dict:
+        return self.model_dump(exclude={"request", "source"})
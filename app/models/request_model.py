@@ -1,5 +1,5 @@
 import time
-from typing import Optional, Union, Dict, Any
+from typing import Optional, Union, Dict, Any, List
 
 from pydantic import BaseModel, Field
 
@@ -17,4 +17,6 @@ class FileModelRequest(BaseModel):
     data: Optional[FileDataModel] = Field(default_factory=FileDataModel)
 
 
-
+class BatchFileModelRequest(FileModelRequest):
+    # 批量转换: 每个条目与 data 的格式相同, 上传的文件 (含 zip 内的文件) 另外追加
+    items: List[FileDataModel] = Field(default_factory=list)
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import tempfile
+import traceback
+import zipfile
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import UploadFile as StarletteUploadFile
+
+from app.core.configs.settings import settings
+from app.models.exception_model import InputError
+from app.models.file_conversion import FileDataModel
+from app.models.request_model import BatchFileModelRequest, FileModelRequest
+from app.models.response_model import FileModelResponse
+from app.services.file_manager import parse_file_request, process_file_operation
+from app.utils.exception import file_exception
+from app.utils.func_map import converter_registry
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+BatchItem = Tuple[FileDataModel, Optional[UploadFile]]
+
+
+class _ZipChunkWriter:
+    """不可 seek 的输出对象, zipfile 会改用 data descriptor 逐个条目写出, 每写完一个文件即可发送"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def expand_zip_upload(upload) -> List[BatchItem]:
+    """把上传的 zip 展开为多个待转换文件, 每个条目复制到 SpooledTemporaryFile, 小文件留在内存, 大文件落盘.
+
+    解压是阻塞操作, 需在线程中调用; 大小上限按实际解压出的字节数计算, 不信任 zip 头中声明的大小.
+    """
+    limit, total_size, items = settings.download_max_bytes, 0, []
+    try:
+        with zipfile.ZipFile(upload.file) as archive:
+            infos = [info for info in archive.infolist() if not info.is_dir() and "__MACOSX" not in info.filename
+                     and not os.path.basename(info.filename).startswith(".")]
+            declared_size = sum(info.file_size for info in infos)
+            if declared_size > limit:
+                raise InputError(f"Zip content too large: {declared_size} bytes > limit {limit} bytes.")
+            for info in infos:
+                spooled = tempfile.SpooledTemporaryFile(max_size=settings.upload_chunk_size)
+                items.append((FileDataModel(), UploadFile(file=spooled, filename=os.path.basename(info.filename))))
+                with archive.open(info) as entry:
+                    while chunk := entry.read(settings.upload_chunk_size):
+                        total_size += len(chunk)
+                        if total_size > limit:
+                            raise InputError(f"Zip content too large: more than {limit} bytes after decompression.")
+                        spooled.write(chunk)
+                items[-1][1].size = spooled.tell()
+                spooled.seek(0)
+    except BaseException:
+        for _, file in items:
+            file.file.close()
+        raise
+    return items
+
+async def parse_batch_request(request, src_ext: str) -> Tuple[BatchFileModelRequest, List[BatchItem]]:
+    request_model = await parse_file_request(request, model=BatchFileModelRequest)
+    items: List[BatchItem] = [(data, None) for data in request_model.items]
+    if not request_model.data.is_empty():
+        items.insert(0, (request_model.data, None))
+    if "multipart/form-data" in request.headers.get("content-type", ""):
+        form_data = await request.form()  # 已在 parse_file_request 中解析, 这里取缓存
+        for _, value in form_data.multi_items():
+            if not isinstance(value, StarletteUploadFile):
+                continue
+            if (value.filename or "").lower().endswith(".zip") and src_ext != "zip":
+                items += await asyncio.to_thread(expand_zip_upload, value)
+            else:
+                items.append((FileDataModel(), value))
+    if not items:
+        raise InputError("No files found in batch request.")
+    return request_model, items
+
+async def convert_batch_item(index: int, request_model: BatchFileModelRequest, item: BatchItem, convert_type: str,
+                             to_zip: bool) -> Tuple[int, int, dict, Optional[bytes], str]:
+    """转换单个条目, 返回 (index, status, results, content, path); 出错时不抛出, 错误写入 results.
+    输出已落盘时 content 为 None, 由 path 指向文件, 打包时直接从文件读取"""
+    data, file = item
+    item_request = FileModelRequest(**request_model.model_dump(exclude={"items", "data"}), data=data)
+    item_request.return_stream = item_request.return_stream or to_zip
+    try:
+        results, content, return_file = await process_file_operation(item_request, file, "convert", convert_type)
+        content = content.encode("utf-8") if isinstance(content, str) else content
+        return index, 200, results.model_dump(), content, return_file if content is None else ""
+    except Exception as e:
+        code, status, msg = file_exception(e)
+        logger.error(msg)
+        return index, status, FileModelResponse(uid=item_request.uid, sno=item_request.sno, code=code, messages=msg).model_dump(), None, ""
+    finally:
+        if file is not None:
+            await file.close()
+
+async def iter_batch_results(request_model: BatchFileModelRequest, items: List[BatchItem], convert_type: str,
+                             to_zip: bool) -> AsyncIterator[Tuple[int, int, dict, Optional[bytes], str]]:
+    """按 batch_concurrency 并发转换, 按完成顺序逐个产出结果; 客户端断开时取消未完成的条目"""
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+
+    async def run(index: int, item: BatchItem):
+        async with semaphore:
+            return await convert_batch_item(index, request_model, item, convert_type, to_zip)
+
+    tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def stream_ndjson(request_model, items, convert_type) -> AsyncIterator[bytes]:
+    async for index, status, results, _, _ in iter_batch_results(request_model, items, convert_type, False):
+        yield (json.dumps({"index": index, "status": status, **results}, ensure_ascii=False) + "\n").encode("utf-8")
+
+def write_zip_entry(archive: zipfile.ZipFile, name: str, content: Optional[bytes], path: str) -> None:
+    if path:
+        archive.write(path, name)
+    else:
+        archive.writestr(name, content)
+
+async def stream_zip(request_model, items, convert_type) -> AsyncIterator[bytes]:
+    writer, manifest, names = _ZipChunkWriter(), [], set()
+    with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        async for index, status, results, content, path in iter_batch_results(request_model, items, convert_type, True):
+            manifest.append(json.dumps({"index": index, "status": status, **results}, ensure_ascii=False))
+            if content is None and not path:
+                continue
+            name = results["data"]["file_name"] or f"{index}"
+            name = f"{index}_{name}" if name in names else name
+            names.add(name)
+            # 压缩在线程中进行; 已落盘的输出由 archive.write 分块读取, 不整个读入内存
+            await asyncio.to_thread(write_zip_entry, archive, name, content, path)
+            yield writer.pop()
+        # 每个文件的转换结果 (含失败原因) 放在最后
+        archive.writestr("results.ndjson", "\n".join(manifest) + "\n")
+    yield writer.pop()
+
+async def handle_batch_operation(request, convert_type: str, output: str = "ndjson") -> StreamingResponse:
+    try:
+        _, parsed = converter_registry.resolve(convert_type)
+        request_model, items = await parse_batch_request(request, parsed.src)
+        logger.info(f"Batch convert request: {parsed.name}, {len(items)} files, output: {output}.")
+    except Exception as e:
+        code, status, msg = file_exception(e)
+        logger.error(traceback.format_exc())
+        content = FileModelResponse(code=code, messages=msg).model_dump()
+        return JSONResponse(status_code=status, content=content)
+    if output == "zip":
+        headers = {"Content-Disposition": f'attachment; filename="{parsed.name}.zip"'}
+        return StreamingResponse(stream_zip(request_model, items, parsed.name), media_type="application/zip", headers=headers)
+    return StreamingResponse(stream_ndjson(request_model, items, parsed.name), media_type="application/x-ndjson")
@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple, Union
+
+import aiofiles
+
+from app.core.configs.settings import settings
+from app.utils.file import is_text_file, link_or_copy_file
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+# 会影响转换结果的 extra 字段, 参与缓存键计算
+CACHE_EXTRA_FIELDS = ("policy", "category", "name", "sheets", "usecols", "nrows", "skiprows", "header_row",
+                      "steps")
+
+
+def hash_raw(raw: Union[str, bytes], encoding="utf-8") -> str:
+    return hashlib.sha256(raw.encode(encoding) if isinstance(raw, str) else raw).hexdigest()
+
+def normalize_convert_type(convert_type: str) -> str:
+    # "html2md_v5" 与 "html2md-v5" 视为同一种转换
+    return re.sub(r"[-_]+", "-", convert_type.strip().lower())
+
+def file_identity(path: str) -> Tuple[int, int, int]:
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def make_cache_key(digest: str, convert_type: str, extra) -> str:
+    get = extra.get if isinstance(extra, dict) else lambda k: getattr(extra, k, None)
+    fields = {k: get(k) for k in CACHE_EXTRA_FIELDS if get(k) is not None}
+    key_source = f"{digest}|{normalize_convert_type(convert_type)}|{json.dumps(fields, sort_keys=True, default=str)}"
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    raw: Union[str, bytes, None]
+    size: int
+    created: float
+    path: str = ""
+    url: str = ""
+    meta: dict = field(default_factory=dict)  # 转换器产出的附加信息, 命中时一并返回
+    data_path: str = ""  # raw 为 None 时结果所在的缓存文件, 由调用方按路径返回
+    path_identity: Tuple[int, ...] = ()  # 写入时 path 的 (inode, 大小, mtime)
+
+    def saved_path(self) -> str:
+        """path 仍是写入缓存时的那个文件才返回; 同名输出按分钟加时间戳, 可能已被删除或被其他输入的结果替换"""
+        try:
+            return self.path if self.path and self.path_identity and file_identity(self.path) == self.path_identity else ""
+        except OSError:
+            return ""
+
+
+class ConversionCache:
+    """转换结果缓存: 内存 LRU (按字节预算) + static_root 下的磁盘层 (TTL 与总大小淘汰)"""
+
+    def __init__(self, enabled: bool, memory_bytes: int, disk_dir: str, disk_bytes: int, ttl: float):
+        self.enabled = enabled
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.ttl = ttl
+        self._memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._memory_used = 0
+        self._disk_index: Optional[Dict[str, tuple[int, float]]] = None  # key -> (size, created)
+        self._disk_used = 0
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _data_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.bin")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _scan_disk(self) -> Tuple[Dict[str, tuple[int, float]], int]:
+        index, used = {}, 0
+        if os.path.isdir(self.disk_dir):
+            for root, _, files in os.walk(self.disk_dir):
+                for file_name in files:
+                    if file_name.endswith(".bin"):
+                        stat = os.stat(os.path.join(root, file_name))
+                        index[file_name[:-4]] = (stat.st_size, stat.st_mtime)
+                        used += stat.st_size
+        return index, used
+
+    async def load_index(self) -> None:
+        """扫描磁盘层建立索引 (在线程中执行, 不阻塞事件循环); 启动时调用, 未调用时在首次访问时加载"""
+        if self.enabled and self._disk_index is None:
+            index, used = await asyncio.to_thread(self._scan_disk)
+            if self._disk_index is None:
+                self._disk_index, self._disk_used = index, used
+                logger.info(f"Conversion cache index loaded: {len(index)} entries, {used} bytes.")
+
+    async def _load_disk_index(self) -> Dict[str, tuple[int, float]]:
+        await self.load_index()
+        return self._disk_index
+
+    def _memory_put(self, key: str, entry: CacheEntry) -> None:
+        if self.memory_bytes <= 0 or entry.size > self.memory_bytes // 4:
+            return  # 过大的结果只落盘, 避免一次挤掉整个内存层
+        old = self._memory.pop(key, None)
+        self._memory_used -= old.size if old else 0
+        self._memory[key] = entry
+        self._memory_used += entry.size
+        while self._memory_used > self.memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= evicted.size
+            self.counters["evictions"] += 1
+
+    def _disk_remove(self, key: str) -> None:
+        size, _ = self._disk_index.pop(key, (0, 0))
+        self._disk_used -= size
+        for path in (self._data_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _disk_evict(self) -> None:
+        index = self._disk_index
+        for key in [k for k, (_, created) in index.items() if self._expired(created)]:
+            self._disk_remove(key)
+            self.counters["evictions"] += 1
+        if self._disk_used <= self.disk_bytes:
+            return
+        for key, _ in sorted(index.items(), key=lambda item: item[1][1]):
+            if self._disk_used <= self.disk_bytes:
+                break
+            self._disk_remove(key)
+            self.counters["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        if not self.enabled:
+            return None
+        entry = self._memory.get(key)
+        if entry is not None:
+            if not self._expired(entry.created):
+                self._memory.move_to_end(key)
+                self.counters["hits"] += 1
+                self.counters["memory_hits"] += 1
+                return entry
+            self._memory.pop(key)
+            self._memory_used -= entry.size
+        entry = await self._disk_get(key)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        if entry.raw is not None:
+            self._memory_put(key, entry)
+        self.counters["hits"] += 1
+        self.counters["disk_hits"] += 1
+        return entry
+
+    async def _disk_get(self, key: str) -> Optional[CacheEntry]:
+        index = await self._load_disk_index()
+        if key not in index:
+            return None
+        if self._expired(index[key][1]):
+            self._disk_remove(key)
+            return None
+        try:
+            async with aiofiles.open(self._meta_path(key), "r", encoding="utf-8") as f:
+                meta = json.loads(await f.read())
+            if meta.get("is_file"):
+                # 转换器直接写出的文件结果不读入内存, 由调用方按缓存文件路径返回
+                data_path, raw = self._data_path(key), None
+                size = os.path.getsize(data_path)
+            else:
+                async with aiofiles.open(self._data_path(key), "rb") as f:
+                    raw = await f.read()
+                raw = raw.decode("utf-8") if meta.get("is_text") else raw
+                data_path, size = "", len(raw)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Broken conversion cache entry {key}: {e}")
+            self._disk_remove(key)
+            return None
+        return CacheEntry(raw=raw, size=size, created=meta["created"], path=meta.get("path", ""), url=meta.get("url", ""),
+                          meta=meta.get("meta", {}), data_path=data_path, path_identity=tuple(meta.get("path_identity", ())))
+
+    async def put(self, key: str, raw: Union[str, bytes, None], path: str = "", url: str = "", meta: Optional[dict] = None,
+                  share: bool = True) -> None:
+        """raw 为 None 时表示结果只在 path 上 (转换器直接写出的文件), 只进入磁盘层.
+        share 为 False 时 path 归调用方所有 (可能随时删除), 只缓存内容, 不把 path/url 交给之后命中的请求"""
+        if not self.enabled or not (isinstance(raw, (str, bytes)) or (raw is None and path and os.path.exists(path))):
+            return
+        data = raw.encode("utf-8") if isinstance(raw, str) else raw
+        size = len(data) if data is not None else os.path.getsize(path)
+        source_path = path
+        if not share:
+            path, url = "", ""
+        identity = file_identity(path) if path and os.path.exists(path) else ()
+        entry = CacheEntry(raw=raw, size=size, created=time.time(), path=path, url=url, meta=meta or {},
+                           path_identity=identity)
+        if raw is not None:
+            self._memory_put(key, entry)
+        self.counters["stores"] += 1
+        if self.disk_bytes <= 0 or entry.size > self.disk_bytes:
+            return
+        # is_file: 结果只在文件上, 命中时按路径返回; is_text 按输出扩展名判断, 读回时解码为 str
+        meta = {"is_text": isinstance(raw, str) if data is not None else is_text_file(source_path), "is_file": data is None,
+                "created": entry.created, "path": path, "url": url, "path_identity": list(identity), "size": entry.size,
+                "meta": entry.meta}
+        os.makedirs(os.path.dirname(self._data_path(key)), exist_ok=True)
+        if data is None:
+            await asyncio.to_thread(link_or_copy_file, source_path, self._data_path(key))
+        else:
+            async with aiofiles.open(self._data_path(key), "wb") as f:
+                await f.write(data)
+        async with aiofiles.open(self._meta_path(key), "w", encoding="utf-8") as f:
+            await f.write(json.dumps(meta, ensure_ascii=False))
+        index = await self._load_disk_index()
+        self._disk_used += entry.size - index.get(key, (0, 0))[0]
+        index[key] = (entry.size, entry.created)
+        self._disk_evict()
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **self.counters,
+                "memory_items": len(self._memory), "memory_bytes": self._memory_used,
+                "disk_items": len(self._disk_index or {}), "disk_bytes": self._disk_used}
+
+
+conversion_cache = ConversionCache(
+    enabled=settings.conversion_cache_enabled,
+    memory_bytes=settings.conversion_cache_memory_bytes,
+    disk_dir=settings.conversion_cache_dir or os.path.join(settings.static_root, "cache", "conversions"),
+    disk_bytes=settings.conversion_cache_disk_bytes,
+    ttl=settings.conversion_cache_ttl,
+)
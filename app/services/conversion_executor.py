@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.configs.settings import settings
+from app.models.exception_model import ConversionQueueFullError, ConverterCrashError
+from app.services.engines import preload_engines
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class ConversionExecutor:
+    """转换执行器: 进程池承载 CPU 密集的转换引擎, 按转换类型限制并发, 队列满时拒绝新任务"""
+
+    def __init__(self, kind: str = "process", max_workers: int = 0, mp_context: str = "spawn", max_queue: int = 64,
+                 default_limit: int = 4, limits: Optional[Dict[str, int]] = None, preload: Optional[List[str]] = None):
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.mp_context = mp_context
+        self.max_queue = max_queue
+        self.default_limit = default_limit
+        self.limits = dict(limits or {})
+        self.preload = list(preload or [])
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self._pending = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def start(self) -> None:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="convert")
+            if self.kind != "process" and self.preload:
+                self._thread_pool.submit(preload_engines, self.preload)
+        if self.kind == "process" and self._process_pool is None:
+            # 每个工作进程启动时预热引擎
+            context = multiprocessing.get_context(self.mp_context)
+            self._process_pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                                     initializer=preload_engines, initargs=(self.preload,))
+        logger.info(f"Conversion executor started: kind={self.kind}, workers={self.max_workers}, max_queue={self.max_queue}.")
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait, cancel_futures=True)
+            self._thread_pool = None
+        logger.info("Conversion executor shut down.")
+
+    def get_limit(self, key: str) -> int:
+        return self.limits.get(key, self.default_limit)
+
+    def _get_semaphore(self, key: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._semaphores[key] = asyncio.Semaphore(self.get_limit(key))
+        return semaphore
+
+    async def submit(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """按转换类型排队执行一个转换协程, 队列满时抛出 ConversionQueueFullError"""
+        if self._pending >= self.max_queue:
+            self._counters["rejected"] += 1
+            raise ConversionQueueFullError(f"Conversion queue is full ({self._pending}/{self.max_queue}), retry later.")
+        self._pending += 1
+        self._counters["submitted"] += 1
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        acquired = False
+        try:
+            async with self._get_semaphore(key):
+                acquired = True
+                self._waiting[key] -= 1
+                self._running[key] = self._running.get(key, 0) + 1
+                try:
+                    result = await func(*args, **kwargs)
+                finally:
+                    self._running[key] -= 1
+        except BaseException:
+            self._counters["failed"] += 1
+            raise
+        finally:
+            self._pending -= 1
+            if not acquired:  # 等待信号量期间被取消
+                self._waiting[key] -= 1
+        self._counters["completed"] += 1
+        return result
+
+    async def run_blocking(self, func: Callable[..., Any], *args, cpu_bound: bool = True, **kwargs) -> Any:
+        """在工作池中执行阻塞函数; CPU 密集函数进入进程池 (函数与参数须可 pickle), 其余进入线程池"""
+        if self._thread_pool is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        if not cpu_bound or self._process_pool is None:
+            return await loop.run_in_executor(self._thread_pool, call)
+        pool = self._process_pool
+        try:
+            return await loop.run_in_executor(pool, call)
+        except BrokenProcessPool as e:
+            # 工作进程崩溃 (如 OOM 被杀) 后进程池不可再用, 重建后把错误交给调用方
+            self._replace_broken_pool(pool)
+            raise ConverterCrashError(f"Conversion worker process crashed: {e}") from e
+
+    def _replace_broken_pool(self, pool: ProcessPoolExecutor) -> None:
+        # 同一个进程池上的多个任务会一起失败, 只由第一个重建; 其余调用不能关掉已经重建的新进程池
+        with self._pool_lock:
+            if self._process_pool is not pool:
+                return
+            logger.error("Conversion process pool is broken, recreating it.")
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+            self.start()
+
+    def stats(self) -> dict:
+        keys = sorted(set(self._waiting) | set(self._running))
+        per_type = {key: {"waiting": self._waiting.get(key, 0), "running": self._running.get(key, 0),
+                          "limit": self.get_limit(key)} for key in keys}
+        return {"kind": self.kind, "max_workers": self.max_workers, "max_queue": self.max_queue,
+                "pending": self._pending, **self._counters, "per_type": per_type}
+
+
+conversion_executor = ConversionExecutor(
+    kind=settings.convert_executor,
+    max_workers=settings.convert_max_workers,
+    mp_context=settings.convert_mp_context,
+    max_queue=settings.convert_max_queue,
+    default_limit=settings.convert_default_concurrency,
+    limits=settings.convert_concurrency_limits,
+    preload=settings.engine_preload,
+)
@@ -1,91 +1,262 @@
+import asyncio
 import os
 import subprocess
 from io import BytesIO, StringIO
-from pathlib import Path
-from typing import Union
-
-import commonmark
-import html2markdown
-import html2text
-import mammoth
-import markdown as md
-import marko
-import mistune
-import pandas as pd
-import pdfkit
+from typing import Optional, Union
+
 from bs4 import BeautifulSoup
-from html2docx import html2docx
-from markdown_it import MarkdownIt
-from markdownify import markdownify
-from markitdown import MarkItDown
-from pdf2docx import Converter
-from tomd import Tomd
-from weasyprint import HTML
 
+from app.core.configs.settings import settings
+from app.models.exception_model import ConverterCrashError, UnsupportedTypeError
 from app.models.file_conversion import FileConvertParams
+from app.services.conversion_executor import conversion_executor
+from app.services.converter_registry import parse_convert_type
+from app.services.engines import get_engine_instance, load_engine
+from app.services.pdf_layout import pdf_to_html_or_md
+from app.services.soffice_pool import soffice_pool
+from app.services.table_stream import parse_column_range, resolve_columns, select_sheets, stream_tables
 from app.utils.file import raw_to_stream, stream_to_raw, seek_stream, async_save_string_or_bytes_to_path, \
-    async_get_bytes_from_path, text_to_binary, gen_resource_locations
+    text_to_binary, gen_resource_locations
 from app.utils.filetypes import markitdown_input_ext
 from app.utils.logger import get_logger
 from app.utils.text import strip_markdown, format_html
 
 logger = get_logger()
 
-async def convert_pdf_to_docx(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
+# 以下同步函数是真正执行转换的引擎调用, 由 conversion_executor 放到工作进程/线程中运行,
+# 因此必须是模块级函数, 且参数与返回值可 pickle.
+
+def _pdf_to_docx(input_path: str, input_raw: Union[bytes, None]) -> bytes:
     output_stream = BytesIO()
-    logger.info(f"Converting pdf to docx...")
-    cv = Converter(pdf_file=params.input_path, stream=params.input_raw)
+    cv = load_engine("pdf2docx").Converter(pdf_file=input_path, stream=input_raw)
     cv.convert(output_stream, start=0, end=None)
     cv.close()
+    return output_stream.getvalue()
+
+def _pdf_page_count(input_path: str) -> int:
+    doc = load_engine("pymupdf").open(input_path)
+    page_count = doc.page_count
+    doc.close()
+    return page_count
+
+def _pdf_parse_pages(input_path: str, start: int, end: int) -> dict:
+    # 解析 [start, end) 页, 返回 pdf2docx 的中间结果 (store 格式), 由主流程合并
+    cv = load_engine("pdf2docx").Converter(pdf_file=input_path)
+    kwargs = cv.default_settings
+    cv.parse(start=start, end=end, **kwargs)
+    data = cv.store()
+    cv.close()
+    return data
+
+def _pdf_make_docx(input_path: str, chunks: list) -> bytes:
+    output_stream = BytesIO()
+    cv = load_engine("pdf2docx").Converter(pdf_file=input_path)
+    for data in chunks:
+        cv.restore(data)
+    cv.make_docx(output_stream, **cv.default_settings)
+    cv.close()
+    return output_stream.getvalue()
+
+def _docx_to_md_or_html(input_raw: Union[bytes, None], to_md: bool, input_path: str = "") -> str:
+    mammoth = load_engine("mammoth")
+    input_stream = BytesIO(input_raw) if input_raw is not None else open(input_path, "rb")
+    if to_md:
+        result = mammoth.convert_to_markdown(input_stream)
+    else:
+        # result = mammoth.convert_to_html(input_stream, convert_image=mammoth.images.skip)
+        result = mammoth.convert_to_html(input_stream)
+    input_stream.close()
+    return result.value
+
+def _html_to_docx(input_raw: str) -> bytes:
+    soup = BeautifulSoup(input_raw, "html.parser")
+    title = soup.title.string.strip() if soup.title and soup.title.string else "Untitled"
+    output_stream = load_engine("html2docx").html2docx(input_raw, title)
     seek_stream(output_stream)
-    output_raw = stream_to_raw(output_stream)
+    return stream_to_raw(output_stream)
+
+def _html_to_pdf_weasyprint(input_raw: str) -> bytes:
+    output_stream = BytesIO()
+    load_engine("weasyprint").HTML(string=input_raw).write_pdf(output_stream)
+    return output_stream.getvalue()
+
+def _html_to_pdf_wkhtmltopdf(input_raw: str) -> bytes:
+    return load_engine("pdfkit").from_string(input_raw, False)
+
+def _run_command(args: list) -> None:
+    try:
+        subprocess.run(args, check=True)
+    except subprocess.CalledProcessError as e:
+        raise ConverterCrashError(f"{args[0]} exited with code {e.returncode}") from e
+
+def _read_tables(convert_type: str, input_raw: Union[str, bytes, None], input_path: str = "",
+                 options: Optional[dict] = None) -> tuple[list, list, list]:
+    # 上传时分块落盘的文件没有 raw, 直接交给 pandas 读取路径
+    # options 为 ConvertExtraParams.table_options(), 工作表/列/行范围交给读取器, 未选中的部分不解析
+    pd = load_engine("pandas")
+    input_stream = raw_to_stream(input_raw) if input_raw is not None else input_path
+    options = options or {}
+    usecols, nrows, skiprows = options.get("usecols"), options.get("nrows"), options.get("skiprows")
+    header = options.get("header_row", 0)
+    if "html2" in convert_type:
+        # read_html 没有 usecols/nrows, 读出后再截取; 表头按 <thead>/<th> 推断, header_row 不生效
+        tables = pd.read_html(input_stream, encoding="utf-8", skiprows=skiprows)
+        all_names = [f"Table{i + 1}" for i in range(len(tables))]
+        sheet_names = select_sheets(all_names, options.get("sheets"))
+        dfs = []
+        for name in sheet_names:
+            df = tables[all_names.index(name)]
+            positions = resolve_columns(usecols, [str(column) for column in df.columns])
+            df = df if positions is None else df.iloc[:, positions]
+            dfs.append(df if nrows is None else df.head(nrows))
+    elif "csv2" in convert_type:
+        usecols = parse_column_range(usecols) if isinstance(usecols, str) else usecols
+        all_names = sheet_names = ["Table1"]
+        dfs = [pd.read_csv(input_stream, encoding="utf-8", usecols=usecols, nrows=nrows, skiprows=skiprows, header=header)]
+    elif "xls2" in convert_type or "xlsx2" in convert_type:
+        engine = "openpyxl" if "xlsx2" in convert_type else "xlrd"
+        with pd.ExcelFile(input_stream, engine=engine) as excel_file:
+            all_names = [str(name) for name in excel_file.sheet_names]
+            sheet_names = select_sheets(all_names, options.get("sheets"))
+            dfs = [excel_file.parse(excel_file.sheet_names[all_names.index(name)], usecols=usecols, nrows=nrows,
+                                    skiprows=skiprows, header=header) for name in sheet_names]
+    else:
+        raise UnsupportedTypeError(f"Unsupported convert file type: {convert_type}")
+    return sheet_names, dfs, all_names
+
+def _convert_tables(convert_type: str, input_raw: Union[str, bytes, None], input_path: str = "",
+                    options: Optional[dict] = None) -> tuple[Union[str, bytes], dict]:
+    """返回 (输出内容, 工作表元数据)"""
+    pd = load_engine("pandas")
+    sheet_names, dfs, all_names = _read_tables(convert_type, input_raw, input_path, options)
+    meta = {"sheet_names": all_names,
+            "sheet_info": [{"name": name, "rows": df.shape[0], "columns": df.shape[1]} for name, df in zip(sheet_names, dfs)]}
+    if "2html" in convert_type:
+        html_blocks = [df.to_html(index=False, border=1) for df in dfs]
+        parts = [f"<h2>{name}</h2><br>\n{html}" for name, html in zip(sheet_names, html_blocks)]
+        output_raw = "<br><hr><br>".join(parts)
+    elif "2md" in convert_type:
+        md_blocks = [df.to_markdown(index=False) for df in dfs]
+        parts = [f"## {name}\n\n{markdown}" for name, markdown in zip(sheet_names, md_blocks)]
+        output_raw = "\n\n---\n\n".join(parts)
+    elif "2csv" in convert_type:
+        if len(dfs) > 1:
+            for i, df in enumerate(dfs):
+                df['TableName'] = sheet_names[i]
+        df = pd.concat(dfs, ignore_index=True)
+        output_raw = df.to_csv(index=False)
+    else:
+        output_stream = BytesIO()
+        with pd.ExcelWriter(output_stream, engine="openpyxl") as writer:
+            for df, name in zip(dfs, sheet_names):
+                df.to_excel(writer, sheet_name=name, index=False)
+        output_raw = output_stream.getvalue()
+    return output_raw, meta
+
+def _markitdown_convert(input_raw: Union[bytes, None], input_path: str = "", extension: str = "") -> str:
+    source = BytesIO(input_raw) if input_raw is not None else input_path
+    # 内存中的内容没有文件名, 需要给出扩展名, 否则 html/csv 等文本会被当作纯文本原样返回
+    result = get_engine_instance("markitdown").convert(source, file_extension=f".{extension}" if extension else None)  # str, path (str or Path), url, requests.Response, BinaryIO
+    return result.text_content
+
+def _html_to_md(input_raw: str, engine: str) -> str:
+    if engine == "markitdown":
+        output_raw = _markitdown_convert(text_to_binary(input_raw), extension="html")
+    elif engine == "html2markdown":
+        output_raw = load_engine("html2markdown").convert(input_raw)
+    elif engine == "tomd":
+        output_raw = load_engine("tomd").Tomd(input_raw).markdown
+        # output_raw = Tomd().convert(input_raw)
+    elif engine == "html2text":
+        output_raw = load_engine("html2text").html2text(input_raw)
+    else:
+        output_raw = load_engine("markdownify").markdownify(input_raw)
+    return output_raw
+
+def _md_to_html(input_raw: str, engine: str) -> str:
+    if engine == "commonmark":
+        parser, renderer = get_engine_instance("commonmark")
+        ast = parser.parse(input_raw)
+        output_raw = renderer.render(ast)
+    elif engine == "marko":
+        output_raw = load_engine("marko").convert(input_raw)
+    elif engine == "mistune":
+        output_raw = load_engine("mistune").markdown(input_raw)
+    elif engine == "markdown":
+        output_raw = get_engine_instance("markdown").reset().convert(input_raw)
+    else:
+        output_raw = get_engine_instance("markdown_it").render(input_raw)
+    return output_raw
+
+def _html_to_txt(input_raw: str) -> str:
+    soup = BeautifulSoup(input_raw, "html.parser")
+    return soup.get_text(separator="\n")  # type: ignore
+
+async def convert_pdf_to_docx_parallel(input_path: str, page_count: int) -> bytes:
+    """按页分块并行解析 PDF, 再按页序合并生成 docx"""
+    chunk_pages = settings.pdf_chunk_pages
+    workers = settings.pdf_parallel_workers or conversion_executor.max_workers
+    ranges = [(start, min(start + chunk_pages, page_count)) for start in range(0, page_count, chunk_pages)]
+    semaphore = asyncio.Semaphore(workers)
+    logger.info(f"Converting pdf to docx in parallel: {page_count} pages, {len(ranges)} chunks, {workers} workers...")
+
+    async def parse_chunk(start: int, end: int) -> dict:
+        async with semaphore:
+            return await conversion_executor.run_blocking(_pdf_parse_pages, input_path, start, end)
+
+    chunks = await asyncio.gather(*(parse_chunk(start, end) for start, end in ranges))
+    return await conversion_executor.run_blocking(_pdf_make_docx, input_path, list(chunks))
+
+async def convert_pdf_to_docx(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
+    input_path, input_raw = params.input_path, params.input_raw
+    workers = settings.pdf_parallel_workers or conversion_executor.max_workers
+    if workers > 1 and settings.pdf_chunk_pages > 0 and conversion_executor.kind == "process":
+        if not os.path.exists(input_path):
+            await async_save_string_or_bytes_to_path(input_raw, input_path)
+        page_count = await conversion_executor.run_blocking(_pdf_page_count, input_path)
+        if page_count > settings.pdf_chunk_pages:
+            output_raw = await convert_pdf_to_docx_parallel(input_path, page_count)
+            return output_raw, raw_to_stream(output_raw), ""
+    logger.info(f"Converting pdf to docx...")
+    output_raw = await conversion_executor.run_blocking(_pdf_to_docx, input_path, input_raw)
+    output_stream = raw_to_stream(output_raw)
     output_path = ""
     return output_raw, output_stream, output_path
 
 async def convert_docx_to_md_or_html(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
     input_path, input_raw, input_stream = params.input_path, params.input_raw, params.input_stream
     images_dir = os.path.join(gen_resource_locations("publib", "images", params.extra.category)[0], params.extra.name)
-    input_stream = raw_to_stream(input_raw) if not input_stream else input_stream
+    input_raw = stream_to_raw(input_stream) if input_stream else input_raw
     if input_path and os.path.exists(input_path):
-        with open(input_path, "rb") as docx_file:
-            input_stream = BytesIO(docx_file.read())
+        input_raw = None  # 已落盘的文件交给工作进程按路径读取
     logger.info(f"Converting docx to html or markdown: {params.convert_type}...")
-    if "2md" in params.convert_type:
-        result = mammoth.convert_to_markdown(input_stream)
-    else:
-        # result = mammoth.convert_to_html(input_stream, convert_image=mammoth.images.skip)
-        result = mammoth.convert_to_html(input_stream)
-    result_raw = result.value
+    to_md = "2md" in params.convert_type
+    result_raw = await conversion_executor.run_blocking(_docx_to_md_or_html, input_raw, to_md, input_path)
     # 格式化处理
-    output_raw = await format_html(result_raw, params.extra.policy, images_dir) if "2md" not in params.convert_type else result_raw
+    output_raw = await format_html(result_raw, params.extra.policy, images_dir) if not to_md else result_raw
     output_stream = raw_to_stream(output_raw)
     output_path = ""
     return output_raw, output_stream, output_path
 
 async def convert_pdf_to_md_or_html(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
-    docx_ext = "docx"
-    src_ext, dst_ext = params.convert_type.lower().split("-")[0].split("_")[0].split("2", 1)
-    docx_path = str(Path(params.input_path).with_suffix(f".{docx_ext}"))
-    output_path = params.output_path
-    params.convert_type = f"{src_ext}2{docx_ext}"
-    params.output_path = docx_path
-    docx_raw, docx_stream, docx_save_path = await convert_pdf_to_docx(params)
-    params.convert_type = f"{docx_ext}2{dst_ext}"
-    params.input_raw = docx_raw
-    params.input_stream = docx_stream
-    params.input_path = docx_path
-    params.output_path = output_path
-    output_raw, output_stream, output_path = await convert_docx_to_md_or_html(params)
+    # 直接从 PDF 版面生成, 跳过 docx 中间文档 (经过 docx 的默认实现见 func_map 中注册的 pdf2docx -> docx2html)
+    input_path, input_raw = params.input_path, params.input_raw
+    if input_path and os.path.exists(input_path):
+        input_raw = None
+    to_md = parse_convert_type(params.convert_type).dst == "md"
+    logger.info(f"Converting pdf to html or markdown with PyMuPDF: {params.convert_type}...")
+    images_dir = os.path.join(gen_resource_locations("publib", "images", params.extra.category)[0], params.extra.name)
+    result_raw = await conversion_executor.run_blocking(pdf_to_html_or_md, input_path, input_raw, to_md,
+                                                        params.extra.policy, images_dir)
+    output_raw = await format_html(result_raw, params.extra.policy, images_dir) if not to_md else result_raw
+    output_stream = raw_to_stream(output_raw)
+    output_path = ""
     return output_raw, output_stream, output_path
 
 async def convert_html_to_docx(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
-    input_raw = params.input_raw
     logger.info("Converting html to docx...")
-    soup = BeautifulSoup(input_raw, "html.parser")
-    title = soup.title.string.strip() if soup.title and soup.title.string else "Untitled"
-    output_stream = html2docx(input_raw, title)
-    seek_stream(output_stream)
-    output_raw = stream_to_raw(output_stream)
+    output_raw = await conversion_executor.run_blocking(_html_to_docx, params.input_raw)
+    output_stream = raw_to_stream(output_raw)
     output_path = ""
     return output_raw, output_stream, output_path
 
@@ -94,119 +265,72 @@ async def convert_docx_to_pdf(params: FileConvertParams) -> tuple[Union[str, byt
     if not os.path.exists(input_path):
         await async_save_string_or_bytes_to_path(input_raw, input_path)
     logger.info("Converting docx to pdf...")
-    if "v2" in params.convert_type:
-        subprocess.run(["pandoc", input_path, "-o", output_path], check=True)
+    if params.engine == "pandoc":
+        # 外部进程完成实际工作, 放到线程中等待即可
+        await conversion_executor.run_blocking(_run_command, ["pandoc", input_path, "-o", output_path], cpu_bound=False)
     else:
-        subprocess.run(["libreoffice", "--headless", "--convert-to", "pdf", "--outdir", os.path.dirname(output_path), input_path], check=True)
-    output_raw, _ = await async_get_bytes_from_path(output_path)
-    output_stream = raw_to_stream(output_raw)
-    return output_raw, output_stream, output_path
+        await soffice_pool.convert(input_path, output_path, "pdf")
+    # 输出已写到 output_path, 不再读回内存, 由调用方按需读取或直接发送文件
+    return None, None, output_path
 
 async def convert_html_to_pdf(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
     input_raw = params.input_raw
-    if "v2" in params.convert_type:
+    if params.engine == "weasyprint":
         logger.info("Converting HTML to PDF using WeasyPrint...")
-        output_stream = BytesIO()
-        HTML(string=input_raw).write_pdf(output_stream)
-        seek_stream(output_stream)
-        output_raw = stream_to_raw(output_stream)
+        output_raw = await conversion_executor.run_blocking(_html_to_pdf_weasyprint, input_raw)
     else:
         logger.info("Converting HTML to PDF using Wkhtmltopdf...")
-        output_raw = pdfkit.from_string(input_raw, False)
-        output_stream = raw_to_stream(output_raw)
+        output_raw = await conversion_executor.run_blocking(_html_to_pdf_wkhtmltopdf, input_raw, cpu_bound=False)
+    output_stream = raw_to_stream(output_raw)
     output_path = ""
     return output_raw, output_stream, output_path
 
 async def convert_excel_and_markdown_or_html(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
     convert_type, input_raw, input_stream = params.convert_type, params.input_raw, params.input_stream
-    input_stream = raw_to_stream(input_raw) if not input_stream else input_stream
-    output_stream = StringIO() if params.extra.is_text else BytesIO()
-    dfs_dict, dfs = {}, []
-    if "html2" in convert_type:
-        dfs = pd.read_html(input_stream, encoding="utf-8")
-    elif "csv2" in convert_type:
-        dfs = [pd.read_csv(input_stream, encoding="utf-8")]  # 转为列表以保持一致
-    elif "xls2" in convert_type:
-        dfs_dict = pd.read_excel(input_stream, sheet_name=None, engine="xlrd")
-    elif "xlsx2" in convert_type:
-        dfs_dict = pd.read_excel(input_stream, sheet_name=None, engine="openpyxl")
-    else:
-        raise ValueError(f"Unsupported convert file type: {convert_type}")
-    sheet_names = list(dfs_dict.keys()) if dfs_dict else [f"Table{i + 1}" for i in range(len(dfs))]
-    dfs = list(dfs_dict.values()) if dfs_dict else dfs
+    input_raw = stream_to_raw(input_stream) if input_stream else input_raw
+    output_raw, params.meta = await conversion_executor.run_blocking(_convert_tables, convert_type, input_raw, params.input_path,
+                                                                     params.extra.table_options())
     if "2html" in convert_type:
-        html_blocks = [df.to_html(index=False, border=1) for df in dfs]
-        parts = [f"<h2>{name}</h2><br>\n{html}" for name, html in zip(sheet_names, html_blocks)]
-        result_raw = "<br><hr><br>".join(parts)
         images_dir = os.path.join(gen_resource_locations("publib", "images", params.extra.category)[0], params.extra.name)
-        output_raw = await format_html(result_raw, params.extra.policy, images_dir)
-    elif "2md" in convert_type:
-        md_blocks = [df.to_markdown(index=False) for df in dfs]
-        parts = [f"## {name}\n\n{markdown}" for name, markdown in zip(sheet_names, md_blocks)]
-        output_raw = "\n\n---\n\n".join(parts)
-    elif "2csv" in convert_type:
-        if len(dfs) > 1:
-            for i, df in enumerate(dfs):
-                df['TableName'] = sheet_names[i]
-        df = pd.concat(dfs, ignore_index=True)
-        output_raw = df.to_csv(index=False)
-    else:
-        with pd.ExcelWriter(output_stream, engine="openpyxl") as writer:
-            for df, name in zip(dfs, sheet_names):
-                df.to_excel(writer, sheet_name=name, index=False)
-        seek_stream(output_stream)
-        output_raw = stream_to_raw(output_stream)
-    output_stream = raw_to_stream(output_raw) if output_stream.getvalue() == "" else output_stream
+        output_raw = await format_html(output_raw, params.extra.policy, images_dir)
+    output_stream = raw_to_stream(output_raw)
     output_path = ""
     return output_raw, output_stream, output_path
 
+async def convert_tables_streaming(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
+    # 逐行读写, 输出直接写入 output_path, 不经过内存
+    input_path, input_raw, output_path = params.input_path, params.input_raw, params.output_path
+    if input_path and os.path.exists(input_path):
+        input_raw = None
+    logger.info(f"Converting tables (streaming): {params.convert_type}...")
+    params.meta = await conversion_executor.run_blocking(stream_tables, params.convert_type, input_raw, input_path,
+                                                         output_path, params.extra.table_options())
+    logger.info(f"Streamed {sum(sheet['rows'] for sheet in params.meta['sheet_info'])} rows to {output_path}.")
+    return None, None, output_path
+
 async def convert_to_markdown(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
     convert_type = params.convert_type
-    if "2md" not in convert_type:
-        raise ValueError("Only *2md conversions are supported with MarkItDown.")
-    extension = convert_type.replace("2md", "").lower()
+    parsed = parse_convert_type(convert_type)
+    if parsed.dst != "md":
+        raise UnsupportedTypeError("Only *2md conversions are supported with MarkItDown.")
+    extension = parsed.src
     # 安全性和鲁棒性检查
     if extension not in markitdown_input_ext:
-        raise ValueError(f"Unsupported convert_type: {convert_type}")
-    input_stream = raw_to_stream(text_to_binary(params.input_raw))
-    result = MarkItDown().convert(input_stream)  # str, path (str or Path), url, requests.Response, BinaryIO
-    output_raw = result.text_content
+        raise UnsupportedTypeError(f"Unsupported convert_type: {convert_type}")
+    input_raw = text_to_binary(params.input_raw) if params.input_raw is not None else None
+    output_raw = await conversion_executor.run_blocking(_markitdown_convert, input_raw, params.input_path, extension)
     output_stream = raw_to_stream(output_raw)
     output_path = ""
     return output_raw, output_stream, output_path
 
 async def convert_html_to_md(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
-    if "v5" in params.convert_type:
-        input_stream = raw_to_stream(text_to_binary(params.input_raw))
-        result = MarkItDown().convert(input_stream)  # str, path (str or Path), url, requests.Response, BinaryIO
-        output_raw = result.text_content
-    elif "v4" in params.convert_type:
-        output_raw = html2markdown.convert(params.input_raw)
-    elif "v3" in params.convert_type:
-        output_raw = Tomd(params.input_raw).markdown
-        # output_raw = Tomd().convert(params.input_raw)
-    elif "v2" in params.convert_type:
-        output_raw = html2text.html2text(params.input_raw)
-    else:
-        output_raw = markdownify(params.input_raw)
+    output_raw = await conversion_executor.run_blocking(_html_to_md, params.input_raw, params.engine)
     output_stream = raw_to_stream(output_raw)
     output_path = ""
     return output_raw, output_stream, output_path
 
 async def convert_md_to_html(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
-    if "v5" in params.convert_type:
-        parser = commonmark.Parser()
-        renderer = commonmark.HtmlRenderer()
-        ast = parser.parse(params.input_raw)
-        output_raw = renderer.render(ast)
-    elif "v4" in params.convert_type:
-        output_raw = marko.convert(params.input_raw)
-    elif "v3" in params.convert_type:
-        output_raw = mistune.markdown(params.input_raw)
-    elif "v2" in params.convert_type:
-        output_raw = md.markdown(params.input_raw)
-    else:
-        output_raw = MarkdownIt().render(params.input_raw)
+    output_raw = await conversion_executor.run_blocking(_md_to_html, params.input_raw, params.engine)
     images_dir = os.path.join(gen_resource_locations("publib", "images", params.extra.category)[0], params.extra.name)
     output_raw = await format_html(output_raw, params.extra.policy, images_dir)
     output_stream = raw_to_stream(output_raw)
@@ -229,11 +353,7 @@ async def convert_md_to_txt(params: FileConvertParams) -> tuple[Union[str, bytes
 
 async def convert_html_to_txt(params: FileConvertParams) -> tuple[Union[str, bytes], Union[StringIO, BytesIO], str]:
     # html转纯文本, 	用 BeautifulSoup 的 get_text() 方法,彻底清除无标记
-    soup = BeautifulSoup(params.input_raw, "html.parser")
-    output_raw = soup.get_text(separator="\n")  # type: ignore
+    output_raw = await conversion_executor.run_blocking(_html_to_txt, params.input_raw)
     output_stream = raw_to_stream(output_raw)
     output_path = ""
     return output_raw, output_stream, output_path
-
-
-
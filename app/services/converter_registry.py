@@ -0,0 +1,175 @@
+import functools
+import importlib.util
+import re
+import shutil
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.models.exception_model import InputError, UnsupportedTypeError
+from app.services.engines import engine_modules
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+_variant_pattern = re.compile(r"^(?P<base>[a-z0-9]+?)(?:[-_](?P<variant>[a-z0-9]+))?$")
+
+
+@dataclass(frozen=True)
+class ParsedConvertType:
+    src: str
+    dst: str
+    variant: str = ""
+    via: Tuple[str, ...] = ()  # 多阶段转换的中间格式, 如 xlsx2html2pdf 的 ("html",)
+
+    @property
+    def base(self) -> str:
+        return "2".join((self.src,) + self.via + (self.dst,))
+
+    @property
+    def name(self) -> str:
+        return f"{self.base}-{self.variant}" if self.variant else self.base
+
+
+@dataclass
+class ConverterSpec:
+    src: str
+    dst: str
+    handler: Callable[..., Awaitable[tuple]]
+    engine: str
+    variant: str = ""
+    # 能力元数据
+    engines: Tuple[str, ...] = ()  # 依赖的 Python 引擎 (见 engines.engine_modules)
+    binaries: Tuple[str, ...] = ()  # 依赖的外部命令
+    accepts_path: bool = False  # 可以直接读取落盘文件, 无需 raw
+    description: str = ""
+    stages: Tuple["ConverterSpec", ...] = ()  # 由多个转换器组合而成时的各阶段
+
+    @property
+    def name(self) -> str:
+        return f"{self.src}2{self.dst}-{self.variant}" if self.variant else f"{self.src}2{self.dst}"
+
+    def is_available(self) -> bool:
+        modules_ok = all(importlib.util.find_spec(engine_modules.get(e, e)) is not None for e in self.engines)
+        return modules_ok and all(shutil.which(b) for b in self.binaries)
+
+    def describe(self) -> dict:
+        info = {"convert_type": self.name, "src": self.src, "dst": self.dst, "variant": self.variant or "default",
+                "engine": self.engine, "accepts_path": self.accepts_path, "requires": list(self.engines + self.binaries),
+                "available": self.is_available(), "description": self.description}
+        if self.stages:
+            info["stages"] = [stage.name for stage in self.stages]
+        return info
+
+
+def parse_convert_type(convert_type: str) -> ParsedConvertType:
+    """解析 "html2md", "html2md-v5", "html2md_v5" 形式的转换类型, 以及 "xlsx2html2pdf" 形式的多阶段转换"""
+    match = _variant_pattern.match(convert_type.strip().lower())
+    if not match or "2" not in match.group("base"):
+        raise UnsupportedTypeError(f"不支持的转换类型: {convert_type}")
+    formats = match.group("base").split("2")
+    if not all(formats):
+        raise UnsupportedTypeError(f"不支持的转换类型: {convert_type}")
+    return ParsedConvertType(src=formats[0], dst=formats[-1], variant=match.group("variant") or "",
+                             via=tuple(formats[1:-1]))
+
+
+class ConverterRegistry:
+    """转换器注册表: 启动时构建一次, 按 (src, dst, variant) 做 O(1) 查找.
+
+    没有直接转换器的 src -> dst 按转换图上的最短路径规划为多阶段转换, 由 pipeline_handler 依次执行.
+    """
+
+    def __init__(self, pipeline_handler: Optional[Callable[..., Awaitable[tuple]]] = None):
+        self._table: Dict[Tuple[str, str, str], ConverterSpec] = {}
+        self._paths: Dict[Tuple[str, str], List[ConverterSpec]] = {}
+        self.pipeline_handler = pipeline_handler  # async (stages, params), 见 app/services/pipeline.py
+
+    def register(self, src: str, dst: str, handler: Callable[..., Awaitable[tuple]], engine: str, variant: str = "",
+                 **capabilities) -> ConverterSpec:
+        spec = ConverterSpec(src=src, dst=dst, handler=handler, engine=engine, variant=variant, **capabilities)
+        self._table[(src, dst, variant)] = spec
+        self._paths.clear()
+        return spec
+
+    def compose(self, stages: List[ConverterSpec], variant: str = "", description: str = "") -> ConverterSpec:
+        """把首尾相接的转换器组合为一个转换器, 已组合的转换器会展开为各自的阶段"""
+        if self.pipeline_handler is None:
+            raise RuntimeError("Converter registry has no pipeline handler.")
+        stages = tuple(stage for spec in stages for stage in (spec.stages or (spec,)))
+        for prev, stage in zip(stages, stages[1:]):
+            if prev.dst != stage.src:
+                raise InputError(f"转换步骤不连续: {prev.name} -> {stage.name}")
+        return ConverterSpec(src=stages[0].src, dst=stages[-1].dst, handler=functools.partial(self.pipeline_handler, stages),
+                             engine="+".join(stage.engine for stage in stages), variant=variant,
+                             engines=tuple(dict.fromkeys(e for stage in stages for e in stage.engines)),
+                             binaries=tuple(dict.fromkeys(b for stage in stages for b in stage.binaries)),
+                             accepts_path=stages[0].accepts_path, stages=stages,
+                             description=description or " -> ".join(stage.name for stage in stages))
+
+    def register_pipeline(self, *convert_types: str, variant: str = "", description: str = "") -> ConverterSpec:
+        """把已注册的转换器按顺序组合后注册, 如 register_pipeline("pdf2docx", "docx2html")"""
+        spec = self.compose([self.resolve(convert_type)[0] for convert_type in convert_types], variant, description)
+        self._table[(spec.src, spec.dst, variant)] = spec
+        self._paths.clear()
+        return spec
+
+    def find_path(self, src: str, dst: str) -> List[ConverterSpec]:
+        """按阶段数最少规划 src -> dst 的转换路径, 只经过可用的转换器, 同一对格式优先默认实现; 无路径时返回空列表"""
+        key = (src, dst)
+        if key not in self._paths:
+            edges: Dict[str, Dict[str, ConverterSpec]] = {}
+            for spec in self.specs():  # 同一对格式默认实现排在前面
+                if not spec.stages and spec.src != spec.dst and spec.dst not in edges.get(spec.src, {}) \
+                        and spec.is_available():
+                    edges.setdefault(spec.src, {})[spec.dst] = spec
+            previous: Dict[str, ConverterSpec] = {}
+            queue = deque([src])
+            while queue and dst not in previous:
+                node = queue.popleft()
+                for target, spec in edges.get(node, {}).items():
+                    if target != src and target not in previous:
+                        previous[target] = spec
+                        queue.append(target)
+            path, node = [], dst
+            while node in previous:
+                path.append(previous[node])
+                node = previous[node].src
+            self._paths[key] = path[::-1]
+        return self._paths[key]
+
+    def resolve(self, convert_type: str, steps: Optional[List[str]] = None) -> Tuple[ConverterSpec, ParsedConvertType]:
+        """解析转换类型; steps 为显式指定的各阶段转换类型 (如 ["xlsx2html", "html2pdf-v2"]), 首尾须与 convert_type 一致"""
+        parsed = parse_convert_type(convert_type)
+        if steps:
+            spec = self.compose([self.resolve(step)[0] for step in steps])
+            if (spec.src, spec.dst) != (parsed.src, parsed.dst):
+                raise InputError(f"转换步骤 {' -> '.join(steps)} 与转换类型 {parsed.name} 不一致")
+            return spec, parsed
+        spec = None if parsed.via else self._table.get((parsed.src, parsed.dst, parsed.variant))
+        if spec is not None:
+            return spec, parsed
+        if parsed.variant:
+            raise UnsupportedTypeError(f"不支持的转换类型: {parsed.name}")
+        stages = []
+        formats = (parsed.src,) + parsed.via + (parsed.dst,)
+        for src, dst in zip(formats, formats[1:]):
+            # 中间阶段的默认实现不可用时 (如缺少 wkhtmltopdf) 换用可用的实现或路径
+            direct = self._table.get((src, dst, ""))
+            path = [direct] if direct is not None and direct.is_available() else self.find_path(src, dst)
+            path = path or ([direct] if direct is not None else [])
+            if not path:
+                raise UnsupportedTypeError(f"不支持的转换类型: {parsed.name} (没有 {src} -> {dst} 的转换路径)")
+            stages.extend(path)
+        spec = stages[0] if len(stages) == 1 else self.compose(stages)
+        logger.info(f"Planned conversion {parsed.name}: {spec.description or spec.name}.")
+        return spec, parsed
+
+    def get(self, src: str, dst: str, variant: str = "") -> Optional[ConverterSpec]:
+        return self._table.get((src, dst, variant))
+
+    def specs(self) -> List[ConverterSpec]:
+        return sorted(self._table.values(), key=lambda s: (s.src, s.dst, s.variant))
+
+    def describe(self) -> List[dict]:
+        return [spec.describe() for spec in self.specs()]
@@ -0,0 +1,164 @@
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from app.core.configs.settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+# 转换引擎名 -> 模块名; 引擎在第一次使用时才导入, 避免每次启动/--reload 都付出全部导入开销
+engine_modules = {
+    "pdf2docx": "pdf2docx",
+    "pymupdf": "fitz",
+    "mammoth": "mammoth",
+    "pandas": "pandas",
+    "openpyxl": "openpyxl",
+    "weasyprint": "weasyprint",
+    "pdfkit": "pdfkit",
+    "markitdown": "markitdown",
+    "html2docx": "html2docx",
+    "markdownify": "markdownify",
+    "html2text": "html2text",
+    "tomd": "tomd",
+    "html2markdown": "html2markdown",
+    "markdown_it": "markdown_it",
+    "markdown": "markdown",
+    "mistune": "mistune",
+    "commonmark": "commonmark",
+    "marko": "marko",
+    "pillow": "PIL.Image",
+}
+
+_loaded: Dict[str, ModuleType] = {}
+_import_times: Dict[str, float] = {}
+_instances: Dict[str, Any] = {}
+_thread_instances = threading.local()
+_instance_lock = threading.Lock()
+
+
+def load_engine(name: str) -> ModuleType:
+    """按需导入转换引擎模块, 同一进程内只导入一次"""
+    module = _loaded.get(name)
+    if module is None:
+        start_time = time.perf_counter()
+        module = importlib.import_module(engine_modules.get(name, name))
+        _import_times[name] = time.perf_counter() - start_time
+        _loaded[name] = module
+        logger.info(f"Engine '{name}' loaded in {_import_times[name] * 1000:.1f} ms.")
+    return module
+
+def _markitdown() -> Any:
+    return load_engine("markitdown").MarkItDown(enable_plugins=settings.markitdown_enable_plugins)
+
+def _markdown_it() -> Any:
+    return load_engine("markdown_it").MarkdownIt(settings.markdown_it_preset)
+
+def _commonmark() -> Any:
+    commonmark = load_engine("commonmark")
+    return commonmark.Parser(), commonmark.HtmlRenderer()
+
+def _markdown() -> Any:
+    return load_engine("markdown").Markdown()
+
+# 引擎名 -> (实例工厂, 是否线程安全). 构造开销大的解析器/渲染器 (MarkItDown 会注册全部转换器并探测可选依赖)
+# 在每个工作进程中只构造一次, 配置在构造时固定; commonmark 与 markdown 的实例在自身上保存解析状态, 按线程各持一份
+engine_factories: Dict[str, Tuple[Callable[[], Any], bool]] = {
+    "markitdown": (_markitdown, True),
+    "markdown_it": (_markdown_it, True),
+    "commonmark": (_commonmark, False),
+    "markdown": (_markdown, False),
+}
+
+
+def _build_instance(name: str) -> Any:
+    start_time = time.perf_counter()
+    instance = engine_factories[name][0]()
+    logger.info(f"Engine instance '{name}' created in {(time.perf_counter() - start_time) * 1000:.1f} ms.")
+    return instance
+
+def get_engine_instance(name: str) -> Any:
+    """返回引擎的复用实例, 同一进程内只构造一次 (非线程安全的实例每个线程一份)"""
+    if not engine_factories[name][1]:
+        instances = _thread_instances.__dict__
+        if name not in instances:
+            instances[name] = _build_instance(name)
+        return instances[name]
+    instance = _instances.get(name)
+    if instance is None:
+        with _instance_lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = _build_instance(name)
+    return instance
+
+def preload_engines(names: Iterable[str]) -> None:
+    """预热常用引擎 (有实例工厂的同时构造实例); 某个引擎不可用时只记录错误, 不影响启动"""
+    for name in names:
+        try:
+            load_engine(name)
+            if name in engine_factories:
+                get_engine_instance(name)
+        except Exception as e:
+            logger.error(f"Failed to preload engine '{name}': {type(e).__name__}: {e}")
+
+def engine_stats() -> dict:
+    return {name: round(seconds * 1000, 1) for name, seconds in _import_times.items()}
+
+
+if __name__ == "__main__":
+    # 启动耗时对比: 每个引擎在全新解释器中的冷导入耗时, 以及 convert_file 模块在全量导入与按需导入下的启动耗时;
+    # 微基准: 小文档转换每次新建引擎对象与复用 get_engine_instance 实例的单次耗时, 并核对输出一致
+    import io
+    import subprocess
+    import sys
+    import timeit
+
+    def cold_import_ms(statement: str) -> str:
+        code = f"import time; t = time.perf_counter(); {statement}; print((time.perf_counter() - t) * 1000)"
+        result = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True)
+        return f"{float(result.stdout.strip().splitlines()[-1]):9.1f} ms" if result.returncode == 0 else "unavailable"
+
+    print(f"{'engine':<16}{'cold import':>14}")
+    available = []
+    for engine_name, module_name in engine_modules.items():
+        cost = cold_import_ms(f"import {module_name}")
+        available += [module_name] if cost != "unavailable" else []
+        print(f"{engine_name:<16}{cost:>14}")
+    eager = "; ".join(f"import {m}" for m in available)
+    print(f"{'all engines (before, eager)':<36}{cold_import_ms(eager):>14}")
+    print(f"{'convert_file (after, lazy)':<36}{cold_import_ms('import app.services.convert_file'):>14}")
+    # 按需导入: 导入 convert_file 后不应有任何引擎模块被加载
+    check = ("import sys, app.services.convert_file; from app.services.engines import engine_modules; "
+             "print(sorted(m for m in engine_modules.values() if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", check], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]", f"engines imported eagerly: {result.stdout.splitlines()[-1]}"
+
+    markdown_raw = "# Title\n\nSome *emphasis* and `code`.\n\n- one\n- two\n\n[link](https://example.com)\n"
+    html_raw = b"<html><body><h1>Title</h1><p>Some <em>emphasis</em>.</p><ul><li>one</li></ul></body></html>"
+
+    def commonmark_render(parser, renderer) -> str:
+        return renderer.render(parser.parse(markdown_raw))
+
+    cases = {
+        "markitdown": (lambda: load_engine("markitdown").MarkItDown().convert(io.BytesIO(html_raw)).text_content,
+                       lambda: get_engine_instance("markitdown").convert(io.BytesIO(html_raw)).text_content),
+        "markdown_it": (lambda: load_engine("markdown_it").MarkdownIt().render(markdown_raw),
+                        lambda: get_engine_instance("markdown_it").render(markdown_raw)),
+        "commonmark": (lambda: commonmark_render(load_engine("commonmark").Parser(), load_engine("commonmark").HtmlRenderer()),
+                       lambda: commonmark_render(*get_engine_instance("commonmark"))),
+        "markdown": (lambda: load_engine("markdown").markdown(markdown_raw),
+                     lambda: get_engine_instance("markdown").reset().convert(markdown_raw)),
+    }
+    print(f"\n{'engine':<16}{'new per call':>14}{'reused':>12}{'speedup':>9}  identical")
+    for engine_name, (new, reused) in cases.items():
+        number = 20 if engine_name == "markitdown" else 500
+        identical = new() == reused() == reused()
+        assert identical, f"{engine_name}: reused instance renders differently"
+        assert get_engine_instance(engine_name) is get_engine_instance(engine_name), f"{engine_name}: instance not reused"
+        new_ms = min(timeit.repeat(new, number=number, repeat=3)) / number * 1000
+        reused_ms = min(timeit.repeat(reused, number=number, repeat=3)) / number * 1000
+        print(f"{engine_name:<16}{new_ms:>11.3f} ms{reused_ms:>9.3f} ms{new_ms / reused_ms:>8.1f}x  {identical}")
@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import copy
 import json
@@ -10,64 +11,147 @@ from typing import Union
 from urllib.parse import urlparse, unquote, quote
 
 from fastapi import HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 
 from app.core.configs.settings import settings
+from app.models.exception_model import InputError
 from app.models.file_conversion import FileConvertParams
 from app.models.file_conversion import FileDataModel
 from app.models.request_model import FileModelRequest
 from app.models.response_model import FileModelResponse
+from app.services.conversion_cache import conversion_cache, hash_raw, make_cache_key
+from app.services.conversion_executor import conversion_executor
+from app.services.converter_registry import parse_convert_type
 from app.utils.exception import file_exception
-from app.utils.file import (async_get_bytes_from_file, get_bytes_from_url, async_get_bytes_from_path,
+from app.utils.file import (async_get_bytes_from_file, async_spool_file, async_get_bytes_from_path, link_or_copy_file,
                             get_bytes_from_base64, get_full_path, add_timestamp_to_filepath, local_path_to_url,
                             url_to_local_path, convert_bytes_to_base64, async_save_string_or_bytes_to_path,
                             get_short_data, copy_file, binary_to_text, is_text_file, text_to_binary,
-                            get_mime_from_extension, raw_to_stream, gen_resource_locations)
-from app.utils.func_map import get_file_conversion
-from app.utils.logger import get_logger
+                            get_mime_from_extension, get_extension_from_mime, gen_resource_locations, async_file_to_base64,
+                            iter_raw_chunks)
+from app.utils.func_map import converter_registry
+from app.utils.http_client import async_download_url_to_path
+from app.utils.logger import cap_fields, get_logger, request_log_enabled
+from app.utils.metrics import CACHE_LOOKUPS, IN_FLIGHT, INPUT_BYTES, OUTPUT_BYTES, converter_timer, set_stage_labels, stage
 
 logger = get_logger()
 
-def get_converter(convert_type):
-    if "aspose" in convert_type:
-        pass
-    conversion_map = get_file_conversion()
-    base_convert_type = convert_type.lower().split("-")[0].split("_")[0]
-    converter = conversion_map.get(base_convert_type)
-    if converter is None:
-        raise ValueError(f"不支持的转换类型: {base_convert_type}")
-    return converter
-
-async def handle_file_operation(request_model: FileModelRequest, file, mode, convert_type='') -> Union[JSONResponse, StreamingResponse]:
+async def report_progress(progress, value: float, stage: str) -> None:
+    if progress is not None:
+        await progress(value, stage)
+
+async def handle_file_operation(request_model: FileModelRequest, file, mode, convert_type='') -> Union[JSONResponse, StreamingResponse, FileResponse]:
     try:
-        logger.info(f"{mode.capitalize()} file request param: {request_model.model_dump()}.")
-        raw, name, extension, size, info = await get_raw(request_model, mode=mode, file=file)
-        logger.info(info)
+        results, return_stream, return_file = await process_file_operation(request_model, file, mode, convert_type)
+        response = build_response(return_stream, results, results.data.file_name, results.data.file_format, request_model.return_stream, return_file)
+        return response
+    except Exception as e:
+        code, status, msg = file_exception(e)
+        logger.error(traceback.format_exc())
+        logger.error(msg)
+        content = FileModelResponse(code=code, messages=msg).model_dump()
+        return JSONResponse(status_code=status, content=content)
+
+async def process_file_operation(request_model: FileModelRequest, file, mode, convert_type='', source=None,
+                                 progress=None, private_output=False) -> tuple[FileModelResponse, Union[str, bytes, None], str]:
+    """文件操作核心流程, 返回 (results, return_stream, return_file), 出错时直接抛出异常.
+
+    return_stream 为需要流式返回的内存内容; 输出已落盘时改为 return_file, 由 FileResponse 直接发送文件.
+
+    source 为已获取的 get_raw 结果 (异步任务在提交时已落盘输入), progress 为可选的进度回调 async (value, stage).
+    private_output 为 True 时输出文件归调用方所有 (异步任务到期后会删除): 命中缓存时总是写出新文件, 不复用缓存记录的输出.
+    """
+    source_path, labels = "", None
+    try:
+        if request_log_enabled():
+            logger.info(f"{mode.capitalize()} file request param: {cap_fields(request_model.model_dump())}.")
         extra, code = request_model.extra, 0
         category = extra.get("category", "manager")
         protected_dir, protected_url = gen_resource_locations("protected", "files", category)
         public_dir, public_url = gen_resource_locations("public", "files", category)
-        if not raw:
-            raise ValueError("No valid file raw found.")
+        spool_dir = {"upload": protected_dir, "convert": public_dir}.get(mode, "")
+        # 先解析转换类型, 不支持的类型在读取文件之前就失败
+        spec, parsed = converter_registry.resolve(convert_type, extra.get("steps")) if mode == "convert" else (None, None)
+        # 指标标签只用注册表中的名称, 组合出的多阶段转换 (via/steps) 统一记为 pipeline, 避免标签基数随请求增长
+        metric_type = ("pipeline" if spec.stages else spec.name) if spec else ""
+        labels = {"mode": mode, "convert_type": metric_type}
+        set_stage_labels(**labels)
+        IN_FLIGHT.inc(**labels)
+        if source is None:
+            with stage("get_raw"):
+                source = await get_raw(request_model, mode=mode, file=file, spool_dir=spool_dir)
+        raw, name, extension, size, info, source_path, digest = source
+        INPUT_BYTES.observe(size, **labels)
+        await report_progress(progress, 0.2, "loaded")
+        logger.info(info)
+        if not raw and not source_path:
+            raise InputError("No valid file raw found.")
+        # 分块落盘的文件仅在调用方需要原始内容时才读回内存 (stream/base64 可以直接从落盘文件生成)
+        need_raw = mode != "convert" and (request_model.return_raw or (request_model.return_stream and not request_model.do_save))
+        if raw is None and need_raw:
+            with stage("read_input"):
+                raw, _ = await async_get_bytes_from_path(source_path)
+        return_file = ""  # 输出已落盘且请求结束后仍保留时, 直接按路径返回
         if mode == "upload":
-            return_url, return_path = await save_file_and_get_url(request_model.data.file_path, protected_dir, raw, request_model.do_save, name, extension)
-            return_raw, return_stream = (raw, raw_to_stream(raw)) if request_model.return_stream else (raw, None)
+            with stage("save"):
+                return_url, return_path = await save_file_and_get_url(request_model.data.file_path, protected_dir, raw, request_model.do_save, name, extension, source_path)
+            return_raw = raw
+            return_file = return_path if request_model.do_save else ""
         elif mode == "convert":
-            _, save_path = await save_file_and_get_url(request_model.data.file_path, public_dir, raw, request_model.do_save, name, extension)
+            with stage("save"):
+                _, save_path = await save_file_and_get_url(request_model.data.file_path, public_dir, raw, request_model.do_save, name, extension, source_path)
+            input_path = source_path or save_path
             convert_url, convert_path, name, extension = await get_convert_path_and_url(save_path, convert_type)
+            if private_output:
+                # 同一秒内同名输入的输出路径相同; 调用方独占的输出使用唯一文件名, 不与其他请求的输出互相覆盖
+                convert_url, convert_path, name = unique_output_path(convert_path)
             extra.setdefault("is_text", is_text_file(convert_path))
-            params_dict = {"convert_type": convert_type, "input_raw": raw, "input_path": save_path, "output_path": convert_path, "extra": extra}
+            params_dict = {"convert_type": parsed.name, "engine": spec.engine, "input_raw": raw, "input_path": input_path, "output_path": convert_path, "extra": extra}
             params = FileConvertParams.from_dict(params_dict)
-            converter = get_converter(convert_type)
-            convert_raw, convert_stream, output_save_path = await converter(params)
-            if not output_save_path and request_model.do_save:
-                convert_path = await async_save_string_or_bytes_to_path(convert_raw, convert_path)
-            return_url, return_path, return_raw, return_stream = convert_url, convert_path, convert_raw, convert_stream
+            cache_key = make_cache_key(digest or hash_raw(raw), parsed.name, params.extra)
+            with stage("cache"):
+                cached = await conversion_cache.get(cache_key)
+            CACHE_LOOKUPS.inc(convert_type=metric_type, result="miss" if cached is None else "hit")
+            if cached is not None:
+                convert_raw = cached.raw
+                extra.update(cached.meta)
+                extra["cache"] = "hit"
+                saved_path = cached.saved_path() if request_model.do_save and not private_output else ""
+                if saved_path:
+                    convert_url, convert_path, name = cached.url, saved_path, Path(saved_path).stem
+                    return_file = convert_path
+                elif request_model.do_save:
+                    # 缓存记录的输出已被删除或替换: 从缓存内容重新写出, 不再回写缓存 (内容未变)
+                    remove_stale_output(convert_path)
+                    with stage("save"):
+                        if convert_raw is None:
+                            await asyncio.to_thread(link_or_copy_file, cached.data_path, convert_path)
+                        else:
+                            convert_path = await async_save_string_or_bytes_to_path(convert_raw, convert_path)
+                    return_file = convert_path
+                else:
+                    return_file = cached.data_path  # 只在磁盘层的文件结果, 直接按缓存文件返回
+            else:
+                await report_progress(progress, 0.3, "converting")
+                remove_stale_output(convert_path)
+                # 转换器可以只返回输出路径 (raw 为 None), 内容不经过内存
+                with stage("convert"), converter_timer(metric_type, "pipeline" if spec.stages else spec.engine):
+                    convert_raw, _, output_save_path = await conversion_executor.submit(parsed.base, spec.handler, params)
+                if not output_save_path and request_model.do_save:
+                    with stage("save"):
+                        convert_path = await async_save_string_or_bytes_to_path(convert_raw, convert_path)
+                saved = request_model.do_save or bool(output_save_path)
+                return_file = (output_save_path or convert_path) if saved else ""
+                await conversion_cache.put(cache_key, convert_raw, convert_path if saved else "", convert_url if saved else "",
+                                           params.meta, share=not private_output)
+                extra.update(params.meta)
+                extra["cache"] = "miss"
+            return_url, return_path, return_raw = convert_url, convert_path, convert_raw
         elif mode == "download":
             save_url = request_model.data.file_url
             save_path = request_model.data.file_path
             if not any([save_url, save_path]):
-                raise ValueError("No valid file url or file path found.")
+                raise InputError("No valid file url or file path found.")
             elif save_url and save_url.startswith(protected_url):
                 save_path = url_to_local_path(save_url, protected_url, protected_dir)
             if save_path.startswith(protected_dir):
@@ -77,81 +161,126 @@ async def handle_file_operation(request_model: FileModelRequest, file, mode, con
             else:
                 return_path = save_path
                 return_url = save_url
-            return_raw, return_stream = (raw, raw_to_stream(raw)) if request_model.return_stream else (raw, None)
-        elif mode == "extract":
+            return_raw = raw
+        elif mode in ("extract", "fill"):
             return_url, return_path = "", ""
-            return_raw, return_stream = (raw, raw_to_stream(raw)) if request_model.return_stream else (raw, None)
-        elif mode == "fill":
-            return_url, return_path = "", ""
-            return_raw, return_stream = (raw, raw_to_stream(raw)) if request_model.return_stream else (raw, None)
+            return_raw = raw
         else:
             return_url = request_model.data.file_url
             return_path = request_model.data.file_path
-            return_raw, return_stream = (raw, raw_to_stream(raw)) if request_model.return_stream else (raw, None)
+            return_raw = raw
+        if return_raw is None and return_file and (request_model.return_raw or (request_model.return_stream and not os.path.exists(return_file))):
+            with stage("read_output"):
+                return_raw, _ = await async_get_bytes_from_path(return_file)
+                return_raw = binary_to_text(return_raw) if is_text_file(extension) else return_raw
+        if return_raw is not None:
+            OUTPUT_BYTES.observe(len(return_raw), **labels)  # 文本按字符数计
+        elif return_file and os.path.exists(return_file):
+            OUTPUT_BYTES.observe(os.path.getsize(return_file), **labels)
         messages = f"File {mode}ed successfully. {info}"
         name = f"{name}{extension}"
-        base64_str = convert_bytes_to_base64(raw, extension)
-        full_base64, short_base64 = get_short_data(base64_str, request_model.return_base64, request_model.return_stream)
-        full_raw, short_raw = get_short_data(return_raw, request_model.return_raw, request_model.return_stream)
+        # base64 只在请求时生成, 编码的是返回的文件 (转换时为输出文件), 流式返回时不需要
+        base64_str = ""
+        if request_model.return_base64 and not request_model.return_stream:
+            # 未保存的上传/下载等: 没有 return_file, 直接从分块落盘的源文件编码 (请求结束后才删除)
+            base64_file = return_file or (source_path if mode != "convert" else "")
+            with stage("base64"):
+                base64_str = convert_bytes_to_base64(return_raw, extension) if return_raw is not None \
+                    else await async_file_to_base64(base64_file, extension, settings.stream_chunk_size)
+        full_base64, short_base64 = get_short_data(base64_str, request_model.return_base64, request_model.return_stream) if base64_str else ("", "")
+        full_raw, short_raw = get_short_data(return_raw if return_raw is not None else "", request_model.return_raw, request_model.return_stream)
         results, results_log = build_results(request_model, code, messages, extra, name, extension, return_url, return_path,
                                              full_base64, short_base64, full_raw, short_raw)
-        logger.info(f"{mode.capitalize()} file response param: {results_log.model_dump()}.")
-        if results.data.is_empty() and not return_stream:
-            raise HTTPException(status_code=400, detail=f"No return file information, data.is_empty: {results.data.is_empty()} and not return_stream: {not return_stream}.")
-        response = build_response(return_stream, results, name, extension, request_model.return_stream)
-        return response
-    except Exception as e:
-        code, status, msg = file_exception(e)
-        logger.error(traceback.format_exc())
-        logger.error(msg)
-        content = FileModelResponse(code=code, messages=msg).model_dump()
-        return JSONResponse(status_code=status, content=content)
+        if request_log_enabled():
+            logger.info(f"{mode.capitalize()} file response param: {cap_fields(results_log.model_dump())}.")
+        return_stream = None
+        if request_model.return_stream:
+            return_file = return_file if return_file and os.path.exists(return_file) else ""
+            return_stream = return_raw if not return_file else None
+            if return_stream is None and not return_file:
+                raise ValueError("No file content to stream.")
+        if results.data.is_empty() and not request_model.return_stream:
+            raise HTTPException(status_code=400, detail=f"No return file information, data.is_empty: {results.data.is_empty()}.")
+        return results, return_stream, return_file
+    finally:
+        if labels is not None:
+            IN_FLIGHT.dec(**labels)
+        # 未要求保存时, 分块落盘的临时文件在请求结束后删除
+        if source_path and not request_model.do_save and os.path.exists(source_path):
+            os.remove(source_path)
 
-async def parse_file_request(request) -> FileModelRequest:
+async def parse_file_request(request, model=FileModelRequest) -> FileModelRequest:
     request_content_type = request.headers.get('content-type', '')
     if 'multipart/form-data' in request_content_type or 'application/x-www-form-urlencoded' in request_content_type:
         form_data = await request.form()
         form_dict = dict(form_data)
-        for key in ("extra","data", ):  # 可以扩展多个需要反序列化的字段
+        for key in ("extra","data", "items"):  # 可以扩展多个需要反序列化的字段
             value = form_dict.get(key)
-            if key in form_dict and isinstance(value, str) and value.strip().startswith("{") and value.strip().endswith("}"):
+            if key in form_dict and isinstance(value, str) and value.strip()[:1] + value.strip()[-1:] in ("{}", "[]"):
                 try:
                     form_dict[key] = json.loads(value)
                 except json.JSONDecodeError:
                     raise HTTPException(status_code=400, detail=f"Invalid JSON in 【'{key}': '{value}'】 field")
-        request_data = FileModelRequest(**form_dict)
+        request_data = model(**form_dict)
     elif "application/json" in request_content_type:
         json_data = await request.json()
-        request_data = FileModelRequest(**json_data)
+        request_data = model(**json_data)
     else:
         raise HTTPException(status_code=415, detail="Unsupported Content-Type")
     return request_data
 
-async def get_raw(request_data, mode, file) -> tuple[Union[str, bytes], str, str, int, str]:
+async def get_raw(request_data, mode, file, spool_dir="") -> tuple[Union[str, bytes, None], str, str, int, str, str, str]:
+    """获取输入文件, 返回 (raw, name, ext, size, info, path, digest).
+
+    传入 spool_dir 时, 上传的二进制文件会分块写入磁盘而不读入内存: do_save 时直接写到 spool_dir 下的最终位置,
+    否则写到临时目录; 此时 raw 为 None, 由 path 指向文件, digest 为边写边算的 sha256.
+    """
     data = request_data.data
     category = request_data.extra.get("category", "manager")
     static_root: str = settings.static_root
     temp_dir = os.path.join(static_root, 'temp', 'files', category)
     split_name, split_ext = os.path.splitext(data.file_name or "")
+    source_path, source_digest = "", ""
     if data.is_empty() and not file:
             raise HTTPException(status_code=400, detail=f"Missing file information, data.is_empty: {request_data.data.is_empty()} and not file: {not file}.")
     if file and mode != "download":
         file_split_name, file_split_ext = os.path.splitext(file.filename or "")
         source_name = split_name or file_split_name or file.filename or uuid.uuid4().hex[:8]
-        source_raw, _, file_extension = await async_get_bytes_from_file(file)
+        file_extension = get_extension_from_mime(file.content_type or "")
         source_ext = data.file_format or split_ext or file_split_ext or file_extension or ".bin"
-        source_raw = binary_to_text(source_raw) if is_text_file(source_ext) else source_raw
-        source_size = len(source_raw)
+        if spool_dir and not is_text_file(source_ext):
+            if request_data.do_save:
+                source_path = get_full_path(spool_dir, data.file_path, source_name, source_ext, "full")
+            else:
+                os.makedirs(temp_dir, exist_ok=True)
+                source_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}{source_ext}")
+            source_raw = None
+            source_size, source_digest = await async_spool_file(file, source_path, settings.upload_chunk_size)
+        else:
+            source_raw, _, _ = await async_get_bytes_from_file(file)
+            source_raw = binary_to_text(source_raw) if is_text_file(source_ext) else source_raw
+            source_size = len(source_raw)
         source_info = f"Get File mode: file, Name: {source_name}, Extension: {source_ext}, Size: {source_size} bytes."
     elif data.file_url:
         parsed_url = urlparse(data.file_url)
         url_path = unquote(parsed_url.path)
         url_split_name, url_split_ext = os.path.splitext(os.path.basename(url_path))
         source_name = split_name or url_split_name or uuid.uuid4().hex[:8]
-        source_raw, _, file_extension = await get_bytes_from_url(data.file_url)
-        source_ext = data.file_format or split_ext or url_split_ext or file_extension or ".html"
-        source_raw = binary_to_text(source_raw) if is_text_file(source_ext) else source_raw
-        source_size = len(source_raw)
+        download_path, source_size, source_digest, content_type = await async_download_url_to_path(data.file_url)
+        source_ext = data.file_format or split_ext or url_split_ext or get_extension_from_mime(content_type) or ".html"
+        if spool_dir and not is_text_file(source_ext):
+            # 二进制文件不读入内存: 链接 (不支持时复制) 到最终位置或临时位置 (请求结束后删除), 不影响下载缓存
+            if request_data.do_save:
+                source_path = get_full_path(spool_dir, data.file_path, source_name, source_ext, "full")
+            else:
+                os.makedirs(temp_dir, exist_ok=True)
+                source_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}{source_ext}")
+            await asyncio.to_thread(link_or_copy_file, download_path, source_path)
+            source_raw = None
+        else:
+            source_raw, _ = await async_get_bytes_from_path(download_path)
+            source_raw = binary_to_text(source_raw) if is_text_file(source_ext) else source_raw
+            source_size = len(source_raw)
         source_info = f"Get File mode: url, Name: {source_name}, Extension: {source_ext}, Size: {source_size} bytes."
     elif data.file_base64 and mode != "download":
         source_name = split_name or uuid.uuid4().hex[:8]
@@ -185,21 +314,39 @@ async def get_raw(request_data, mode, file) -> tuple[Union[str, bytes], str, str
         source_info = f"Get File mode: name, Name: {source_name}, Extension: {source_ext}, Size: {source_size} {type(source_raw).__name__}."
     else:
         raise HTTPException(status_code=400, detail="Unsupported file mode provided. Missing file information: no file_url, file_path, file_base64, file_name, or uploaded file provided.")
-    return source_raw, source_name, source_ext, source_size, source_info
+    return source_raw, source_name, source_ext, source_size, source_info, source_path, source_digest
 
-async def save_file_and_get_url(path, directory, raw, do_save, name, extension):
+async def save_file_and_get_url(path, directory, raw, do_save, name, extension, source_path=""):
     st_fmt = "full" if do_save else "null"
+    if do_save and source_path:
+        # 上传时已分块写入最终位置, 无需再次写盘
+        save_url = local_path_to_url(source_path, settings.static_url, settings.static_root) \
+            if source_path.startswith(settings.static_root) else ''
+        return save_url, source_path
     save_path = get_full_path(directory, path, name, extension, st_fmt)
     save_url = local_path_to_url(save_path, settings.static_url, settings.static_root) \
         if save_path and save_path.startswith(settings.static_root) else ''
     save_path = await async_save_string_or_bytes_to_path(raw, save_path) if do_save else save_path
     return save_url, save_path
 
+def remove_stale_output(path: str) -> None:
+    # 同名输出 (按分钟加时间戳) 可能已硬链接进转换缓存的磁盘层, 先删除再写, 不原地覆盖缓存内容
+    if os.path.exists(path):
+        os.remove(path)
+
+def unique_output_path(path: str) -> tuple[str, str, str]:
+    stem, ext = os.path.splitext(path)
+    unique_path = f"{stem}[{uuid.uuid4().hex[:8]}]{ext}"
+    unique_url = local_path_to_url(unique_path, settings.static_url, settings.static_root) \
+        if unique_path.startswith(settings.static_root) else ''
+    return unique_url, unique_path, Path(unique_path).stem
+
 async def get_convert_path_and_url(path, convert_type):
-    src_ext, dst_ext = convert_type.lower().split("-")[0].split("_")[0].split("2", 1)
+    parsed = parse_convert_type(convert_type)
+    src_ext, dst_ext = parsed.src, parsed.dst
     path_ext = os.path.splitext(path)[1]
     if path_ext != f".{src_ext}":
-        raise ValueError(f"文件{path}扩展名与转换类型不匹配: {path_ext} != .{src_ext}")
+        raise InputError(f"文件{path}扩展名与转换类型不匹配: {path_ext} != .{src_ext}")
     ext_path = Path(path).with_suffix(f".{dst_ext}")
     ts_path = Path(add_timestamp_to_filepath(str(ext_path), fmt='minute'))
     convert_name, convert_ext, convert_path = ts_path.stem, ts_path.suffix, str(ts_path)
@@ -216,7 +363,7 @@ def build_results(request, code, messages, extra, name, fmt, url, path, full_bas
     results_log.data.file_raw = short_raw
     return results, results_log
 
-def build_response(content, results, name, extension, return_stream):
+def build_response(content, results, name, extension, return_stream, file_path=""):
     if return_stream:
         metadata_json = json.dumps(results.model_dump(), ensure_ascii=False)
         # import base64
@@ -225,11 +372,31 @@ def build_response(content, results, name, extension, return_stream):
         quoted_name = quote(name)
         ascii_safe_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
         media_type = "application/octet-stream" or get_mime_from_extension(extension)
-        headers = {"X-File-Metadata": metadata_url, "Content-Disposition": f'attachment; filename="{ascii_safe_name}"; filename*=UTF-8''{quoted_name}'}
-        return StreamingResponse(content=content, media_type=media_type, headers=headers)
+        headers = {"X-File-Metadata": metadata_url, "Content-Disposition": f'attachment; filename="{ascii_safe_name}"; filename*=UTF-8\'\'{quoted_name}'}
+        if file_path:
+            # 已落盘的文件交给 FileResponse 发送 (sendfile, 支持 Range)
+            return FileResponse(file_path, media_type=media_type, headers=headers)
+        return StreamingResponse(content=iter_raw_chunks(content, settings.stream_chunk_size), media_type=media_type, headers=headers)
     else:
 
         return JSONResponse(status_code=200, content=results.model_dump())
 
 
 
+
+
+if __name__ == "__main__":
+    # 回归检查: 上传二进制文件, return_base64 且不保存时从临时源文件编码 (曾因 return_file 为空返回 500)
+    from fastapi.testclient import TestClient
+    from app.f_main import app
+
+    payload = bytes(range(256)) * 64
+    headers = {"Authorization": f"Bearer {settings.secret_key}"}
+    with TestClient(app) as client:
+        for form in ({"return_base64": "true"}, {"return_base64": "true", "do_save": "true"}):
+            response = client.post(f"{settings.api_prefix_v1}/file_manager/upload_file", headers=headers,
+                                   files={"file": ("check.bin", payload)}, data=form)
+            assert response.status_code == 200, response.text
+            encoded = response.json()["data"]["file_base64"]
+            assert base64.b64decode(encoded.split(",", 1)[-1]) == payload, form
+            print(f"upload {form}: ok")
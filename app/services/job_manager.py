@@ -0,0 +1,156 @@
+import asyncio
+import os
+import time
+import traceback
+import uuid
+from typing import List, Optional
+
+from app.core.configs.settings import settings
+from app.db.job_store import JobStore, create_job_store
+from app.models.job_model import JobModel
+from app.models.request_model import FileModelRequest
+from app.services.file_manager import get_raw, process_file_operation, save_file_and_get_url
+from app.utils.exception import file_exception
+from app.utils.file import async_get_bytes_from_path, binary_to_text, gen_resource_locations, is_text_file
+from app.utils.func_map import converter_registry
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class JobManager:
+    """异步转换任务: 提交时落盘输入并立即返回 job_id, 由进程内队列的 worker 执行, 状态持久化到 JobStore"""
+
+    def __init__(self, store: JobStore, workers: int = 2, retention: float = 0):
+        self.store = store
+        self.workers = workers
+        self.retention = retention
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        await self.store.init()
+        self._queue = asyncio.Queue()
+        # 上次退出时未完成的任务 (排队中或执行中被中断) 重新入队
+        for job in await self.store.list_unfinished():
+            job.status, job.progress, job.stage = "queued", 0.0, "requeued"
+            await self.store.save(job)
+            self._queue.put_nowait(job.job_id)
+        if self._queue.qsize():
+            logger.info(f"Requeued {self._queue.qsize()} unfinished jobs.")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if self.retention > 0:
+            self._tasks.append(asyncio.create_task(self._cleanup()))
+        logger.info(f"Job manager started: workers={self.workers}.")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.store.close()
+
+    async def submit(self, request_model: FileModelRequest, file, convert_type: str) -> JobModel:
+        """校验转换类型并把输入落盘到 public 目录, 结果同样保存在 public 目录, 通过静态 URL 获取"""
+        if self._queue is None:
+            raise RuntimeError("Job manager is not started.")
+        _, parsed = converter_registry.resolve(convert_type, request_model.extra.get("steps"))
+        request_model.do_save = True
+        public_dir, _ = gen_resource_locations("public", "files", request_model.extra.get("category", "manager"))
+        raw, name, extension, size, info, source_path, digest = await get_raw(request_model, mode="convert", file=file,
+                                                                              spool_dir=public_dir)
+        if not source_path:
+            _, source_path = await save_file_and_get_url(request_model.data.file_path, public_dir, raw, True, name, extension)
+        now = time.time()
+        # 输入已落盘, 请求中的文件内容与来源地址不入库
+        request = request_model.model_dump(exclude={"data": {"file_base64", "file_raw", "file_url"}})
+        job = JobModel(job_id=uuid.uuid4().hex, convert_type=parsed.name, request=request,
+                       source={"name": name, "extension": extension, "size": size, "info": info, "path": source_path,
+                               "digest": digest},
+                       created_at=now, updated_at=now)
+        await self.store.save(job)
+        self._queue.put_nowait(job.job_id)
+        logger.info(f"Job {job.job_id} queued: {parsed.name}, {info}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[JobModel]:
+        return await self.store.get(job_id)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "queued": self._queue.qsize() if self._queue else 0}
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await self.store.get(job_id)
+                if job is not None and job.status == "queued":
+                    await self._run(job)
+            except Exception as e:
+                logger.error(f"Job worker {index} failed on {job_id}: {type(e).__name__}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: JobModel) -> None:
+        async def progress(value: float, stage: str) -> None:
+            job.progress, job.stage = value, stage
+            await self.store.update_progress(job)
+
+        job.status = "running"
+        await progress(0.1, "running")
+        try:
+            source = job.source
+            raw = None
+            if is_text_file(source["extension"]):
+                raw, _ = await async_get_bytes_from_path(source["path"])
+                raw = binary_to_text(raw)
+            request_model = FileModelRequest(**job.request)
+            results, _, _ = await process_file_operation(
+                request_model, None, "convert", job.convert_type, progress=progress, private_output=True,
+                source=(raw, source["name"], source["extension"], source["size"], source["info"], source["path"],
+                        source["digest"]))
+            job.status, job.progress, job.stage = "done", 1.0, "done"
+            job.result = results.model_dump()
+            # 大的内联内容不入库, 结果文件通过 file_url 获取
+            data = job.result.get("data") or {}
+            for field in ("file_base64", "file_raw"):
+                if len(data.get(field) or "") > settings.job_result_inline_max:
+                    data[field] = ""
+        except Exception as e:
+            _, _, msg = file_exception(e)
+            logger.error(traceback.format_exc())
+            job.status, job.stage, job.error = "failed", "failed", msg
+        await self.store.save(job)
+        logger.info(f"Job {job.job_id} {job.status} in {time.time() - job.created_at:.2f}s.")
+
+    async def purge_expired(self, before: float) -> int:
+        """删除 updated_at 早于 before 的已结束任务及其输入/输出文件 (任务独占, 见 private_output), 返回任务数"""
+        jobs = await self.store.purge(before)
+        paths = [path for job in jobs
+                 for path in (job.source.get("path"), ((job.result or {}).get("data") or {}).get("file_path"))]
+        removed = await asyncio.to_thread(remove_job_files, paths)
+        if jobs:
+            logger.info(f"Purged {len(jobs)} expired jobs, removed {removed} files.")
+        return len(jobs)
+
+    async def _cleanup(self) -> None:
+        while True:
+            try:
+                await self.purge_expired(time.time() - self.retention)
+            except Exception as e:
+                logger.error(f"Job cleanup failed: {type(e).__name__}: {e}")
+            await asyncio.sleep(min(self.retention, 3600))
+
+
+def remove_job_files(paths: List[Optional[str]]) -> int:
+    # 只删除 static_root 下的文件, 请求中指定的外部路径不动
+    static_root, removed = os.path.abspath(settings.static_root), 0
+    for path in paths:
+        if path and os.path.abspath(path).startswith(static_root + os.sep) and os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+job_manager = JobManager(store=create_job_store(settings.database_url), workers=settings.job_workers,
+                         retention=settings.job_retention_seconds)
@@ -0,0 +1,216 @@
+import base64
+import hashlib
+import html
+import os
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Union
+
+from app.core.configs.settings import settings
+from app.services.engines import load_engine
+from app.utils.file import local_path_to_url
+
+# 直接基于 PyMuPDF 的版面信息生成 HTML/Markdown, 不再经过 pdf -> docx -> mammoth 的中间文档.
+# 与 convert_file 中的引擎函数一样在工作进程中运行, 参数与返回值须可 pickle.
+
+_BOLD_FLAG = 16  # span["flags"] 中表示粗体的位
+_HEADING_RATIOS = ((1.6, 1), (1.3, 2), (1.15, 3))  # 字号 / 正文字号 -> 标题级别
+_HEADING_MAX_CHARS = 200
+
+
+def _is_cjk(char: str) -> bool:
+    return "\u2e80" <= char <= "\u9fff" or "\uf900" <= char <= "\ufaff" or "\uff00" <= char <= "\uffef"
+
+def _join_lines(lines: List[str]) -> str:
+    """合并同一文本块中的多行: 英文补空格, 连字符断词和中文直接相连"""
+    text = ""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if not text:
+            text = line
+        elif text.endswith("-") and not text.endswith(" -"):
+            text = text[:-1] + line
+        elif _is_cjk(text[-1]) or _is_cjk(line[0]):
+            text += line
+        else:
+            text += " " + line
+    return text
+
+def _body_font_size(pages: List[dict]) -> float:
+    # 按字符数加权取最常见的字号作为正文字号
+    sizes = Counter()
+    for page in pages:
+        for block in page["blocks"]:
+            for line in block.get("lines", []):
+                for span in line["spans"]:
+                    sizes[round(span["size"], 1)] += len(span["text"].strip())
+    return sizes.most_common(1)[0][0] if sizes else 0.0
+
+def _heading_level(size: float, body_size: float, text: str) -> int:
+    if not body_size or len(text) > _HEADING_MAX_CHARS:
+        return 0
+    for ratio, level in _HEADING_RATIOS:
+        if size >= body_size * ratio:
+            return level
+    return 0
+
+def _format_span(text: str, bold: bool, to_md: bool) -> str:
+    if to_md:
+        text = text.replace("*", "\\*")
+        return f"**{text.strip()}** " if bold and text.strip() else text
+    text = html.escape(text)
+    return f"<b>{text}</b>" if bold and text.strip() else text
+
+def _render_block(block: dict, body_size: float, to_md: bool) -> str:
+    lines, plain_lines, size = [], [], 0.0
+    for line in block.get("lines", []):
+        spans = [s for s in line["spans"] if s["text"]]
+        size = max([size] + [s["size"] for s in spans])
+        plain_lines.append("".join(s["text"] for s in spans))
+        lines.append("".join(_format_span(s["text"], bool(s["flags"] & _BOLD_FLAG), to_md) for s in spans))
+    plain = _join_lines(plain_lines)
+    if not plain:
+        return ""
+    level = _heading_level(size, body_size, plain)
+    if level:
+        return f"{'#' * level} {plain}" if to_md else f"<h{level}>{html.escape(plain)}</h{level}>"
+    text = _join_lines(lines)
+    return text if to_md else f"<p>{text}</p>"
+
+def _render_table(rows: List[list], header: List[str], to_md: bool) -> str:
+    cell = (lambda v: ("" if v is None else str(v)).replace("|", "\\|").replace("\n", "<br>")) if to_md \
+        else (lambda v: html.escape("" if v is None else str(v)).replace("\n", "<br>"))
+    if not rows and not header:
+        return ""
+    header = header or rows.pop(0)
+    width = max(len(header), *(len(r) for r in rows)) if rows else len(header)
+    header = list(header) + [""] * (width - len(header))
+    if to_md:
+        lines = ["| " + " | ".join(cell(v) for v in header) + " |", "|" + " --- |" * width]
+        lines += ["| " + " | ".join(cell(v) for v in list(r) + [""] * (width - len(r))) + " |" for r in rows]
+        return "\n".join(lines)
+    lines = ["<table>", "<tr>" + "".join(f"<th>{cell(v)}</th>" for v in header) + "</tr>"]
+    lines += ["<tr>" + "".join(f"<td>{cell(v)}</td>" for v in r) + "</tr>" for r in rows]
+    lines.append("</table>")
+    return "\n".join(lines)
+
+def _image_src(image_raw: bytes, ext: str, policy: str, images_dir: str) -> Optional[str]:
+    """按 policy 处理图片, 与 text.handle_base64_images 的落盘与命名规则一致"""
+    if policy == "remove":
+        return None
+    ext = f".{ext or 'png'}"
+    if policy == "base64":
+        return f"data:image/{ext[1:]};base64,{base64.b64encode(image_raw).decode()}"
+    hash_name = hashlib.md5(image_raw).hexdigest()
+    save_path = Path(images_dir) / f"{hash_name}{ext}"
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    if not save_path.exists():
+        save_path.write_bytes(image_raw)
+    save_path = str(save_path).replace("\\", "/")
+    if policy == "path":
+        return save_path
+    return local_path_to_url(save_path, settings.static_url, settings.static_root)
+
+def _inside(bbox, rect) -> bool:
+    x = (bbox[0] + bbox[2]) / 2
+    y = (bbox[1] + bbox[3]) / 2
+    return rect[0] <= x <= rect[2] and rect[1] <= y <= rect[3]
+
+def pdf_to_html_or_md(input_path: str, input_raw: Union[bytes, None], to_md: bool, policy: str = "url",
+                      images_dir: str = "") -> str:
+    """一次遍历 PDF 页面, 直接输出 HTML 片段或 Markdown (含表格与图片)"""
+    fitz = load_engine("pymupdf")
+    doc = fitz.open(stream=input_raw, filetype="pdf") if input_raw is not None else fitz.open(input_path)
+    try:
+        pages, tables = [], []
+        for page in doc:
+            found = page.find_tables()
+            tables.append([(tab.bbox, tab.extract(), [] if not tab.header.external else tab.header.names)
+                           for tab in found.tables])
+            pages.append(page.get_text("dict"))
+    finally:
+        doc.close()
+    body_size = _body_font_size(pages)
+    parts = []
+    for page, page_tables in zip(pages, tables):
+        pending = sorted(page_tables, key=lambda t: t[0][1])
+        for block in page["blocks"]:
+            bbox = block["bbox"]
+            if any(_inside(bbox, t[0]) for t in page_tables):
+                continue
+            # 表格放在它下方第一个块之前, 保持原文阅读顺序
+            while pending and pending[0][0][1] <= bbox[1]:
+                _, rows, header = pending.pop(0)
+                parts.append(_render_table(rows, header, to_md))
+            if block["type"] == 1:
+                src = _image_src(block["image"], block.get("ext", ""), policy, images_dir)
+                if src:
+                    parts.append(f"![image]({src})" if to_md else f'<img src="{src}"/>')
+            else:
+                parts.append(_render_block(block, body_size, to_md))
+        parts += [_render_table(rows, header, to_md) for _, rows, header in pending]
+    return "\n\n".join(p for p in parts if p) if to_md else "\n".join(p for p in parts if p)
+
+
+if __name__ == "__main__":
+    # 基准: 直接引擎 vs 原有 pdf -> docx -> mammoth 路径. 默认生成一组带标题/段落/表格/图片的测试 PDF,
+    # 也可以在命令行传入真实 PDF 路径.
+    import re
+    import sys
+    import tempfile
+    import time
+
+    from app.services.convert_file import _pdf_to_docx, _docx_to_md_or_html
+
+    def make_fixture(pages: int) -> bytes:
+        fitz = load_engine("pymupdf")
+        doc = fitz.open()
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), False)
+        pixmap.set_rect(pixmap.irect, (30, 120, 200))
+        for i in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Chapter {i + 1}", fontsize=22)
+            page.insert_textbox(fitz.Rect(72, 100, 520, 260), "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8,
+                                fontsize=11)
+            top = 280
+            for r in range(5):
+                for c in range(3):
+                    cell = fitz.Rect(72 + c * 150, top + r * 20, 222 + c * 150, top + (r + 1) * 20)
+                    page.draw_rect(cell, color=(0, 0, 0), width=0.5)
+                    page.insert_text((cell.x0 + 4, cell.y1 - 6), f"r{r}c{c}" if r else f"col{c}", fontsize=9)
+            page.insert_image(fitz.Rect(72, 420, 172, 520), pixmap=pixmap)
+            page.insert_textbox(fitz.Rect(72, 540, 520, 700), "Sed do eiusmod tempor incididunt ut labore. " * 6, fontsize=11)
+        data = doc.tobytes()
+        doc.close()
+        return data
+
+    def check_fixture(pages: int, html_output: str, md_output: str, images_dir: str) -> None:
+        # 生成的测试 PDF 每页都有标题、5x3 表格和一张图片, 直接引擎的输出应完整保留这些结构
+        for i in range(pages):
+            assert f"<h1>Chapter {i + 1}</h1>" in html_output and f"# Chapter {i + 1}\n" in md_output, f"page {i + 1} heading"
+        assert html_output.count("<table>") == pages and html_output.count("<th>col0</th>") == pages, "tables"
+        assert md_output.count("| r4c0 | r4c1 | r4c2 |") == pages, "markdown tables"
+        image_paths = re.findall(r'<img src="([^"]+)"', html_output)
+        assert len(image_paths) == pages and all(p.startswith(images_dir) and os.path.exists(p) for p in image_paths), "images"
+
+    fixture_pages = (1, 10, 50)
+    corpus = [(f"fixture-{n}p", make_fixture(n)) for n in fixture_pages]
+    corpus += [(os.path.basename(p), open(p, "rb").read()) for p in sys.argv[1:]]
+    with tempfile.TemporaryDirectory() as images_dir:
+        print(f"{'document':<24}{'docx path html':>16}{'direct html':>14}{'direct md':>12}{'speedup':>9}")
+        for index, (name, pdf_raw) in enumerate(corpus):
+            start_time = time.perf_counter()
+            _docx_to_md_or_html(_pdf_to_docx("", pdf_raw), False)
+            docx_seconds = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            html_output = pdf_to_html_or_md("", pdf_raw, False, "path", images_dir)
+            html_seconds = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            md_output = pdf_to_html_or_md("", pdf_raw, True, "path", images_dir)
+            md_seconds = time.perf_counter() - start_time
+            if index < len(fixture_pages):
+                check_fixture(fixture_pages[index], html_output, md_output, images_dir)
+            print(f"{name:<24}{docx_seconds:>15.3f}s{html_seconds:>13.3f}s{md_seconds:>11.3f}s{docx_seconds / html_seconds:>8.1f}x")
+        print(pdf_to_html_or_md("", corpus[0][1], True, "path", images_dir)[:600])
@@ -0,0 +1,55 @@
+import os
+import time
+import uuid
+from typing import Tuple
+
+from app.core.configs.settings import settings
+from app.models.file_conversion import FileConvertParams
+from app.utils.file import async_get_bytes_from_path, binary_to_text, is_text_file, raw_to_stream
+from app.utils.logger import get_logger
+from app.utils.metrics import converter_timer
+
+logger = get_logger()
+
+# 多阶段转换 (如 xlsx2html2pdf): 上一阶段的输出直接作为下一阶段的 input_raw 传入, 不落盘也不经过 base64.
+# 只把结果写到 output_path 的阶段 (如 docx2pdf, 流式表格) 以文件交接; 下一阶段不能按路径读取时才读回内存.
+# 中间阶段的 input_path/output_path 指向 temp 目录, 转换器需要时自行落盘, 全部阶段结束后删除.
+
+
+async def run_pipeline(stages: Tuple, params: FileConvertParams) -> tuple:
+    """依次执行各阶段 (ConverterSpec), 各阶段耗时写入 params.meta["stages"]"""
+    temp_dir = os.path.join(settings.static_root, "temp", "pipeline")
+    os.makedirs(temp_dir, exist_ok=True)
+    run_id = uuid.uuid4().hex
+    raw, input_path, output_path = params.input_raw, params.input_path, ""
+    timings, temp_paths = [], []
+    try:
+        for index, spec in enumerate(stages):
+            last = index == len(stages) - 1
+            if index > 0 and raw is None and not spec.accepts_path:
+                raw, _ = await async_get_bytes_from_path(input_path)
+                raw = binary_to_text(raw) if is_text_file(input_path) else raw
+            stage_output = params.output_path if last else os.path.join(temp_dir, f"{run_id}-{index}.{spec.dst}")
+            if not last:
+                temp_paths.append(stage_output)
+            stage_params = FileConvertParams(convert_type=spec.name, engine=spec.engine, input_raw=raw,
+                                             input_path=input_path, output_path=stage_output, extra=params.extra)
+            start_time = time.perf_counter()
+            with converter_timer(spec.name, spec.engine):
+                raw, _, output_path = await spec.handler(stage_params)
+            seconds = time.perf_counter() - start_time
+            timings.append({"stage": spec.name, "engine": spec.engine, "seconds": round(seconds, 3)})
+            params.meta.update(stage_params.meta)
+            logger.info(f"Pipeline stage {index + 1}/{len(stages)} {spec.name} ({spec.engine}) done in {seconds:.2f}s.")
+            if raw is not None:
+                # 内存中的结果交给下一阶段, 路径仅供需要文件的转换器落盘使用
+                input_path = os.path.join(temp_dir, f"{run_id}-{index}-in.{spec.dst}")
+                temp_paths.append(input_path)
+            else:
+                input_path = output_path
+    finally:
+        for path in temp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+    params.meta["stages"] = timings
+    return raw, raw_to_stream(raw) if raw is not None else None, output_path
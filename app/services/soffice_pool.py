@@ -0,0 +1,370 @@
+import asyncio
+import os
+import shutil
+import socket
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Set
+
+from app.core.configs.settings import settings
+from app.models.exception_model import ConverterCrashError, ConverterTimeoutError
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+# LibreOffice 导出过滤器, 按目标扩展名选择
+export_filters = {
+    "pdf": "writer_pdf_Export",
+    "docx": "MS Word 2007 XML",
+    "odt": "writer8",
+    "html": "HTML (StarWriter)",
+    "txt": "Text",
+}
+
+
+def _uno_convert(port: int, input_path: str, output_path: str, filter_name: str) -> None:
+    """通过 UNO socket 让常驻 soffice 实例完成一次转换 (阻塞调用, 需在线程中执行)"""
+    import uno
+    from com.sun.star.beans import PropertyValue
+
+    def prop(name, value):
+        p = PropertyValue()
+        p.Name, p.Value = name, value
+        return p
+
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_ctx)
+    ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+    desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+    input_url = uno.systemPathToFileUrl(os.path.abspath(input_path))
+    output_url = uno.systemPathToFileUrl(os.path.abspath(output_path))
+    document = desktop.loadComponentFromURL(input_url, "_blank", 0, (prop("Hidden", True),))
+    try:
+        document.storeToURL(output_url, (prop("FilterName", filter_name),))
+    finally:
+        document.close(True)
+
+def _uno_available() -> bool:
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _port_is_open(port: int, timeout: float = 1.0) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class SofficeInstance:
+    """一个常驻的 headless soffice 进程, 拥有独立的用户配置目录和 UNO socket 端口"""
+
+    def __init__(self, index: int, binary: str, port: int, profile_dir: str):
+        self.index = index
+        self.binary = binary
+        self.port = port
+        self.profile_dir = profile_dir
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.jobs = 0
+        self.busy = False
+
+    @property
+    def args(self) -> List[str]:
+        return [self.binary, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault", "--nolockcheck",
+                f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+                f"-env:UserInstallation={Path(self.profile_dir).resolve().as_uri()}"]
+
+    async def start(self, startup_timeout: float) -> None:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.process = await asyncio.create_subprocess_exec(*self.args, stdout=asyncio.subprocess.DEVNULL,
+                                                            stderr=asyncio.subprocess.DEVNULL)
+        self.jobs = 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + startup_timeout
+        while loop.time() < deadline:
+            if self.process.returncode is not None:
+                raise RuntimeError(f"soffice #{self.index} exited during startup with code {self.process.returncode}")
+            if await asyncio.to_thread(_port_is_open, self.port, 0.5):
+                logger.info(f"soffice #{self.index} ready on port {self.port} (pid {self.process.pid}).")
+                return
+            await asyncio.sleep(0.2)
+        await self.stop()
+        raise TimeoutError(f"soffice #{self.index} did not open port {self.port} within {startup_timeout}s")
+
+    async def stop(self) -> None:
+        if self.process is None or self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+    async def is_healthy(self) -> bool:
+        if self.process is None or self.process.returncode is not None:
+            return False
+        return await asyncio.to_thread(_port_is_open, self.port)
+
+
+class SofficePool:
+    """常驻 LibreOffice 实例池, 避免每次 docx2pdf 都冷启动 soffice 并共享同一个用户配置目录.
+
+    每个实例使用独立的 profile 目录与 UNO 端口, 转换任务异步排队获取空闲实例, 超时后重启该实例,
+    完成 max_jobs 次转换后回收重启, 并由后台任务定期做健康检查.
+    默认通过 python-uno 下发转换; 配置 convert_cmd (命令模板, 支持 {port} {input} {output} {format}
+    {filter} 占位符) 时改为调用外部客户端命令, 这样也可以用桩脚本替代真实的 soffice 进行测试.
+    """
+
+    def __init__(self, binary: str, size: int, base_port: int, profile_root: str, max_jobs: int, timeout: float,
+                 startup_timeout: float, health_interval: float, convert_cmd: Optional[List[str]] = None):
+        self.binary = binary
+        self.size = size
+        self.base_port = base_port
+        self.profile_root = profile_root
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+        self.convert_cmd = list(convert_cmd or [])
+        self.instances: List[SofficeInstance] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._restart_tasks: Set[asyncio.Task] = set()
+        self.enabled = False
+
+    async def start(self) -> None:
+        if self.size <= 0:
+            logger.info("soffice pool disabled (soffice_pool_size=0), docx2pdf will start soffice per request.")
+            return
+        if not shutil.which(self.binary):
+            logger.warning(f"soffice binary '{self.binary}' not found, soffice pool disabled.")
+            return
+        if not self.convert_cmd and not _uno_available():
+            logger.warning("python-uno is not importable and soffice_convert_cmd is empty, soffice pool disabled.")
+            return
+        self._idle = asyncio.Queue()
+        for index in range(self.size):
+            instance = SofficeInstance(index, self.binary, self.base_port + index,
+                                       os.path.join(self.profile_root, f"instance_{index}"))
+            try:
+                await instance.start(self.startup_timeout)
+            except Exception as e:
+                logger.error(f"Failed to start soffice #{index}: {e}")
+                continue
+            self.instances.append(instance)
+            self._idle.put_nowait(instance)
+        self.enabled = bool(self.instances)
+        if self.enabled:
+            self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"soffice pool started with {len(self.instances)}/{self.size} instances.")
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for task in self._restart_tasks:
+            task.cancel()
+        await asyncio.gather(*self._restart_tasks, return_exceptions=True)
+        await asyncio.gather(*(instance.stop() for instance in self.instances), return_exceptions=True)
+        self.instances.clear()
+        self.enabled = False
+
+    async def _restart(self, instance: SofficeInstance, reason: str) -> None:
+        logger.warning(f"Restarting soffice #{instance.index}: {reason}.")
+        await instance.stop()
+        await instance.start(self.startup_timeout)
+
+    def _restart_in_background(self, instance: SofficeInstance, reason: str) -> None:
+        """实例仍处于占用状态 (不在 _idle 中), 后台重启完成后再放回, 当前请求不等待重启"""
+        async def restart_and_release() -> None:
+            try:
+                await self._restart(instance, reason)
+            except Exception as e:
+                logger.error(f"soffice #{instance.index} restart failed: {e}")
+            finally:
+                instance.busy = False
+                self._idle.put_nowait(instance)
+
+        task = asyncio.create_task(restart_and_release())
+        self._restart_tasks.add(task)
+        task.add_done_callback(self._restart_tasks.discard)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            # 只检查空闲的实例, 检查期间从 _idle 取出, 避免与 convert() 同时重启同一个实例
+            for _ in range(self._idle.qsize()):
+                instance = self._idle.get_nowait()
+                try:
+                    if not await instance.is_healthy():
+                        await self._restart(instance, "health check failed")
+                except Exception as e:
+                    logger.error(f"soffice #{instance.index} restart failed: {e}")
+                finally:
+                    self._idle.put_nowait(instance)
+
+    async def _run_job(self, instance: SofficeInstance, input_path: str, output_path: str, fmt: str, timeout: float) -> None:
+        filter_name = export_filters.get(fmt, fmt)
+        if self.convert_cmd:
+            values = {"port": instance.port, "input": input_path, "output": output_path, "format": fmt, "filter": filter_name}
+            args = [part.format(**values) for part in self.convert_cmd]
+            process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.DEVNULL,
+                                                           stderr=asyncio.subprocess.PIPE)
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise
+            if process.returncode != 0:
+                raise ConverterCrashError(f"soffice convert command failed ({process.returncode}): {stderr.decode(errors='ignore')}")
+        else:
+            await asyncio.wait_for(asyncio.to_thread(_uno_convert, instance.port, input_path, output_path, filter_name),
+                                   timeout=timeout)
+
+    async def convert(self, input_path: str, output_path: str, fmt: str = "pdf", timeout: Optional[float] = None) -> str:
+        """把 input_path 转换为 fmt 格式并写入 output_path, 返回 output_path"""
+        timeout = timeout or self.timeout
+        if not self.enabled:
+            return await cold_convert(self.binary, input_path, output_path, fmt, timeout)
+        instance = await self._idle.get()
+        instance.busy = True
+        release = True
+        try:
+            if not await instance.is_healthy():
+                await self._restart(instance, "instance is not healthy")
+            try:
+                await self._run_job(instance, input_path, output_path, fmt, timeout)
+            except asyncio.TimeoutError:
+                # 卡住的实例只能重启, UNO 调用会随连接断开而返回
+                release = False
+                self._restart_in_background(instance, f"job timed out after {timeout}s")
+                raise ConverterTimeoutError(f"soffice conversion timed out after {timeout}s: {input_path}")
+            instance.jobs += 1
+            if instance.jobs >= self.max_jobs:
+                release = False
+                self._restart_in_background(instance, f"recycled after {instance.jobs} jobs")
+        finally:
+            if release:
+                instance.busy = False
+                self._idle.put_nowait(instance)
+        if not os.path.exists(output_path):
+            raise ConverterCrashError(f"soffice finished without producing {output_path}")
+        return output_path
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "size": len(self.instances),
+                "idle": self._idle.qsize() if self._idle is not None else 0,
+                "instances": [{"index": i.index, "port": i.port, "jobs": i.jobs, "busy": i.busy,
+                               "pid": i.process.pid if i.process else None} for i in self.instances]}
+
+
+async def cold_convert(binary: str, input_path: str, output_path: str, fmt: str, timeout: float) -> str:
+    """未启用实例池时的兜底: 单次启动 soffice, 使用临时 profile 目录以免并发请求互相干扰"""
+    with tempfile.TemporaryDirectory(prefix="docflow_soffice_") as work_dir:
+        profile_uri = Path(work_dir, "profile").as_uri()
+        out_dir = os.path.join(work_dir, "out")
+        process = await asyncio.create_subprocess_exec(
+            binary, f"-env:UserInstallation={profile_uri}", "--headless", "--convert-to", fmt, "--outdir", out_dir, input_path,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise ConverterTimeoutError(f"soffice conversion timed out after {timeout}s: {input_path}")
+        produced = os.path.join(out_dir, f"{Path(input_path).stem}.{fmt}")
+        if process.returncode != 0 or not os.path.exists(produced):
+            raise ConverterCrashError(f"soffice convert failed ({process.returncode}): {stderr.decode(errors='ignore')}")
+        shutil.move(produced, output_path)
+    return output_path
+
+
+soffice_pool = SofficePool(
+    binary=settings.soffice_path,
+    size=settings.soffice_pool_size,
+    base_port=settings.soffice_base_port,
+    profile_root=settings.soffice_profile_root,
+    max_jobs=settings.soffice_max_jobs,
+    timeout=settings.soffice_timeout,
+    startup_timeout=settings.soffice_startup_timeout,
+    health_interval=settings.soffice_health_interval,
+    convert_cmd=settings.soffice_convert_cmd,
+)
+
+
+if __name__ == "__main__":
+    # 用桩脚本 tests/soffice_stub.py 代替 soffice 检查实例池 (经 soffice_convert_cmd 下发转换):
+    # 正常转换, 超时后后台重启, max_jobs 回收重启, 以及健康检查与并发转换不会在同一端口重复启动实例
+    import sys
+    import time
+
+    stub = str(Path(__file__).resolve().parents[2] / "tests" / "soffice_stub.py")
+    work_dir = tempfile.mkdtemp(prefix="docflow_soffice_check_")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        free_port = probe.getsockname()[1]
+
+    def write_input(name: str, content: bytes) -> str:
+        path = os.path.join(work_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def pid_of(pool: SofficePool) -> int:
+        return pool.instances[0].process.pid
+
+    async def wait_idle(pool: SofficePool) -> None:
+        while pool._idle.qsize() < len(pool.instances):
+            await asyncio.sleep(0.05)
+
+    async def main():
+        pool = SofficePool(stub, size=1, base_port=free_port, profile_root=work_dir, max_jobs=3, timeout=5,
+                           startup_timeout=10, health_interval=0.2,
+                           convert_cmd=[sys.executable, stub, "convert", "{port}", "{input}", "{output}"])
+        await pool.start()
+        assert pool.enabled, "stub soffice failed to start"
+        try:
+            output = await pool.convert(write_input("a.docx", b"first"), os.path.join(work_dir, "a.pdf"))
+            assert open(output, "rb").read() == b"first"
+            print(f"convert: ok (jobs={pool.instances[0].jobs})")
+
+            pid, start_time = pid_of(pool), time.perf_counter()
+            try:
+                await pool.convert(write_input("b.docx", b"sleep"), os.path.join(work_dir, "b.pdf"), timeout=1)
+                raise AssertionError("timeout was not raised")
+            except ConverterTimeoutError:
+                print(f"timeout: raised after {time.perf_counter() - start_time:.2f}s")
+            await wait_idle(pool)
+            assert pid_of(pool) != pid and pool.instances[0].jobs == 0
+            print(f"timeout: instance restarted in background (pid {pid} -> {pid_of(pool)})")
+
+            pid = pid_of(pool)
+            for index in range(pool.max_jobs):
+                await pool.convert(write_input(f"c{index}.docx", b"recycle"), os.path.join(work_dir, f"c{index}.pdf"))
+            await wait_idle(pool)
+            assert pid_of(pool) != pid
+            print(f"recycle: restarted after {pool.max_jobs} jobs (pid {pid} -> {pid_of(pool)})")
+
+            # 杀掉实例后同时发起转换, 与健康检查竞争: 只能由一方重启, 桩脚本重复监听同一端口会启动失败
+            pid = pid_of(pool)
+            pool.instances[0].process.kill()
+            await pool.instances[0].process.wait()
+            results = await asyncio.gather(*(pool.convert(write_input(f"d{i}.docx", b"race"), os.path.join(work_dir, f"d{i}.pdf"))
+                                             for i in range(4)), asyncio.sleep(1), return_exceptions=True)
+            errors = [result for result in results if isinstance(result, Exception)]
+            assert not errors, errors
+            print(f"health/convert race: ok (pid {pid} -> {pid_of(pool)})")
+        finally:
+            await pool.stop()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    asyncio.run(main())
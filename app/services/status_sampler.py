@@ -0,0 +1,80 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+import psutil
+
+from app.core.configs.settings import settings
+from app.services.conversion_cache import conversion_cache
+from app.services.conversion_executor import conversion_executor
+from app.services.job_manager import job_manager
+from app.services.soffice_pool import soffice_pool
+from app.utils.logger import get_logger
+from app.utils.status import get_process_status, get_system_status
+
+logger = get_logger()
+
+
+class StatusSampler:
+    """后台按固定间隔采样系统与服务状态, 保存在环形缓冲区中; /status 直接返回最近一次快照, 不再在请求中等待采样"""
+
+    def __init__(self, interval: float = 2.0, history: int = 300, gpu: bool = True):
+        self.interval = interval
+        self.gpu = gpu
+        self._history: Deque[dict] = deque(maxlen=max(1, history))
+        self._process = psutil.Process()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        # cpu_percent(interval=None) 返回距上次调用的占用率, 先调用一次作为基准
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+        try:
+            await self.sample()
+        except Exception as e:
+            # 采样失败不影响启动, /status 在首个成功采样前现场采集
+            logger.error(f"Initial status sampling failed: {type(e).__name__}: {e}")
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Status sampler started: interval={self.interval}s, history={self._history.maxlen}.")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def sample(self) -> dict:
+        # psutil 与 GPU 探测 (nvidia-smi) 放到线程中, 服务内部状态在事件循环中读取
+        loop = asyncio.get_running_loop()
+        system = await loop.run_in_executor(None, get_system_status, self.gpu, settings.static_root)
+        process = await loop.run_in_executor(None, get_process_status, self._process)
+        snapshot = {"timestamp": time.time(), **system, "process": process,
+                    "conversion": conversion_executor.stats(), "soffice": soffice_pool.stats(),
+                    "conversion_cache": conversion_cache.stats(), "jobs": job_manager.stats()}
+        self._history.append(snapshot)
+        return snapshot
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sample()
+            except Exception as e:
+                logger.error(f"Status sampling failed: {type(e).__name__}: {e}")
+
+    def latest(self) -> Optional[dict]:
+        return self._history[-1] if self._history else None
+
+    def history(self, limit: int = 0) -> List[dict]:
+        """最近 limit 个采样点 (0 表示全部), 只保留数值字段"""
+        snapshots = list(self._history)[-limit:] if limit > 0 else list(self._history)
+        return [{"timestamp": round(s["timestamp"], 3), "cpu_percent": s["cpu_percent"],
+                 "memory_percent": s["memory_percent"], "disk_percent": s["disk"]["percent"],
+                 "process_rss": s["process"]["rss"], "workers_rss": sum(w["rss"] for w in s["process"]["workers"]),
+                 "conversion_pending": s["conversion"]["pending"], "jobs_queued": s["jobs"]["queued"]}
+                for s in snapshots]
+
+
+status_sampler = StatusSampler(interval=settings.status_sample_interval, history=settings.status_history_size,
+                               gpu=settings.status_gpu_enabled)
@@ -0,0 +1,372 @@
+import csv
+import io
+import itertools
+import os
+import re
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple, Union
+
+from app.core.configs.settings import settings
+from app.models.exception_model import InputError, UnsupportedTypeError
+from app.services.engines import load_engine
+from app.utils.charset import detect_encoding
+
+# 流式表格转换: openpyxl read_only 逐行读取 xlsx, 逐行写出 csv/markdown; csv2xlsx 用 write_only 逐行写入.
+# 与 convert_file 中的引擎函数一样在工作进程中运行, 输出直接写入 output_path, 内存占用与行数无关.
+# 与 pandas 实现 (-v2) 的差异: 单元格按 Excel 中的类型原样输出 (有空值的整数列不会变成 1.0), 全空行被跳过,
+# markdown 表格不按列宽补齐空格.
+# 读取范围 (ConvertExtraParams.table_options: sheets/usecols/nrows/skiprows/header_row) 在这里与 pandas 实现共用同一套解析.
+
+Row = Tuple
+_column_range_pattern = re.compile(r"^[A-Z]+(?::[A-Z]+)?(?:,[A-Z]+(?::[A-Z]+)?)*$")
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def select_sheets(names: List[str], sheets) -> List[str]:
+    """按工作表名或从 0 开始的序号选择工作表 (保持请求顺序, 去重), 未指定时返回全部"""
+    selected = []
+    for sheet in _as_list(sheets):
+        if isinstance(sheet, str) and sheet in names:
+            name = sheet
+        elif isinstance(sheet, int) or (isinstance(sheet, str) and sheet.isdigit()):
+            if not 0 <= int(sheet) < len(names):
+                raise InputError(f"Sheet index out of range: {sheet}, available: {names}")
+            name = names[int(sheet)]
+        else:
+            raise InputError(f"Sheet not found: {sheet}, available: {names}")
+        if name not in selected:
+            selected.append(name)
+    return selected or names
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+def parse_column_range(usecols: str) -> List[int]:
+    """Excel 列范围 "A:C,E" 转为从 0 开始的列序号"""
+    text = usecols.replace(" ", "").upper()
+    if not _column_range_pattern.match(text):
+        raise InputError(f"Invalid usecols range: {usecols}, expected like \"A:C,E\" or a list of column names.")
+    positions = []
+    for part in text.split(","):
+        start, _, end = part.partition(":")
+        positions += range(_column_index(start), _column_index(end or start) + 1)
+    return sorted(set(positions))
+
+def resolve_columns(usecols, names: List[str]) -> Optional[List[int]]:
+    """按表头把 usecols 解析为列位置 (按表中顺序), 未指定时返回 None; 字符串按 Excel 列范围处理, 与 pandas 一致"""
+    if usecols is None or usecols == []:
+        return None
+    if isinstance(usecols, str):
+        positions = parse_column_range(usecols)
+    else:
+        wanted = _as_list(usecols)
+        missing = [column for column in wanted if isinstance(column, str) and column not in names]
+        if missing:
+            raise InputError(f"Columns not found: {missing}, available: {names}")
+        positions = sorted({names.index(column) if isinstance(column, str) else column for column in wanted})
+    return [position for position in positions if position < len(names)]
+
+def _max_column(usecols) -> Optional[int]:
+    # 只给出列位置时可以提前确定需要读到第几列, 宽表中右侧的单元格不再构造
+    if isinstance(usecols, str):
+        return max(parse_column_range(usecols)) + 1
+    wanted = _as_list(usecols)
+    if wanted and all(isinstance(column, int) for column in wanted):
+        return max(wanted) + 1
+    return None
+
+def _sheet_meta(names: List[str], info: List[dict]) -> dict:
+    # sheet_names 为源文件中的全部表, sheet_info 为实际输出的表及其数据行数/列数
+    return {"sheet_names": names, "sheet_info": info}
+
+
+@contextmanager
+def _atomic_output(output_path: str) -> Iterator[str]:
+    """先写 .part 再替换, 不原地覆盖已有文件 (同名输出可能已硬链接进转换缓存)"""
+    part_path = f"{output_path}.part"
+    try:
+        yield part_path
+        os.replace(part_path, output_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+def _header_names(row: Row) -> List[str]:
+    """与 pandas.read_excel 相同的列名规则: 空表头为 "Unnamed: i", 重名追加 ".1", ".2" ..."""
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value is None or value == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _is_empty(row: Row) -> bool:
+    return all(value is None or value == "" for value in row)
+
+def _format_value(value) -> str:
+    return "" if value is None else str(value)
+
+def _read_header(rows: Iterator[Row], options: dict) -> Tuple[List[str], Iterator[Row]]:
+    """读取表头行; 没有表头时列名为从 0 开始的序号 (与 pandas header=None 一致), 首行作为数据放回"""
+    first = next(rows, None)
+    if first is None:
+        return [], rows
+    if options.get("header_row", 0) is None:
+        return [str(i) for i in range(len(first))], itertools.chain([first], rows)
+    return _header_names(first), rows
+
+def _selected_rows(rows: Iterator[Row], width: int, positions: Optional[List[int]]) -> Iterator[Row]:
+    # 跳过全空行, 行按列数补齐后只保留选中的列
+    for row in rows:
+        if _is_empty(row):
+            continue
+        row = row[:width] + (None,) * (width - len(row))
+        yield row if positions is None else tuple(row[position] for position in positions)
+
+def _select_columns(names: List[str], rows: Iterator[Row], options: dict) -> Tuple[List[str], Iterator[Row]]:
+    positions = resolve_columns(options.get("usecols"), names)
+    columns = names if positions is None else [names[position] for position in positions]
+    return columns, _selected_rows(rows, len(names), positions)
+
+def _row_window(options: dict) -> Tuple[int, Optional[int]]:
+    """返回 (表头或首个数据行之前跳过的行数, 最多读取的行数 (含表头)), 与 pandas 的 skiprows + header + nrows 对应"""
+    header_row = options.get("header_row", 0)
+    skip = (options.get("skiprows") or 0) + (header_row or 0)
+    nrows = options.get("nrows")
+    return skip, None if nrows is None else nrows + (header_row is not None)
+
+def _open_workbook(input_raw: Union[bytes, None], input_path: str):
+    source = io.BytesIO(input_raw) if input_raw is not None else input_path
+    return load_engine("openpyxl").load_workbook(source, read_only=True, data_only=True)
+
+def _sheet_names(workbook) -> List[str]:
+    return [sheet.title for sheet in workbook.worksheets]  # 不含图表页
+
+def _iter_sheets(workbook, options: dict) -> Iterator[Tuple[str, List[str], Iterator[Row]]]:
+    """逐个选中的工作表产出 (表名, 列名, 数据行迭代器); 未选中的表与窗口之外的行不解析"""
+    skip, limit = _row_window(options)
+    for title in select_sheets(_sheet_names(workbook), options.get("sheets")):
+        rows = workbook[title].iter_rows(min_row=skip + 1, max_row=None if limit is None else skip + limit,
+                                         max_col=_max_column(options.get("usecols")), values_only=True)
+        header, rows = _read_header(rows, options)
+        if not header:
+            continue
+        columns, rows = _select_columns(header, rows, options)
+        yield title, columns, rows
+
+def _md_cell(value) -> str:
+    return _format_value(value).replace("|", "\\|").replace("\r\n", "<br>").replace("\n", "<br>")
+
+def xlsx_to_csv(input_raw: Union[bytes, None], input_path: str, output_path: str, options: Optional[dict] = None) -> dict:
+    """多个工作表合并为一个 csv: 列为各表列名的并集 (按出现顺序), 并追加 TableName 列, 与 pandas 实现一致"""
+    workbook = _open_workbook(input_raw, input_path)
+    info = []
+    try:
+        sheets = list(_iter_sheets(workbook, options or {}))
+        multiple = len(sheets) > 1
+        columns = list(dict.fromkeys(name for _, names, _ in sheets for name in names + ["TableName"] * multiple))
+        with _atomic_output(output_path) as part_path, open(part_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(columns)
+            for title, names, rows in sheets:
+                positions = [columns.index(name) for name in names]
+                table_position = columns.index("TableName") if multiple else None
+                count = 0
+                for row in rows:
+                    out = [""] * len(columns)
+                    for position, value in zip(positions, row):
+                        out[position] = _format_value(value)
+                    if table_position is not None:
+                        out[table_position] = title
+                    writer.writerow(out)
+                    count += 1
+                info.append({"name": title, "rows": count, "columns": len(names)})
+        return _sheet_meta(_sheet_names(workbook), info)
+    finally:
+        workbook.close()
+
+def xlsx_to_md(input_raw: Union[bytes, None], input_path: str, output_path: str, options: Optional[dict] = None) -> dict:
+    """每个工作表输出 "## 表名" 与一张 markdown 表格, 表之间用 --- 分隔, 与 pandas 实现的结构一致"""
+    workbook = _open_workbook(input_raw, input_path)
+    info = []
+    try:
+        with _atomic_output(output_path) as part_path, open(part_path, "w", encoding="utf-8") as f:
+            for i, (title, columns, rows) in enumerate(_iter_sheets(workbook, options or {})):
+                if i:
+                    f.write("\n\n---\n\n")
+                f.write(f"## {title}\n\n")
+                f.write("| " + " | ".join(_md_cell(name) for name in columns) + " |\n")
+                f.write("|" + "---|" * len(columns))
+                count = 0
+                for row in rows:
+                    f.write("\n| " + " | ".join(_md_cell(value) for value in row) + " |")
+                    count += 1
+                info.append({"name": title, "rows": count, "columns": len(columns)})
+        return _sheet_meta(_sheet_names(workbook), info)
+    finally:
+        workbook.close()
+
+def _parse_csv_value(value: str) -> Union[str, int, float, None]:
+    # 数字写成数值单元格, 其余保持文本 (pandas.read_csv 的类型推断是按列的, 这里按单元格)
+    if value == "":
+        return None
+    try:
+        return int(value) if value.lstrip("+-").isdigit() else float(value) if any(c.isdigit() for c in value) else value
+    except ValueError:
+        return value
+
+def csv_to_xlsx(input_raw: Union[str, bytes, None], input_path: str, output_path: str, options: Optional[dict] = None) -> dict:
+    """逐行读取 csv 并用 write_only 工作簿写出, 工作表名与 pandas 实现一致 (Table1); sheets 选项对 csv 无效"""
+    options = options or {}
+    if input_raw is None:
+        with open(input_path, "rb") as f:
+            encoding = detect_encoding(f.read(settings.charset_detect_bytes))
+        f = open(input_path, "r", encoding=encoding, newline="")
+    else:
+        text = input_raw if isinstance(input_raw, str) else input_raw.decode(detect_encoding(input_raw))
+        f = io.StringIO(text, newline="")
+    workbook = load_engine("openpyxl").Workbook(write_only=True)
+    sheet = workbook.create_sheet("Table1")
+    count, columns = 0, []
+    try:
+        skip, limit = _row_window(options)
+        rows = itertools.islice((tuple(row) for row in csv.reader(f)), skip, None if limit is None else skip + limit)
+        header, rows = _read_header(rows, options)
+        if header:
+            columns, rows = _select_columns(header, rows, options)
+            if options.get("header_row", 0) is not None:
+                sheet.append(columns)
+        for row in rows:
+            sheet.append([_parse_csv_value(value) if value is not None else None for value in row])
+            count += 1
+        with _atomic_output(output_path) as part_path:
+            workbook.save(part_path)
+    finally:
+        f.close()
+    return _sheet_meta(["Table1"], [{"name": "Table1", "rows": count, "columns": len(columns)}])
+
+def stream_tables(convert_type: str, input_raw: Union[str, bytes, None], input_path: str, output_path: str,
+                  options: Optional[dict] = None) -> dict:
+    """按转换类型分派, 返回工作表元数据 (sheet_names / sheet_info)"""
+    if convert_type.startswith("xlsx2csv"):
+        return xlsx_to_csv(input_raw, input_path, output_path, options)
+    if convert_type.startswith("xlsx2md"):
+        return xlsx_to_md(input_raw, input_path, output_path, options)
+    if convert_type.startswith("csv2xlsx"):
+        return csv_to_xlsx(input_raw, input_path, output_path, options)
+    raise UnsupportedTypeError(f"Unsupported streaming convert type: {convert_type}")
+
+if __name__ == "__main__":
+    # 基准: 合成 10 万 / 100 万行工作表, 对比 pandas 实现与流式实现的耗时与峰值内存 (每次在独立子进程中运行);
+    # 另用一个多表宽工作簿对比全量读取与只读取部分工作表/列/行 (table_options) 的差异
+    import subprocess
+    import sys
+    import tempfile
+    import time
+
+    from app.services.convert_file import _convert_tables
+
+    def make_xlsx(path: str, rows: int) -> None:
+        workbook = load_engine("openpyxl").Workbook(write_only=True)
+        sheet = workbook.create_sheet("Sheet1")
+        sheet.append(["id", "name", "price", "note", "created"])
+        for i in range(rows):
+            sheet.append([i, f"名称 {i}", i * 0.25, None if i % 3 else "a, b", f"2024-01-{i % 28 + 1:02d}"])
+        workbook.save(path)
+
+    def make_wide_xlsx(path: str, sheets: int, rows: int, columns: int) -> None:
+        workbook = load_engine("openpyxl").Workbook(write_only=True)
+        for s in range(sheets):
+            sheet = workbook.create_sheet(f"Sheet{s + 1}")
+            sheet.append([f"col{c}" for c in range(columns)])
+            for i in range(rows):
+                sheet.append([i * columns + c if c % 2 else f"v{i}-{c}" for c in range(columns)])
+        workbook.save(path)
+
+    def measure(statement: str) -> Tuple[float, float]:
+        code = ("import resource, time; t = time.perf_counter(); " + statement +
+                "; print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr[-2000:])
+        seconds, peak_mb = result.stdout.strip().splitlines()[-1].split()
+        return float(seconds), float(peak_mb)
+
+    def md_cells(text: str) -> List[List[str]]:
+        # 两种实现的 markdown 只在对齐与数值格式上不同, 按单元格取值比较 (pandas 把空值写成 nan)
+        def normalize(cell: str) -> str:
+            cell = cell.strip()
+            if cell == "nan":
+                return ""
+            try:
+                return repr(float(cell))
+            except ValueError:
+                return cell
+        return [[normalize(cell) for cell in line.strip("|").split("|")] for line in text.splitlines()
+                if line.startswith("|") and not set(line) <= set("|-: ")]
+
+    def check_outputs(workdir: str) -> None:
+        # 小样本上核对流式实现与 pandas 实现的内容和元数据一致
+        pd = load_engine("pandas")
+        xlsx_path, wide_path = os.path.join(workdir, "check.xlsx"), os.path.join(workdir, "check_wide.xlsx")
+        csv_path = os.path.join(workdir, "check.csv")
+        make_xlsx(xlsx_path, 300)
+        make_wide_xlsx(wide_path, sheets=3, rows=50, columns=12)
+        xlsx_to_csv(None, xlsx_path, csv_path)
+        selection = {"sheets": "Sheet2", "usecols": "A:E", "nrows": 20}
+        for case, src, options in (("xlsx2csv", xlsx_path, None), ("xlsx2md", xlsx_path, None), ("csv2xlsx", csv_path, None),
+                                   ("xlsx2csv", wide_path, None), ("xlsx2csv", wide_path, selection),
+                                   ("xlsx2md", wide_path, selection)):
+            out = os.path.join(workdir, f"check_out.{case.split('2')[1]}")
+            old, old_meta = _convert_tables(case, None, src, options)
+            new_meta = stream_tables(case, None, src, out, options)
+            assert new_meta == old_meta, f"{case} {options}: {new_meta} != {old_meta}"
+            if case == "xlsx2csv":
+                assert pd.read_csv(io.StringIO(old)).equals(pd.read_csv(out)), f"{case} {options}: content differs"
+            elif case == "xlsx2md":
+                with open(out, encoding="utf-8") as f:
+                    assert md_cells(f.read()) == md_cells(old), f"{case} {options}: content differs"
+            else:
+                assert pd.read_excel(io.BytesIO(old)).equals(pd.read_excel(out)), f"{case}: content differs"
+
+    workdir = tempfile.mkdtemp()
+    check_outputs(workdir)
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'case':<20}{'rows':>10}{'pandas':>12}{'peak':>10}{'stream':>12}{'peak':>10}")
+    for rows in sizes:
+        xlsx_path, csv_path = os.path.join(workdir, f"{rows}.xlsx"), os.path.join(workdir, f"{rows}.csv")
+        start_time = time.perf_counter()
+        make_xlsx(xlsx_path, rows)
+        print(f"(fixture {rows} rows: {os.path.getsize(xlsx_path) / 1024 / 1024:.1f} MB in {time.perf_counter() - start_time:.1f}s)")
+        xlsx_to_csv(None, xlsx_path, csv_path)
+        for case, src in (("xlsx2csv", xlsx_path), ("xlsx2md", xlsx_path), ("csv2xlsx", csv_path)):
+            out = os.path.join(workdir, f"out.{case.split('2')[1]}")
+            old = measure(f"from app.services.convert_file import _convert_tables; _convert_tables({case!r}, None, {src!r})")
+            new = measure(f"from app.services.table_stream import stream_tables; stream_tables({case!r}, None, {src!r}, {out!r})")
+            print(f"{case:<20}{rows:>10}{old[0]:>11.1f}s{old[1]:>8.0f}MB{new[0]:>11.1f}s{new[1]:>8.0f}MB")
+
+    wide_path = os.path.join(workdir, "wide.xlsx")
+    make_wide_xlsx(wide_path, sheets=4, rows=2000, columns=100)
+    selection = {"sheets": "Sheet2", "usecols": "A:E", "nrows": 500}
+    print(f"\n{'wide 4x2000x100':<20}{'options':>10}{'pandas':>12}{'peak':>10}{'stream':>12}{'peak':>10}")
+    for case in ("xlsx2csv", "xlsx2md"):
+        out = os.path.join(workdir, f"out.{case.split('2')[1]}")
+        for label, options in (("all", None), ("selected", selection)):
+            old = measure(f"from app.services.convert_file import _convert_tables; "
+                          f"_convert_tables({case!r}, None, {wide_path!r}, {options!r})")
+            new = measure(f"from app.services.table_stream import stream_tables; "
+                          f"stream_tables({case!r}, None, {wide_path!r}, {out!r}, {options!r})")
+            print(f"{case:<20}{label:>10}{old[0]:>11.1f}s{old[1]:>8.0f}MB{new[0]:>11.1f}s{new[1]:>8.0f}MB")
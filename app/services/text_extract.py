@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import time
+import traceback
+import uuid
+from typing import AsyncIterator, List, Optional, Tuple
+
+import aiofiles
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.core.configs.settings import settings
+from app.models.exception_model import InputError, UnsupportedTypeError
+from app.models.file_conversion import FileConvertParams
+from app.models.request_model import FileModelRequest
+from app.models.response_model import FileModelResponse
+from app.services.conversion_executor import conversion_executor
+from app.services.convert_file import _markitdown_convert, _pdf_page_count, convert_html_to_txt, convert_md_to_txt
+from app.services.engines import load_engine
+from app.services.file_manager import get_raw, parse_file_request
+from app.utils.exception import file_exception
+from app.utils.file import async_save_string_or_bytes_to_path, gen_resource_locations, is_text_file, text_to_binary
+from app.utils.logger import get_logger
+from app.utils.text import chunk_text
+
+logger = get_logger()
+
+# 文本抽取: 任意支持的输入 -> 纯文本 -> split_texts 分块, 以 NDJSON 逐块返回.
+# pdf 按页分批在工作进程中提取, 每批提取完即发送, 同时预取下一批; 其他格式整体提取一次后分块.
+
+Segment = Tuple[Optional[int], str]  # (页码, 文本), 非 pdf 的页码为 None
+
+# 支持的二进制输入及其文件头, 内容与扩展名不符时直接拒绝, 不交给 pymupdf/MarkItDown 解析
+extract_signatures = {"pdf": (b"%PDF",), "docx": (b"PK\x03\x04",), "xlsx": (b"PK\x03\x04",), "xls": (b"\xd0\xcf\x11\xe0",)}
+extract_text_ext = ("md", "markdown", "html", "htm", "xhtml", "txt")
+
+
+def _pdf_page_texts(input_path: str, start: int, end: int) -> List[str]:
+    # 提取 [start, end) 页的纯文本
+    document = load_engine("pymupdf").open(input_path)
+    try:
+        return [document[i].get_text() for i in range(start, end)]
+    finally:
+        document.close()
+
+async def iter_pdf_pages(input_path: str) -> AsyncIterator[Segment]:
+    page_count = await conversion_executor.run_blocking(_pdf_page_count, input_path)
+    batch_pages = max(1, settings.extract_pdf_batch_pages)
+    ranges = [(start, min(start + batch_pages, page_count)) for start in range(0, page_count, batch_pages)]
+    logger.info(f"Extracting pdf text: {page_count} pages, {len(ranges)} batches...")
+
+    def submit(index: int) -> Optional[asyncio.Task]:
+        if index >= len(ranges):
+            return None
+        return asyncio.ensure_future(conversion_executor.run_blocking(_pdf_page_texts, input_path, *ranges[index]))
+
+    pending = submit(0)
+    try:
+        for index, (start, _) in enumerate(ranges):
+            texts = await pending
+            pending = submit(index + 1)  # 发送当前批次时下一批已在提取
+            for offset, text in enumerate(texts):
+                yield start + offset + 1, text
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+async def read_head(raw, path: str, size: int = 8) -> bytes:
+    if raw is not None:
+        return (text_to_binary(raw) if isinstance(raw, str) else raw)[:size]
+    async with aiofiles.open(path, "rb") as f:
+        return await f.read(size)
+
+def check_extractable(extension: str, head: bytes) -> None:
+    src = extension.lstrip(".").lower()
+    if src in extract_signatures:
+        if not head.startswith(extract_signatures[src]):
+            raise UnsupportedTypeError(f"File content does not match its extension for text extraction: {extension}")
+    elif not (src in extract_text_ext or is_text_file(extension)):
+        raise UnsupportedTypeError(f"Unsupported file type for text extraction: {extension}")
+
+async def iter_text_segments(raw, extension: str, input_path: str) -> AsyncIterator[Segment]:
+    """按输入格式选择已有的转换器得到纯文本: md/html 走 *2txt, docx/xlsx/xls 先经 MarkItDown 转 markdown 再去标记, 其他文本原样返回"""
+    src = extension.lstrip(".").lower()
+    if src == "pdf":
+        async for segment in iter_pdf_pages(input_path):
+            yield segment
+        return
+    if src in ("md", "markdown"):
+        text, _, _ = await convert_md_to_txt(FileConvertParams(convert_type="md2txt", input_raw=raw))
+    elif src in ("html", "htm", "xhtml"):
+        text, _, _ = await convert_html_to_txt(FileConvertParams(convert_type="html2txt", input_raw=raw))
+    elif src in extract_signatures:
+        input_raw = text_to_binary(raw) if raw is not None else None
+        markdown = await conversion_executor.run_blocking(_markitdown_convert, input_raw, input_path, src)
+        text, _, _ = await convert_md_to_txt(FileConvertParams(convert_type="md2txt", input_raw=markdown))
+    elif isinstance(raw, str):
+        text = raw
+    else:
+        raise UnsupportedTypeError(f"Unsupported file type for text extraction: {extension}")
+    yield None, text
+
+async def stream_chunks(request_model: FileModelRequest, source: tuple, min_tokens: int, max_tokens: int,
+                        cleanup: List[str]) -> AsyncIterator[bytes]:
+    raw, name, extension, size, info, input_path, _ = source
+    count, chars, pages, start_time = 0, 0, 0, time.time()
+    try:
+        async for page, text in iter_text_segments(raw, extension, input_path):
+            pages = page or pages
+            # 大文本断句是纯 CPU 计算, 放进工作池以免阻塞事件循环上的其他请求
+            chunks = await conversion_executor.run_blocking(chunk_text, text, min_tokens, max_tokens)
+            for chunk in chunks:
+                record = {"index": count, "page": page, "text": chunk}
+                yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                count += 1
+                chars += len(chunk)
+        elapsed = time.time() - start_time
+        messages = f"Text extracted successfully. {info}"
+        summary = {"done": True, "code": 0, "messages": messages, "chunks": count, "chars": chars, "pages": pages,
+                   "elapsed": round(elapsed, 3)}
+        logger.info(f"Extracted {count} chunks ({chars} chars, {pages} pages) from {name}{extension} in {elapsed:.2f}s.")
+    except Exception as e:
+        code, status, msg = file_exception(e)
+        logger.error(traceback.format_exc())
+        summary = {"done": True, "code": code, "status": status, "messages": msg, "chunks": count}
+    finally:
+        for path in cleanup:
+            if os.path.exists(path):
+                os.remove(path)
+    yield (json.dumps({"uid": request_model.uid, "sno": request_model.sno, **summary}, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def handle_extract_operation(request, file) -> StreamingResponse:
+    """读取输入后立即开始返回 NDJSON: 每行一个分块 {index, page, text}, 最后一行为汇总 {done, code, chunks, ...}"""
+    cleanup = []
+    try:
+        request_model = await parse_file_request(request)
+        extra = request_model.extra
+        min_tokens = int(extra.get("min_tokens", settings.extract_min_tokens))
+        max_tokens = int(extra.get("max_tokens", settings.extract_max_tokens))
+        if not 0 < min_tokens <= max_tokens:
+            raise InputError(f"Invalid chunk range: min_tokens={min_tokens}, max_tokens={max_tokens}")
+        public_dir, _ = gen_resource_locations("public", "files", extra.get("category", "manager"))
+        source = await get_raw(request_model, mode="extract", file=file, spool_dir=public_dir)
+        raw, name, extension, size, info, source_path, digest = source
+        logger.info(f"Extract text request: {info} chunk range: [{min_tokens}, {max_tokens}].")
+        if source_path and not request_model.do_save:
+            cleanup.append(source_path)
+        check_extractable(extension, await read_head(raw, source_path))
+        if not source_path and isinstance(raw, bytes):
+            # base64/raw 传入的二进制内容落盘, 工作进程按路径分批读取
+            temp_dir, _ = gen_resource_locations("temp", "files", extra.get("category", "manager"))
+            os.makedirs(temp_dir, exist_ok=True)
+            source_path = await async_save_string_or_bytes_to_path(raw, os.path.join(temp_dir, f"{uuid.uuid4().hex}{extension}"))
+            cleanup.append(source_path)
+            source = (None, name, extension, size, info, source_path, digest)
+    except Exception as e:
+        for path in cleanup:
+            if os.path.exists(path):
+                os.remove(path)
+        code, status, msg = file_exception(e)
+        logger.error(traceback.format_exc())
+        return JSONResponse(status_code=status, content=FileModelResponse(code=code, messages=msg).model_dump())
+    return StreamingResponse(stream_chunks(request_model, source, min_tokens, max_tokens, cleanup),
+                             media_type="application/x-ndjson")
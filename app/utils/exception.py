@@ -1,28 +1,52 @@
 import asyncio
-import inspect
 import json
 import signal
+import sys
+from typing import Dict, Tuple
 
-from app.models.exception_model import SigIntException, SigTermException, ShutdownSignalException
+from fastapi import HTTPException
+
+from app.models.exception_model import SigIntException, SigTermException, ShutdownSignalException, DocFlowError
 from app.utils.logger import get_logger
+from app.utils.metrics import ERRORS
 from app.utils.status import graceful_shutdown
 
 logger = get_logger()
 
+# 非 DocFlowError 的内置异常按基类映射, 顺序即优先级
+_BUILTIN_STATUS = ((json.JSONDecodeError, "json", 400), (ValueError, "invalid_input", 400), (TimeoutError, "timeout", 408))
+_classified: Dict[type, Tuple[str, int]] = {}
+
+
+def classify_exception(exc) -> Tuple[str, int]:
+    """返回 (错误类别, HTTP 状态码); 只看异常类型, 结果按类型缓存"""
+    if isinstance(exc, HTTPException):
+        return "http", exc.status_code
+    exc_class = type(exc)
+    result = _classified.get(exc_class)
+    if result is None:
+        if issubclass(exc_class, DocFlowError):
+            result = (exc_class.__name__, exc_class.status)
+        else:
+            result = next(((error, status) for base, error, status in _BUILTIN_STATUS if issubclass(exc_class, base)),
+                          ("internal", 500))
+        _classified[exc_class] = result
+    return result
+
+def _json_error_message(exc: json.JSONDecodeError) -> str:
+    return (
+        f"JSON解析失败: {exc.msg}\n"
+        f"错误位置: 第{exc.lineno}行第{exc.colno}列 (字符{exc.pos})\n"
+        f"原始数据: [{exc.doc}]"  # 这里会输出原始 JSON 字符串
+    )
 
 def llm_exception(exc):
-    # 获取调用栈信息（跳过当前帧）
-    caller_frame = inspect.stack()[1]
-    caller_name = caller_frame.function
+    # 只取调用方的函数名 (inspect.stack() 会为整个调用栈读取源码上下文)
+    caller_name = sys._getframe(1).f_code.co_name
     exc_type = type(exc).__name__
     code, status = -1, 500
     if isinstance(exc, json.JSONDecodeError):
-        error_msg = (
-            f"JSON解析失败: {exc.msg}\n"
-            f"错误位置: 第{exc.lineno}行第{exc.colno}列 (字符{exc.pos})\n"
-            f"原始数据: [{exc.doc}]"  # 这里会输出原始 JSON 字符串
-        )
-        message = f"{caller_name}: {exc_type}: {error_msg}"
+        message = f"{caller_name}: {exc_type}: {_json_error_message(exc)}"
     else:
         message = f"{caller_name}: {exc_type}: {exc}"
         logger.error(message)
@@ -54,27 +78,60 @@ def single_exception(exc):
     return code, status, message
 
 def file_exception(exc):
-    # 获取调用栈信息（跳过当前帧）
-    caller_frame = inspect.stack()[1]
-    caller_name = caller_frame.function
+    # 只取调用方的函数名 (inspect.stack() 会为整个调用栈读取源码上下文)
+    caller_name = sys._getframe(1).f_code.co_name
     exc_type = type(exc).__name__
     code = -1
-    message = f"{caller_name}: {exc_type}: {exc}"
+    error, status = classify_exception(exc)
+    ERRORS.inc(error=error, status=status)
     if isinstance(exc, json.JSONDecodeError):
-        error_msg = (
-            f"JSON解析失败: {exc.msg}\n"
-            f"错误位置: 第{exc.lineno}行第{exc.colno}列 (字符{exc.pos})\n"
-            f"原始数据: [{exc.doc}]"  # 这里会输出原始 JSON 字符串
-        )
-        message = f"{caller_name}: {exc_type}: {error_msg}"
-        status = 400
-    elif isinstance(exc, ValueError):
-        status = 400
-    elif isinstance(exc, TimeoutError):
-        status = 408
+        message = f"{caller_name}: {exc_type}: {_json_error_message(exc)}"
     else:
-        status = 500
+        message = f"{caller_name}: {exc_type}: {exc}"
     return code, status, message
 
 
+if __name__ == "__main__":
+    # 错误路径基准: 在约 40 层调用栈深处处理常见的坏输入 (扩展名不匹配 / 不支持的类型 / 下载 404 / JSON 错误),
+    # 对比原实现 (inspect.stack()[1] + isinstance 链) 与当前实现每次调用的耗时
+    import inspect
+    import time
+
+    from app.models.exception_model import InputError, UnsupportedTypeError, UpstreamFetchError
+
+    def file_exception_inspect(exc):
+        caller_name = inspect.stack()[1].function
+        status = 400 if isinstance(exc, ValueError) else 408 if isinstance(exc, TimeoutError) else 500
+        return -1, status, f"{caller_name}: {type(exc).__name__}: {exc}"
+
+    errors = [InputError("文件a.pdf扩展名与转换类型不匹配: .pdf != .docx"), UnsupportedTypeError("不支持的转换类型: md2zip"),
+              UpstreamFetchError("Remote file request failed with status 404: http://example.com/missing.pdf"),
+              json.JSONDecodeError("Expecting value", "{bad", 1), HTTPException(status_code=400, detail="Missing file")]
+
+    def nested(depth: int, handler, rounds: int) -> float:
+        if depth:
+            return nested(depth - 1, handler, rounds)
+        start_time = time.perf_counter()
+        for i in range(rounds):
+            try:
+                raise errors[i % len(errors)]
+            except Exception as e:
+                handler(e)
+        return time.perf_counter() - start_time
+
+    for name, handler, rounds in (("inspect.stack()", file_exception_inspect, 200), ("classify_exception", file_exception, 20000)):
+        seconds = nested(40, handler, rounds)
+        print(f"{name:<20}{seconds / rounds * 1e6:>10.1f} us/error")
+    print({type(e).__name__: file_exception(e)[1] for e in errors})
+
+    # 分类结果: 项目异常取自身 status, 内置异常按基类, HTTPException 沿用其状态码, 其余为 500
+    expected = [("InputError", 400), ("UnsupportedTypeError", 415), ("UpstreamFetchError", 502), ("json", 400), ("http", 400)]
+    assert [classify_exception(e) for e in errors] == expected, [classify_exception(e) for e in errors]
+    for exc, result in ((ValueError("x"), ("invalid_input", 400)), (TimeoutError(), ("timeout", 408)),
+                        (RuntimeError("x"), ("internal", 500))):
+        assert classify_exception(exc) == result, (exc, classify_exception(exc))
 
+    def caller():
+        return file_exception(errors[0])
+    code, status, message = caller()
+    assert (code, status) == (-1, 400) and message.startswith("caller: InputError: "), message
@@ -1,21 +1,23 @@
 import base64
+import hashlib
 import mimetypes
 import os
 import re
 import shutil
+import uuid
 from datetime import datetime
 from io import BytesIO, StringIO
 from pathlib import Path
-from typing import Union, BinaryIO, Tuple, TextIO
+from typing import Union, BinaryIO, Tuple, TextIO, Iterator
 from urllib.parse import unquote
 
 import aiofiles
-import chardet
-import httpx
 from fastapi import UploadFile, HTTPException
 
 from app.core.configs.settings import settings
+from app.utils.charset import detect_encoding
 from app.utils.ext_mapper import mime_extension_map, extension_mime_map, timestamp_format_map, text_extensions
+from app.utils.http_client import async_download_url_to_path
 from app.utils.logger import get_logger
 
 logger = get_logger()
@@ -99,6 +101,18 @@ async def async_get_bytes_from_file(file: UploadFile, _=False) -> Tuple[bytes, i
     extension = get_extension_from_mime(file.content_type or "")
     return raw, size, extension
 
+async def async_spool_file(file: UploadFile, path: str, chunk_size: int = 1024 * 1024) -> Tuple[int, str]:
+    """把上传文件分块写入 path, 边写边计算 sha256, 内存占用只与 chunk_size 有关"""
+    digest = hashlib.sha256()
+    size = 0
+    await file.seek(0)
+    async with aiofiles.open(path, "wb") as f:
+        while chunk := await file.read(chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+            await f.write(chunk)
+    return size, digest.hexdigest()
+
 def get_bytes_from_file(file: UploadFile, _=False) -> Tuple[bytes, int, str]:
     raw = file.file.read()  # 直接使用 `UploadFile` 的文件对象
     size = len(raw)
@@ -130,12 +144,8 @@ def get_bytes_from_path(path: str) -> Tuple[Union[str, bytes], int]:
     return raw, size
 
 async def get_bytes_from_url(url: str) -> Tuple[bytes, int, str]:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, timeout=10.0)
-        response.raise_for_status()
-        raw = response.content  # 直接使用 `httpx.Response` 的内容对象
-        content_type = response.headers.get("content-type", "")
-    size = len(raw)
+    path, size, _, content_type = await async_download_url_to_path(url)
+    raw, size = await async_get_bytes_from_path(path)
     extension = get_extension_from_mime(content_type)
     return raw, size, extension
 
@@ -183,8 +193,8 @@ def encode_string(string: str, encoding="utf-8") -> bytes:
 
 def decode_bytes(byte: bytes, encoding="utf-8") -> str:
     default_encodings = ['utf-8', 'gbk', 'gb2312', 'latin1']
-    chardet_encoding = chardet.detect(byte)['encoding'] or encoding
-    encodings = [encoding] if chardet_encoding == encoding else [chardet_encoding, encoding]
+    detected_encoding = detect_encoding(byte, encoding)
+    encodings = [encoding] if detected_encoding == encoding else [detected_encoding, encoding]
     encodings.extend(default_encodings)
     for enc in encodings:
         try:
@@ -332,9 +342,10 @@ def ensure_bytesio(obj: Union[str, bytes, TextIO, BinaryIO], encoding="utf-8") -
 
 async def async_save_string_or_bytes_to_path(raw: Union[bytes, str], path: str, encoding="utf-8") -> str:
     # os.makedirs(os.path.dirname(path), exist_ok=True)  # 不自动创建目录，避免因传参错误而意外生成无效目录结构
-    encoding = chardet.detect(raw)['encoding'] or encoding if isinstance(raw, bytes) else encoding
     if not isinstance(raw, (str, bytes)):
         raise TypeError(f"Unsupported raw type: {type(raw)}. Must be str or bytes.")
+    # 只有字节内容写入文本文件时才需要知道原编码
+    encoding = detect_encoding(raw, encoding) if isinstance(raw, bytes) and is_text_file(path) else encoding
     if is_text_file(path):
         async with aiofiles.open(path, "w", encoding=encoding) as f:
             await f.write(binary_to_text(raw, encoding))
@@ -348,7 +359,7 @@ def save_string_or_bytes_to_path(raw: Union[bytes, str], path: str, encoding="ut
     # os.makedirs(os.path.dirname(path), exist_ok=True)  # 不自动创建目录，避免因传参错误而意外生成无效目录结构
     is_text = is_text_file(path)
     mode = "w" if is_text else "wb"
-    encoding = chardet.detect(raw)['encoding'] or encoding if isinstance(raw, bytes) else encoding
+    encoding = detect_encoding(raw, encoding) if isinstance(raw, bytes) and is_text else encoding
     with open(path, mode, encoding=encoding) as f:
         if isinstance(raw, str):
             f.write(raw if is_text else text_to_binary(raw, encoding))
@@ -368,6 +379,22 @@ def convert_bytes_to_base64(raw: Union[str, bytes], extension, encoding="utf-8")
     base64_str = f'{base64_head},{base64_data}'
     return base64_str
 
+async def async_file_to_base64(path: str, extension, chunk_size: int = 1024 * 1024) -> str:
+    """分块读取文件并编码为 base64 data URI, 不需要先把整个文件读入内存"""
+    chunk_size -= chunk_size % 3  # 3 字节对齐, 各块编码结果可直接拼接
+    media_type = get_mime_from_extension(extension)
+    parts = [f"data:{media_type};base64,"]
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(chunk_size):
+            parts.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(parts)
+
+def iter_raw_chunks(raw: Union[str, bytes], chunk_size: int = 1024 * 1024, encoding="utf-8") -> Iterator[bytes]:
+    # 按块切片输出, 不再复制到 BytesIO
+    data = memoryview(raw.encode(encoding) if isinstance(raw, str) else raw)
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
 def local_path_to_url(path: str, base_url: str, base_dir: str) -> str:
     if not path:
         return ""
@@ -407,4 +434,19 @@ def copy_file(src_path: str, dst_path: str) -> None:
         logger.error(f"文件复制失败: {e}")
         raise HTTPException(status_code=500, detail="文件复制失败")
 
-
+def link_or_copy_file(src_path: str, dst_path: str) -> None:
+    # 同一文件系统上优先硬链接, 避免复制大文件; 目标已是同一文件时视为成功, 已有其他文件时整体替换
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    if os.path.exists(dst_path):
+        if os.path.samefile(src_path, dst_path):
+            return
+        part_path = f"{dst_path}.{uuid.uuid4().hex}.part"
+        link_or_copy_file(src_path, part_path)
+        os.replace(part_path, dst_path)
+        return
+    try:
+        os.link(src_path, dst_path)
+    except FileExistsError:
+        link_or_copy_file(src_path, dst_path)  # 并发写入同一目标
+    except OSError:
+        copy_file(src_path, dst_path)
@@ -2,36 +2,48 @@ from app.services.convert_file import (convert_pdf_to_docx, convert_docx_to_md_o
                                        convert_html_to_docx,
                                        convert_docx_to_pdf, convert_html_to_pdf, convert_excel_and_markdown_or_html,
                                        convert_html_to_html, convert_html_to_md, convert_md_to_html,
-                                       convert_to_markdown)
+                                       convert_to_markdown, convert_md_to_txt, convert_html_to_txt,
+                                       convert_tables_streaming)
+from app.services.converter_registry import ConverterRegistry
+from app.services.pipeline import run_pipeline
+from app.utils.filetypes import markitdown_input_ext
 from app.utils.logger import get_logger
 
 logger = get_logger()
 
-def get_file_conversion():
-    conversion_map = {
-        "pdf2docx": convert_pdf_to_docx,
-        "docx2html": convert_docx_to_md_or_html,
-        "pdf2html": convert_pdf_to_md_or_html,
-        "html2docx": convert_html_to_docx,
-        "docx2pdf": convert_docx_to_pdf,
-        "html2pdf": convert_html_to_pdf,
-    }
-    markitdown_supported_types = {
-        "pdf", "docx", "pptx", "xlsx", "xls", "csv", "html", "json",
-        "xml", "txt", "epub", "zip", "jpg", "jpeg", "png", "mp3", "wav", "url"
-    }
-    for ext in markitdown_supported_types:
-        conversion_map[f"{ext}2md"] = convert_to_markdown
-    conversion_map["html2html"] = convert_html_to_html
-    conversion_map["html2md"] = convert_html_to_md
-    conversion_map["md2html"] = convert_md_to_html
-    excel_related_map = {
-        k: convert_excel_and_markdown_or_html for k in [
-            "csv2xlsx", "csv2html", "csv2md",
-            "xls2xlsx", "xls2html", "xls2md",
-            "xlsx2csv", "xlsx2html", "xlsx2md",
-            "html2xlsx", "html2csv", "md2xlsx",
-        ]
-    }
-    conversion_map.update(excel_related_map)
-    return conversion_map
\ No newline at end of file
+def build_converter_registry() -> ConverterRegistry:
+    registry = ConverterRegistry(pipeline_handler=run_pipeline)
+    register = registry.register
+    register("pdf", "docx", convert_pdf_to_docx, "pdf2docx", engines=("pdf2docx",), accepts_path=True)
+    register("docx", "html", convert_docx_to_md_or_html, "mammoth", engines=("mammoth",), accepts_path=True)
+    registry.register_pipeline("pdf2docx", "docx2html", description="pdf -> docx -> html")
+    for dst in ("html", "md"):
+        register("pdf", dst, convert_pdf_to_md_or_html, "pymupdf", "v2", engines=("pymupdf",), accepts_path=True,
+                 description="直接基于 PyMuPDF 版面提取, 不经过 docx")
+    register("html", "docx", convert_html_to_docx, "html2docx", engines=("html2docx",))
+    register("docx", "pdf", convert_docx_to_pdf, "libreoffice", binaries=("libreoffice",), accepts_path=True)
+    register("docx", "pdf", convert_docx_to_pdf, "pandoc", "v2", binaries=("pandoc",), accepts_path=True)
+    register("html", "pdf", convert_html_to_pdf, "wkhtmltopdf", engines=("pdfkit",), binaries=("wkhtmltopdf",))
+    register("html", "pdf", convert_html_to_pdf, "weasyprint", "v2", engines=("weasyprint",))
+    # MarkItDown 支持的输入统一转 markdown, 下面有专用转换器的类型会覆盖这里的默认项
+    for ext in sorted(markitdown_input_ext):
+        register(ext, "md", convert_to_markdown, "markitdown", engines=("markitdown",), accepts_path=True)
+    register("html", "html", convert_html_to_html, "bs4")
+    for variant, engine in (("", "markdownify"), ("v2", "html2text"), ("v3", "tomd"), ("v4", "html2markdown"), ("v5", "markitdown")):
+        register("html", "md", convert_html_to_md, engine, variant, engines=(engine,))
+    for variant, engine in (("", "markdown_it"), ("v2", "markdown"), ("v3", "mistune"), ("v4", "marko"), ("v5", "commonmark")):
+        register("md", "html", convert_md_to_html, engine, variant, engines=(engine,))
+    register("md", "txt", convert_md_to_txt, "regex")
+    register("html", "txt", convert_html_to_txt, "bs4")
+    for convert_type in ("csv2xlsx", "csv2html", "csv2md", "xls2xlsx", "xls2html", "xls2md",
+                         "xlsx2csv", "xlsx2html", "xlsx2md", "html2xlsx", "html2csv"):
+        src, dst = convert_type.split("2", 1)
+        register(src, dst, convert_excel_and_markdown_or_html, "pandas", engines=("pandas",), accepts_path=src != "html")
+    # 大表格逐行流式转换, 原 pandas 实现保留为 v2
+    for src, dst in (("xlsx", "csv"), ("xlsx", "md"), ("csv", "xlsx")):
+        register(src, dst, convert_tables_streaming, "openpyxl", engines=("openpyxl",), accepts_path=True,
+                 description="openpyxl read_only/write_only 逐行读写, 内存占用与行数无关")
+        register(src, dst, convert_excel_and_markdown_or_html, "pandas", "v2", engines=("pandas",), accepts_path=True)
+    return registry
+
+converter_registry = build_converter_registry()
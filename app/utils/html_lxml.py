@@ -0,0 +1,209 @@
+import re
+
+from bs4.builder import HTMLTreeBuilder
+from lxml import etree
+from lxml import html as lxml_html
+
+from app.utils.text import HTML_TEMPLATE, format_html_bs4, image_src, save_base64_images
+
+# format_html 的 lxml 实现 (settings.html_processor = "lxml"): 解析与遍历都在 libxml2 中完成, 序列化按 bs4 的规则
+# (属性排序与引号、最小转义、空元素写成 <br/>、纯空白文本折叠) 输出, 对生成的 HTML 与 format_html_bs4 逐字节一致.
+# 已知差异: libxml2 会修正非法嵌套 (如 <p> 中的 <div>), 无值属性 <input disabled> 输出为 disabled="disabled".
+# 完整文档 (含 doctype/html/head/body) 在两种解析器下的树结构不同, 直接交给 format_html_bs4.
+
+_VOID_TAGS = HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS
+_LIST_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+_PRESERVE_WHITESPACE_TAGS = HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS
+_CDATA_TAGS = {"script", "style"}
+_ASCII_SPACES = " \n\t\x0c\r"
+_full_document_pattern = re.compile(r"<(?:!doctype|html|head|body)[\s>/]", re.IGNORECASE)
+_parser = lxml_html.HTMLParser(huge_tree=True)  # 允许超过 10MB 的文本/属性 (base64 图片)
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _text(text: str, preserve: bool, cdata: bool = False) -> str:
+    # bs4 在 pre/textarea 之外把纯空白字符串折叠为一个换行或空格
+    if not preserve and not text.strip(_ASCII_SPACES):
+        text = "\n" if "\n" in text else " "
+    return text if cdata else _escape(text)
+
+def _list_attributes(tag: str) -> set:
+    return _LIST_ATTRIBUTES["*"] | _LIST_ATTRIBUTES.get(tag, set())
+
+def _attributes(element) -> str:
+    items = element.items()
+    if not items:
+        return ""
+    list_attributes = _list_attributes(element.tag)
+    parts = []
+    for key, value in sorted(items):
+        if key in list_attributes:
+            value = " ".join(value.split())
+        value = _escape(value)
+        quote = '"'
+        if '"' in value:
+            if "'" in value:
+                value = value.replace('"', "&quot;")
+            else:
+                quote = "'"
+        parts.append(f" {key}={quote}{value}{quote}")
+    return "".join(parts)
+
+def serialize(element) -> str:
+    """按 bs4 (formatter="minimal") 的规则序列化元素, 不含 tail"""
+    out, preserve = [], 0
+    for event, node in etree.iterwalk(element, events=("start", "end", "comment", "pi")):
+        if event == "start":
+            tag = node.tag
+            preserve += tag in _PRESERVE_WHITESPACE_TAGS
+            if tag in _VOID_TAGS:
+                out.append(f"<{tag}{_attributes(node)}/>")
+                continue
+            out.append(f"<{tag}{_attributes(node)}>")
+            if node.text:
+                out.append(_text(node.text, preserve > 0, tag in _CDATA_TAGS))
+            continue
+        if event == "end":
+            tag = node.tag
+            if tag not in _VOID_TAGS:
+                out.append(f"</{tag}>")
+            preserve -= tag in _PRESERVE_WHITESPACE_TAGS
+        elif event == "comment":
+            out.append(f"<!--{_text(node.text or '', preserve > 0, True)}-->")
+        else:
+            out.append(f"<?{node.target} {node.text}>" if node.text else f"<?{node.target}>")
+        if node.tail and node is not element:
+            out.append(_text(node.tail, preserve > 0))
+    return "".join(out)
+
+def flatten_table(element) -> str:
+    """与 text.flatten_table 相同: 将单层非嵌套表格展平为紧凑结构"""
+    if element.get("border") is None:
+        element.set("border", "1")
+    list_attributes = _list_attributes("table")
+    table_attrs = " ".join(f'{k}="{" ".join(v.split()) if k in list_attributes else v}"' for k, v in element.items())
+    lines = [f"<table {table_attrs}>".strip()]
+    for tr in element.iter("tr"):
+        if next(tr.iterancestors("table")) is not element:
+            continue
+        lines.append("<tr>" + "".join(serialize(td) for td in tr if td.tag in ("td", "th")) + "</tr>")
+    lines.append("</table>")
+    return "\n".join(lines)
+
+async def format_html_lxml(raw_html, policy, images_dir) -> str:
+    if _full_document_pattern.search(raw_html):
+        return await format_html_bs4(raw_html, policy, images_dir)
+    root = lxml_html.fragment_fromstring(raw_html, create_parent="root", parser=_parser)
+    # Step 1: 去掉表格中的 <p>
+    for p in list(root.iter("p")):
+        if next(p.iterancestors("td", "th"), None) is not None:
+            p.drop_tag()
+    # Step 2: 处理 base64 图片
+    images = [img for img in root.iter("img") if img.get("src", "").startswith("data:image")]
+    if images and policy == 'remove':
+        for img in images:
+            img.drop_tree()
+    elif images and policy != 'base64':
+        saved = await save_base64_images([img.get("src") for img in images], images_dir)
+        for img in images:
+            hash_name, save_path = saved[img.get("src")]
+            img.set("alt", f"image_{hash_name}")
+            src = image_src(save_path, policy)
+            if src:
+                img.set("src", src)
+    # Step 3: 遍历顶层元素 (跳过顶层文本与注释)
+    lines = [flatten_table(element) if element.tag == "table" else serialize(element)
+             for element in root if isinstance(element.tag, str)]
+    return HTML_TEMPLATE.substitute(body="\n".join(lines))
+
+
+if __name__ == "__main__":
+    # 金样对比 + 基准: 用仓库自身的引擎生成 HTML (mammoth / pandas / markdown 各引擎 / PyMuPDF 版面),
+    # 逐字节比较 format_html_bs4 与 format_html_lxml 的输出, 并在放大到约 5MB 时对比耗时.
+    import asyncio
+    import base64
+    import io
+    import tempfile
+    import time
+
+    import pandas as pd
+
+    from app.core.configs.settings import settings
+    from app.services.convert_file import _convert_tables, _md_to_html
+    from app.services.engines import load_engine
+
+    png = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==")
+
+    def docx_html(sections: int) -> str:
+        docx = load_engine("docx")
+        document = docx.Document()
+        for i in range(sections):
+            document.add_heading(f"Section {i} & <more>", 1)
+            document.add_paragraph("Lorem ipsum dolor sit amet, “quoted” 中文段落. " * 5)
+            document.add_paragraph(f"item {i}", style="List Bullet")
+            table = document.add_table(rows=4, cols=4)
+            table.rows[0].cells[0].paragraphs[0].add_run("header").bold = True
+            for r in range(1, 4):
+                for c in range(4):
+                    table.cell(r, c).text = f"r{r}c{c} a&b"
+            document.add_picture(io.BytesIO(png))
+        stream = io.BytesIO()
+        document.save(stream)
+        stream.seek(0)
+        return load_engine("mammoth").convert_to_html(stream).value
+
+    def xlsx_html(rows: int) -> str:
+        frame = pd.DataFrame({"id": range(rows), "name": [f"名称 {i} <x>" for i in range(rows)],
+                              "price": [i * 0.5 for i in range(rows)], "note": [None if i % 3 else "a & b" for i in range(rows)]})
+        stream = io.BytesIO()
+        with pd.ExcelWriter(stream) as writer:
+            frame.to_excel(writer, sheet_name="Sheet1", index=False)
+            frame.head(10).to_excel(writer, sheet_name="Sheet2", index=False)
+        return _convert_tables("xlsx2html", stream.getvalue())[0]
+
+    markdown_raw = ("# Title\n\nSome *emphasis*, `code < 1` & **bold**.\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n"
+                    "```python\nif a < b:\n    pass\n```\n\n- one\n- two\n  - nested\n\n> quote\n\n<div class=\"x  y\">raw html</div>\n\n")
+
+    def pdf_html(pages: int) -> str:
+        from app.services.pdf_layout import pdf_to_html_or_md
+        fitz = load_engine("pymupdf")
+        document = fitz.open()
+        for i in range(pages):
+            page = document.new_page()
+            page.insert_text((72, 72), f"Chapter {i + 1}", fontsize=22)
+            page.insert_textbox(fitz.Rect(72, 100, 520, 300), "Lorem ipsum <dolor> & sit amet. " * 12, fontsize=11)
+        return pdf_to_html_or_md("", document.tobytes(), False, "base64")
+
+    corpus = {"docx (mammoth)": docx_html(3), "xlsx (pandas)": xlsx_html(50), "pdf (pymupdf)": pdf_html(3)}
+    for engine in ("markdown_it", "markdown", "mistune", "marko", "commonmark"):
+        try:
+            corpus[f"md ({engine})"] = _md_to_html(markdown_raw, engine)
+        except ImportError:
+            pass
+    large = {"docx (mammoth) ~5MB": corpus["docx (mammoth)"] * (5 * 1024 * 1024 // len(corpus["docx (mammoth)"])),
+             "xlsx (pandas) ~5MB": xlsx_html(40000)}
+
+    async def run(images_dir: str) -> None:
+        print(f"{'document':<24}{'size':>9}{'bs4':>10}{'lxml':>10}{'speedup':>9}  identical")
+        for name, raw_html in {**corpus, **large}.items():
+            results, seconds = [], []
+            for formatter in (format_html_bs4, format_html_lxml):
+                # 小文档对比全部 policy, 大文档只对比计时的 url
+                policies = ("remove", "base64") if name in corpus else ()
+                outputs = [await formatter(raw_html, policy, images_dir) for policy in policies]
+                start_time = time.perf_counter()
+                outputs.append(await formatter(raw_html, "url", images_dir))
+                seconds.append(time.perf_counter() - start_time)
+                results.append(outputs)
+            print(f"{name:<24}{len(raw_html) // 1024:>7}KB{seconds[0]:>9.3f}s{seconds[1]:>9.3f}s"
+                  f"{seconds[0] / seconds[1]:>8.1f}x  {results[0] == results[1]}")
+            assert results[0] == results[1], f"{name}: lxml output differs from bs4"
+            if "data:image" in raw_html:
+                # url policy 下 base64 图片应落盘并改为静态 url
+                assert "data:image" not in results[1][-1] and settings.static_url in results[1][-1], name
+
+    # url policy 要求图片位于静态目录下; 临时目录用完即删, 不在静态目录中留下测试图片
+    with tempfile.TemporaryDirectory(dir=settings.static_root) as images_dir:
+        asyncio.run(run(images_dir))
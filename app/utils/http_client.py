@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiofiles
+import httpx
+
+from app.core.configs.settings import settings
+from app.models.exception_model import InputError, UpstreamFetchError
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+_client: Optional[httpx.AsyncClient] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def init_http_client() -> httpx.AsyncClient:
+    """创建应用级共享的 AsyncClient (连接复用 + keep-alive + HTTP/2), 在 lifespan 中调用"""
+    global _client
+    if _client is None:
+        limits = httpx.Limits(max_connections=settings.http_max_connections,
+                              max_keepalive_connections=settings.http_max_keepalive,
+                              keepalive_expiry=settings.http_keepalive_expiry)
+        _client = httpx.AsyncClient(http2=settings.http_http2, limits=limits, timeout=settings.http_timeout,
+                                    follow_redirects=True)
+        logger.info(f"HTTP client initialized: http2={settings.http_http2}, max_connections={settings.http_max_connections}.")
+    return _client
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    return _client if _client is not None else init_http_client()
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    host = urlparse(url).netloc
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = _host_semaphores[host] = asyncio.Semaphore(settings.http_per_host_limit)
+    return semaphore
+
+def _download_cache_dir() -> str:
+    return os.path.join(settings.static_root, "cache", "downloads")
+
+def _download_cache_paths(url: str) -> Tuple[str, str]:
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(_download_cache_dir(), f"{key}.bin"), os.path.join(_download_cache_dir(), f"{key}.json")
+
+def evict_download_cache(max_bytes: int, ttl: float, keep_recent: float = 60) -> int:
+    """按 TTL 与总大小淘汰下载缓存 (最久未使用的先删), 返回删除的文件数; 阻塞调用, 需在线程中执行.
+    keep_recent 秒内用过的副本不删除, 其他请求可能正在链接或读取"""
+    download_dir, now = _download_cache_dir(), time.time()
+    entries = []
+    for entry in os.scandir(download_dir) if os.path.isdir(download_dir) else []:
+        if entry.name.endswith(".bin"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+    used, removed = sum(size for _, size, _ in entries), 0
+    for mtime, size, path in entries:
+        if now - mtime < keep_recent or not ((ttl > 0 and now - mtime > ttl) or used > max_bytes):
+            continue
+        for file_path in (path, f"{path[:-4]}.json"):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+        used -= size
+        removed += 1
+    return removed
+
+async def async_download_url_to_path(url: str, max_size: int = 0, chunk_size: int = 0) -> Tuple[str, int, str, str]:
+    """流式下载 url 到本地缓存文件, 返回 (path, size, sha256, content_type).
+
+    超过 max_size 字节时中止下载; 本地已有副本时带上 ETag/Last-Modified 发起条件请求,
+    远端未变化 (304) 则直接复用本地文件, 不再传输内容.
+    """
+    max_size = max_size or settings.download_max_bytes
+    chunk_size = chunk_size or settings.download_chunk_size
+    data_path, meta_path = _download_cache_paths(url)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    meta, headers = {}, {}
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        async with aiofiles.open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.loads(await f.read())
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    client = get_http_client()
+    try:
+        async with _host_semaphore(url):
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and meta:
+                    logger.info(f"Remote file not modified, reuse local copy: {url}")
+                    os.utime(data_path)  # 记录最近使用时间, 淘汰时按 mtime 排序
+                    return data_path, meta["size"], meta["sha256"], meta.get("content_type", "")
+                response.raise_for_status()
+                content_length = int(response.headers.get("content-length") or 0)
+                if content_length > max_size:
+                    raise InputError(f"Remote file too large: {content_length} bytes > limit {max_size} bytes.")
+                part_path = f"{data_path}.{uuid.uuid4().hex}.part"
+                digest, size = hashlib.sha256(), 0
+                try:
+                    async with aiofiles.open(part_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            size += len(chunk)
+                            if size > max_size:
+                                raise InputError(f"Remote file exceeds size limit of {max_size} bytes: {url}")
+                            digest.update(chunk)
+                            await f.write(chunk)
+                    os.replace(part_path, data_path)
+                finally:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                meta = {"url": url, "size": size, "sha256": digest.hexdigest(),
+                        "content_type": response.headers.get("content-type", ""),
+                        "etag": response.headers.get("etag", ""), "last_modified": response.headers.get("last-modified", "")}
+    except httpx.HTTPStatusError as e:
+        raise UpstreamFetchError(f"Remote file request failed with status {e.response.status_code}: {url}") from e
+    except httpx.HTTPError as e:
+        raise UpstreamFetchError(f"Remote file request failed ({type(e).__name__}: {e}): {url}") from e
+    async with aiofiles.open(meta_path, "w", encoding="utf-8") as f:
+        await f.write(json.dumps(meta, ensure_ascii=False))
+    removed = await asyncio.to_thread(evict_download_cache, settings.download_cache_bytes, settings.download_cache_ttl)
+    if removed:
+        logger.info(f"Evicted {removed} files from the download cache.")
+    return data_path, meta["size"], meta["sha256"], meta["content_type"]
+
+
+if __name__ == "__main__":
+    # 使用本地 http.server 做替身验证: 第二次请求应命中 304 复用本地副本
+    import functools
+    import tempfile
+    import threading
+    import time
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    status_codes = []
+
+    class RecordingHandler(SimpleHTTPRequestHandler):
+        def log_request(self, code="-", size="-"):
+            status_codes.append(int(code))
+            super().log_request(code, size)
+
+    serve_dir = tempfile.TemporaryDirectory()
+    sample_raw = os.urandom(5 * 1024 * 1024)
+    with open(os.path.join(serve_dir.name, "sample.bin"), "wb") as sample:
+        sample.write(sample_raw)
+    with open(os.path.join(serve_dir.name, "large.bin"), "wb") as sample:
+        sample.write(os.urandom(2 * 1024 * 1024))
+    handler = functools.partial(RecordingHandler, directory=serve_dir.name)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sample_url = f"http://127.0.0.1:{server.server_port}/sample.bin"
+
+    async def main():
+        results = []
+        for i in range(2):
+            start_time = time.perf_counter()
+            path, size, sha256, _ = await async_download_url_to_path(sample_url)
+            print(f"download #{i + 1}: {size} bytes in {time.perf_counter() - start_time:.4f}s -> {path}")
+            with open(path, "rb") as f:
+                assert f.read() == sample_raw, "downloaded content differs from the served file"
+            results.append((path, size, sha256))
+        assert results[0] == results[1] == (results[0][0], len(sample_raw), hashlib.sha256(sample_raw).hexdigest())
+        assert status_codes == [200, 304], f"second download should be a conditional 304, got {status_codes}"
+        try:
+            await async_download_url_to_path(sample_url.replace("sample", "large"), max_size=1024 * 1024)
+        except InputError as e:
+            print(f"size cap: {e}")
+        else:
+            raise AssertionError("download over max_size should fail")
+        try:
+            await async_download_url_to_path(sample_url.replace("sample", "missing"))
+        except UpstreamFetchError as e:
+            print(f"missing file: {e}")
+        else:
+            raise AssertionError("download of a missing file should fail")
+        await close_http_client()
+
+    try:
+        asyncio.run(main())
+    finally:
+        server.shutdown()
+        serve_dir.cleanup()
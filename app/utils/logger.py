@@ -1,22 +1,77 @@
 """
 logger封装
 """
+import json
 import logging
 import os
 import shutil
 import sys
+import traceback
+from contextvars import ContextVar
 from datetime import datetime
 
 from loguru import logger
 
+from app.core.configs.settings import settings
+
+# 请求上下文: 由 log_request_middleware 设置, patcher 把 request_id 写入每条日志的 extra
+_request_id: ContextVar[str] = ContextVar("request_id", default="-")
+_request_sampled: ContextVar[bool] = ContextVar("request_sampled", default=True)
+_WARNING_NO = logger.level("WARNING").no
+
+def _patch_record(record) -> None:
+    record["extra"].setdefault("request_id", _request_id.get())
+    record["extra"].setdefault("sampled", _request_sampled.get())
+
+def _sampled(record) -> bool:
+    # 未采样的请求只丢弃 info 及以下的日志
+    return record["extra"]["sampled"] or record["level"].no >= _WARNING_NO
+
 # 移除所有默认的处理器
 logger.remove()
-logger.bind()
+logger.configure(patcher=_patch_record)
 
 # 自定义格式并添加到标准输出
 # log_format = "<g>{time:MM-DD HH:mm:ss}</g> <lvl>{level:<9}</lvl>| {file}:{line} | {message}"
-log_format = "<g>{time:MM-DD HH:mm:ss}</g> <lvl>{level:<9}</lvl> \n{message}"
-logger.add(sys.stdout, level="INFO", format=log_format, backtrace=True, diagnose=True)
+log_format = "<g>{time:MM-DD HH:mm:ss}</g> <lvl>{level:<9}</lvl> [{extra[request_id]}] \n{message}"
+logger.add(sys.stdout, level="INFO", format=log_format, backtrace=True, diagnose=False)
+
+
+def bind_request(request_id: str, sampled: bool = True) -> None:
+    """绑定当前请求的 request_id 与采样结果, 之后同一上下文 (含派生的任务) 中的日志都带上 request_id"""
+    _request_id.set(request_id)
+    _request_sampled.set(sampled)
+
+def get_request_id() -> str:
+    return _request_id.get()
+
+def request_log_enabled() -> bool:
+    """每个请求的 info 日志 (请求/响应参数等) 按 log_request_sample_rate 采样, 警告与错误不受影响"""
+    return _request_sampled.get()
+
+def cap_fields(value, max_chars: int = 0):
+    """递归截断过长的字符串字段 (base64/raw 内容等), 避免日志格式化和输出整段内容"""
+    max_chars = max_chars or settings.log_max_field_chars
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, dict):
+        return {k: cap_fields(v, max_chars) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [cap_fields(v, max_chars) for v in value]
+    return value
+
+def _json_format(record) -> str:
+    # 一行一个 JSON 对象; 先序列化到 extra 再由格式串引用, 避免消息中的花括号被当作格式字段
+    payload = {"time": record["time"].isoformat(), "level": record["level"].name,
+               "request_id": record["extra"].get("request_id"), "module": record["name"],
+               "function": record["function"], "line": record["line"], "message": record["message"]}
+    if record["exception"] is not None:
+        exc_type, exc_value, exc_traceback = record["exception"]
+        payload["exception"] = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+    record["extra"]["json"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[json]}\n"
 
 
 def configure_logging():
@@ -53,12 +108,15 @@ def setup_logger(log_type="console_file", log_file="logs/api.log", console_level
     rename_file(log_file)
     console_level_no = logger.level(console_level).no
     file_level_no = logger.level(file_level).no
+    # enqueue: 格式化后的日志交给后台线程写出, 请求协程不等待 IO; diagnose 会展开每一帧的局部变量 (可能是整个文件内容), 默认关闭
+    log_formatter = _json_format if settings.log_format == "json" else log_format
+    options = {"format": log_formatter, "backtrace": True, "diagnose": settings.log_diagnose, "enqueue": settings.log_enqueue}
     if log_type in ("console", "console_file"):
-        logger.add(sys.stdout, level=console_level, format=log_format, backtrace=True, diagnose=True,
-                   filter=lambda record: console_level_no <= record["level"].no != file_level_no)
+        logger.add(sys.stdout, level=console_level, **options,
+                   filter=lambda record: console_level_no <= record["level"].no != file_level_no and _sampled(record))
     if log_type in ("file", "console_file"):
-        logger.add(log_file, encoding="utf-8", level=file_level, format=log_format, backtrace=True, diagnose=True,
-                   filter=lambda record: file_level_no <= record["level"].no != console_level_no)
+        logger.add(log_file, encoding="utf-8", level=file_level, **options,
+                   filter=lambda record: file_level_no <= record["level"].no != console_level_no and _sampled(record))
     # else:
     #     logger.add(sys.stdout, level=console_level, format=log_format, backtrace=True, diagnose=True,
     #                filter=lambda record: console_level_no <= record["level"].no != file_level_no)
@@ -94,3 +152,36 @@ def rename_file(ori_path='logs/api.log'):
         os.remove(ori_path)
     return ori_path, new_path
 
+
+
+if __name__ == "__main__":
+    # 微基准: 每个请求记录一次含 5MB base64 的请求参数 + 若干条普通日志, 对比原配置 (同步写出, diagnose, 整段输出)
+    # 与当前配置 (enqueue, 字段截断, JSON/文本), 输出写到临时文件, 只统计调用方 (请求协程) 花费的时间
+    import tempfile
+    import time
+
+    payload = {"sno": 1, "extra": {"category": "bench"}, "data": {"file_name": "a.pdf", "file_base64": "QUJD" * (5 * 1024 * 256)}}
+    requests = 200
+
+    def run(label: str, enqueue: bool, diagnose: bool, capped: bool, log_formatter) -> None:
+        logger.remove()
+        path = tempfile.mktemp(suffix=".log")
+        logger.add(path, format=log_formatter, enqueue=enqueue, diagnose=diagnose, backtrace=True)
+        start_time = time.perf_counter()
+        for i in range(requests):
+            bind_request(f"req{i}")
+            logger.info(f"Convert file request param: {cap_fields(payload) if capped else payload}.")
+            for _ in range(8):
+                logger.info("Converting docx to html or markdown: docx2html...")
+            try:
+                raise ValueError("bad input")
+            except ValueError:
+                logger.exception("conversion failed")
+        elapsed = time.perf_counter() - start_time
+        logger.remove()  # 等待后台线程写完
+        print(f"{label:<34}{elapsed / requests * 1000:>9.3f} ms/request  {os.path.getsize(path) // 1024:>9} KB written")
+        os.remove(path)
+
+    run("sync, diagnose, full fields", False, True, False, log_format)
+    run("enqueue, capped fields (text)", True, False, True, log_format)
+    run("enqueue, capped fields (json)", True, False, True, _json_format)
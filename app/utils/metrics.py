@@ -0,0 +1,180 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 进程内指标: 计数器/仪表/直方图按标签值聚合, 由 /metrics 以 Prometheus 文本格式 (0.0.4) 输出.
+# 请求内各阶段的耗时同时记入 request_timings, 由 metrics_middleware 写入 Server-Timing 响应头.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1KB ~ 256MB
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_INF_BUCKET = 'le="+Inf"'
+
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+_stage_labels: ContextVar[Tuple[str, str]] = ContextVar("stage_labels", default=("", ""))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]  # 各桶计数 (非累计), 总和, 次数
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._values.items())]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, _INF_BUCKET)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+registry: List[Metric] = []
+collectors: List[Callable[[], None]] = []  # 输出前调用, 用于从各组件的 stats() 刷新仪表
+
+
+def render_metrics() -> str:
+    for collect in collectors:
+        collect()
+    return "\n".join(line for metric in registry for line in metric.render()) + "\n"
+
+
+REQUEST_SECONDS = Histogram("docflow_http_request_duration_seconds", "HTTP request latency.",
+                            ("method", "route", "status"))
+STAGE_SECONDS = Histogram("docflow_stage_duration_seconds", "Latency of file operation stages.",
+                          ("mode", "convert_type", "stage"))
+CONVERTER_SECONDS = Histogram("docflow_converter_duration_seconds", "Converter latency (pipeline stages included).",
+                              ("convert_type", "engine", "status"))
+INPUT_BYTES = Histogram("docflow_input_bytes", "Input file size.", ("mode", "convert_type"), SIZE_BUCKETS)
+OUTPUT_BYTES = Histogram("docflow_output_bytes", "Output file size.", ("mode", "convert_type"), SIZE_BUCKETS)
+CACHE_LOOKUPS = Counter("docflow_conversion_cache_lookups_total", "Conversion cache lookups.", ("convert_type", "result"))
+IN_FLIGHT = Gauge("docflow_in_flight_requests", "File operations in progress.", ("mode", "convert_type"))
+ERRORS = Counter("docflow_errors_total", "Errors classified by file_exception.", ("error", "status"))
+
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+def set_stage_labels(mode: str, convert_type: str = "") -> None:
+    _stage_labels.set((mode, convert_type))
+
+def record_stage(name: str, seconds: float) -> None:
+    mode, convert_type = _stage_labels.get()
+    STAGE_SECONDS.observe(seconds, mode=mode, convert_type=convert_type, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """记录一个阶段的耗时: with stage("convert"): await ..."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start_time)
+
+@contextmanager
+def converter_timer(convert_type: str, engine: str) -> Iterator[None]:
+    """记录转换器耗时, 按是否抛出异常区分 status"""
+    start_time, status = time.perf_counter(), "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        CONVERTER_SECONDS.observe(time.perf_counter() - start_time, convert_type=convert_type, engine=engine, status=status)
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    # 同名阶段 (如批量转换中每个文件的 convert) 合并为一项
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in merged.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -1,9 +1,12 @@
 import asyncio
+import importlib.util
+import os
+import shutil
 import signal
 import sys
 import time
+from functools import lru_cache
 
-import GPUtil
 import psutil
 
 from app.models.exception_model import SigIntException, SigTermException, ShutdownSignalException
@@ -12,17 +15,15 @@ from app.utils.loop import get_loop
 
 logger = get_logger()
 
-def get_system_status():
-    cpu_percent = psutil.cpu_percent(interval=1)
-    memory_info = psutil.virtual_memory()
-    memory_total = f"{memory_info.total / (1024 ** 3):.2f} GB"
-    memory_available = f"{memory_info.available / (1024 ** 3):.2f} GB"
-    memory_used = f"{memory_info.used / (1024 ** 3):.2f} GB"
-    memory_percent = memory_info.percent
+@lru_cache(maxsize=1)
+def gpu_available() -> bool:
+    """GPUtil 依赖 nvidia-smi, 两者都存在时才探测 GPU"""
+    return importlib.util.find_spec("GPUtil") is not None and shutil.which("nvidia-smi") is not None
+
+def get_gpu_status() -> list:
+    import GPUtil
     gpuInfo = []
-    devices = ["cpu", "cuda:0"]
-    gpus = GPUtil.getGPUs()
-    for gpu in gpus:
+    for gpu in GPUtil.getGPUs():
         gpuInfo.append(
             {
                 "gpu_id": gpu.id,
@@ -35,6 +36,27 @@ def get_system_status():
                 }
             }
         )
+    return gpuInfo
+
+def existing_parent(path: str) -> str:
+    """path 不存在时 (如 static_root 尚未创建) 向上取最近的已存在目录"""
+    path = os.path.abspath(path or "/")
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+def get_system_status(gpu: bool = True, disk_path: str = "/"):
+    """采集一次系统状态; cpu_percent 为距上次调用以来的占用率 (不阻塞), 首次调用返回 0"""
+    cpu_percent = psutil.cpu_percent(interval=None)
+    memory_info = psutil.virtual_memory()
+    memory_total = f"{memory_info.total / (1024 ** 3):.2f} GB"
+    memory_available = f"{memory_info.available / (1024 ** 3):.2f} GB"
+    memory_used = f"{memory_info.used / (1024 ** 3):.2f} GB"
+    memory_percent = memory_info.percent
+    gpuInfo = get_gpu_status() if gpu and gpu_available() else []
+    devices = ["cpu"] + [f"cuda:{gpu['gpu_id']}" for gpu in gpuInfo]
+    disk_path = existing_parent(disk_path)
+    disk_info = psutil.disk_usage(disk_path)
     status_data = {
         "devices": devices,
         "cpu_percent": cpu_percent,
@@ -43,9 +65,25 @@ def get_system_status():
         "memory_used": memory_used,
         "memory_percent": memory_percent,
         "gpu": gpuInfo,
+        "disk": {"path": disk_path, "total": disk_info.total, "used": disk_info.used, "free": disk_info.free,
+                 "percent": disk_info.percent},
     }
     return status_data
 
+def get_process_status(process: psutil.Process) -> dict:
+    """当前进程与子进程 (转换工作进程、soffice 实例等) 的内存占用"""
+    with process.oneshot():
+        info = {"pid": process.pid, "rss": process.memory_info().rss, "cpu_percent": process.cpu_percent(interval=None),
+                "threads": process.num_threads()}
+    workers = []
+    for child in process.children(recursive=True):
+        try:
+            workers.append({"pid": child.pid, "name": child.name(), "rss": child.memory_info().rss})
+        except psutil.Error:  # 采样期间退出的子进程
+            continue
+    info["workers"] = workers
+    return info
+
 def keep_alive():
     while True:
         time.sleep(3600)
@@ -1,9 +1,14 @@
+import asyncio
 import hashlib
+import io
+import os
 import re
+import threading
 import time
+from concurrent.futures import Executor, ThreadPoolExecutor
 from pathlib import Path
 from string import Template
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 from typing import Union
 
 from bs4 import BeautifulSoup
@@ -13,9 +18,21 @@ from app.core.configs.settings import settings
 from app.utils.file import async_save_string_or_bytes_to_path, \
     get_bytes_from_base64, local_path_to_url
 from app.utils.logger import get_logger
+from app.utils.metrics import stage
 
 logger = get_logger()
 
+# base64 图片解码/哈希/缩放的线程池 (hashlib 与 Pillow 处理大块数据时会释放 GIL), 首次处理图片时才创建
+_image_pool: Optional[ThreadPoolExecutor] = None
+_image_pool_lock = threading.Lock()
+
+def _get_image_pool() -> ThreadPoolExecutor:
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            _image_pool = ThreadPoolExecutor(max_workers=settings.image_workers, thread_name_prefix="image")
+        return _image_pool
+
 HTML_TEMPLATE = Template("""<!DOCTYPE html>
 <html>
 <head>
@@ -47,31 +64,58 @@ $body
 #     final_html = str(soup)
 #     return final_html
 
-def split_texts(texts: Union[str, List[str]], min_tokens: int = 20, max_tokens: int = 100) -> List[List[str]]:
-    def split_text(text: str, sentences: List[str]) -> List[str]:
-        if len(text) <= max_tokens:
-            # 如果文本长度不超过100个字，则不需要断句
-            sentences.append(text) if text.strip() else None
-            return sentences
-        start, mid, end = min_tokens, (len(text)) // 2 , min(max_tokens, len(text) - min_tokens)
+def iter_split_offsets(text: str, min_tokens: int = 20, max_tokens: int = 100) -> Iterator[Tuple[int, int]]:
+    """逐句产出 (起, 止) 偏移: 每次在剩余文本的 [min_tokens, max_tokens] 窗口内找标点断开, 超过 max_tokens 才断句.
+    只移动下标, 不复制剩余文本, 也没有递归, 耗时与文本长度成线性"""
+    assert min_tokens <= max_tokens, f"Invalid range: min_tokens={min_tokens}, max_tokens={max_tokens}"
+    pos, length = 0, len(text)
+    while length - pos > max_tokens:
+        remaining = length - pos
+        start, mid, end = min_tokens, remaining // 2, min(max_tokens, remaining - min_tokens)
         mid = max(start, min(mid, end))  # 保证在正常范围内
-        reverse = False if len(text) <= min_tokens + max_tokens else True
-        cut_text = text[mid:end]
-        punc = get_punctuation(cut_text)
-        index = get_punc_index(text, punc, start, mid, end, reverse=reverse)
-        # 按照找到的位置分割文本
-        first_sentence = text[:index + 1]
-        second_sentence = text[index + 1:]
-        sentences.append(first_sentence)
-        sentences = split_text(second_sentence, sentences)
-        return sentences
+        reverse = remaining > min_tokens + max_tokens
+        punc = get_punctuation(text[pos + mid:pos + end])
+        index = get_punc_index(text, punc, pos + start, pos + mid, pos + end, reverse=reverse)
+        stop = max(index + 1, pos + 1)  # max_tokens 为 0 时也保证前进
+        yield pos, stop
+        pos = stop
+    # 剩余文本不超过 max_tokens 时不需要断句, 空白则丢弃
+    if text[pos:].strip():
+        yield pos, length
+
+def iter_split_text(text: str, min_tokens: int = 20, max_tokens: int = 100) -> Iterator[str]:
+    for start, end in iter_split_offsets(text, min_tokens, max_tokens):
+        yield text[start:end]
+
+def _split_text(text: str, min_tokens: int, max_tokens: int) -> List[str]:
+    return list(iter_split_text(text, min_tokens, max_tokens))
+
+def split_texts(texts: Union[str, List[str]], min_tokens: int = 20, max_tokens: int = 100,
+                executor: Optional[Executor] = None) -> List[List[str]]:
+    """逐个文档断句; 传入 executor (如进程池) 时每个文档一个任务并行切分, 结果顺序与输入一致"""
     assert min_tokens <= max_tokens, f"Invalid range: min_tokens={min_tokens}, max_tokens={max_tokens}"
     texts = [texts] if isinstance(texts, str) else texts
-    all_sentences = []
-    for one_text in texts:
-        one_sentences = split_text(one_text, [])
-        all_sentences.append(one_sentences)
-    return all_sentences
+    if executor is not None and len(texts) > 1:
+        count = len(texts)
+        return list(executor.map(_split_text, texts, [min_tokens] * count, [max_tokens] * count))
+    return [_split_text(text, min_tokens, max_tokens) for text in texts]
+
+def chunk_text(text: str, min_tokens: int = 20, max_tokens: int = 100) -> List[str]:
+    """按行断句 (规则同 split_texts), 再把相邻的短句合并为不超过 max_tokens 个字的块"""
+    chunks, current = [], ""
+    for line in text.splitlines():
+        for sentence in iter_split_text(line.strip(), min_tokens, max_tokens):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if current and len(current) + len(sentence) + 1 > max_tokens:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current}\n{sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
 
 def get_punctuation(text):
     punctuation_groups = [
@@ -87,10 +131,12 @@ def get_punctuation(text):
     return [p for group in punctuation_groups for p in group]
 
 def search_punc(text, punctuation, start, end, step):
-    for i in range(start, end, step):
-        if text[i] in punctuation:
-            return i
-    return None
+    # 返回 range(start, end, step) 中第一个标点的位置; 用 str.find/rfind 在 C 中查找, 不逐字符循环
+    if step > 0:
+        found = [i for i in (text.find(p, start, end) for p in punctuation) if i >= 0]
+        return min(found) if found else None
+    found = [i for i in (text.rfind(p, max(end + 1, 0), start + 1) for p in punctuation) if i >= 0]
+    return max(found) if found else None
 
 def get_punc_index(text, punctuation, start, mid, end, reverse=False) -> int:
     if reverse:
@@ -128,53 +174,105 @@ async def strip_markdown(text: str) -> str:
     text = text.strip()
     return text
 
-async def handle_base64_image(img, policy, images_dir) -> None:
-    """处理 base64 图片，根据 policy 返回修改后的 img 标签"""
-    src = img.get("src", "")
-    if not src.startswith("data:image"):
-        return
-    if policy == 'remove':
-        img.decompose()
-    elif policy == 'base64':
-        pass  # 保留原始 base64
-    else:
-        image_raw, _, image_ext = get_bytes_from_base64(src)
-        ext = image_ext or '.jpg'
-        hash_name = hashlib.md5(image_raw).hexdigest()
-        save_path = Path(images_dir) / f"{hash_name}{ext}"
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        save_path = str(save_path).replace("\\", "/")
-        await async_save_string_or_bytes_to_path(image_raw, save_path)
+def downscale_image(image_raw: bytes, max_dimension: int) -> bytes:
+    """长边超过 max_dimension 时等比缩小并按原格式重新编码; 无法识别的格式 (如 emf/wmf) 原样返回"""
+    from PIL import Image  # 只有需要缩放时才导入 Pillow
+    try:
+        with Image.open(io.BytesIO(image_raw)) as image:
+            if max(image.size) <= max_dimension or not image.format:
+                return image_raw
+            image_format = image.format
+            image.thumbnail((max_dimension, max_dimension))
+            output = io.BytesIO()
+            image.save(output, format=image_format, optimize=True)
+    except Exception as e:
+        logger.warning(f"Skip downscaling image: {type(e).__name__}: {e}")
+        return image_raw
+    return output.getvalue() if output.tell() < len(image_raw) else image_raw
+
+def _prepare_base64_image(src: str, images_dir: str, max_dimension: int) -> Tuple[str, str, Optional[bytes]]:
+    """解码并按内容哈希命名, 返回 (hash_name, save_path, 待写入内容); 同名文件已存在时不再缩放和写入"""
+    image_raw, _, image_ext = get_bytes_from_base64(src)
+    ext = image_ext or '.jpg'
+    hash_name = hashlib.md5(image_raw).hexdigest()
+    if max_dimension:
+        hash_name = f"{hash_name}_{max_dimension}"
+    save_path = str(Path(images_dir) / f"{hash_name}{ext}").replace("\\", "/")
+    if os.path.exists(save_path):
+        return hash_name, save_path, None
+    if max_dimension:
+        image_raw = downscale_image(image_raw, max_dimension)
+    return hash_name, save_path, image_raw
+
+async def save_base64_images(sources: List[str], images_dir,
+                             executor: Optional[Executor] = None) -> Dict[str, Tuple[str, str]]:
+    """相同图片只解码一次, 解码/哈希并行, 已存在的文件跳过, 其余并发写入; 返回 data URI -> (hash_name, save_path)
+    executor 为空时使用模块内的图片线程池"""
+    sources = list(dict.fromkeys(sources))
+    if not sources:
+        return {}
+    Path(images_dir).mkdir(parents=True, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    executor = executor or _get_image_pool()
+    prepared = await asyncio.gather(*(loop.run_in_executor(executor, _prepare_base64_image, src, images_dir,
+                                                           settings.image_max_dimension) for src in sources))
+    # 不同 data URI (如 mime 写法不同) 可能对应同一文件, 按路径去重后再写
+    pending = {save_path: image_raw for _, save_path, image_raw in prepared if image_raw is not None}
+    await asyncio.gather(*(async_save_string_or_bytes_to_path(image_raw, save_path)
+                           for save_path, image_raw in pending.items()))
+    if len(sources) > 1:
+        logger.info(f"Handled {len(sources)} unique images, {len(pending)} written.")
+    return {src: (hash_name, save_path) for src, (hash_name, save_path, _) in zip(sources, prepared)}
 
+def image_src(save_path: str, policy) -> Optional[str]:
+    """图片落盘后 img 的新 src; 其他 policy 保持原 src"""
+    if policy == 'path':
+        return save_path
+    if policy == 'url':
+        return local_path_to_url(save_path, settings.static_url, settings.static_root)
+    return None
+
+async def handle_base64_images(images: List[Tag], policy, images_dir) -> None:
+    """处理 base64 图片，根据 policy 修改 img 标签"""
+    images = [img for img in images if img.get("src", "").startswith("data:image")]
+    if not images or policy == 'base64':
+        return  # 保留原始 base64
+    if policy == 'remove':
+        for img in images:
+            img.decompose()
+        return
+    saved = await save_base64_images([img["src"] for img in images], images_dir)
+    for img in images:
+        hash_name, save_path = saved[img["src"]]
         img["alt"] = f"image_{hash_name}"
-        if policy == 'path':
-            img["src"] = save_path
-        elif policy == 'url':
-            save_url = local_path_to_url(save_path, settings.static_url, settings.static_root)
-            img["src"] = save_url
+        src = image_src(save_path, policy)
+        if src:
+            img["src"] = src
 
 def flatten_table(element: Tag) -> str:
     """将单层非嵌套表格展平为紧凑结构"""
     if not element.has_attr("border"):
         element["border"] = "1"
-    table_attrs = " ".join([f'{k}="{v}"' for k, v in element.attrs.items()])
+    # class 等多值属性在 bs4 中是列表, 按空格拼回
+    table_attrs = " ".join([f'{k}="{" ".join(v) if isinstance(v, list) else v}"' for k, v in element.attrs.items()])
     table_line = f"<table {table_attrs}>".strip()
-    for tr in element.find_all("tr", recursive=False):
+    # 包括 thead/tbody/tfoot 中的行, 但不包括嵌套表格的行
+    for tr in element.find_all("tr"):
+        if tr.find_parent("table") is not element:
+            continue
         tr_html = "".join([str(td).strip() for td in tr.find_all(["td", "th"], recursive=False)])
         table_line += f"\n<tr>{tr_html}</tr>"
     table_line += "\n</table>"
     return table_line
 
-async def format_html(raw_html, policy, images_dir) -> str:
-    """格式化 HTML，包括去嵌套表格、去 <p>、加 border 等"""
+async def format_html_bs4(raw_html, policy, images_dir) -> str:
     soup = BeautifulSoup(f"<root>{raw_html}</root>", "html.parser")
     # Step 1: 去掉表格中的 <p>
     for p in soup.find_all("p"):
         if p.find_parent("td") or p.find_parent("th"):
             p.unwrap()
     # Step 2: 处理 base64 图片
-    for img in soup.find_all("img"):
-        await handle_base64_image(img, policy, images_dir)
+    await handle_base64_images(soup.find_all("img"), policy, images_dir)
     # Step 3: 遍历顶层元素，结构化处理
     lines = []
     for element in soup.root.contents:
@@ -193,9 +291,52 @@ async def format_html(raw_html, policy, images_dir) -> str:
     full_html = HTML_TEMPLATE.substitute(body=final_html)
     return full_html
 
+async def format_html(raw_html, policy, images_dir) -> str:
+    """格式化 HTML，包括去嵌套表格、去 <p>、加 border 等; 实现由 settings.html_processor 选择"""
+    with stage("format_html"):
+        if settings.html_processor == "lxml":
+            from app.utils.html_lxml import format_html_lxml
+            return await format_html_lxml(raw_html, policy, images_dir)
+        return await format_html_bs4(raw_html, policy, images_dir)
+
 
 if __name__ == "__main__":
-    # 测试
+    # 测试 + 基准: 与原递归实现逐句对比, 再在 10KB / 1MB / 50MB 输入上对比耗时, 以及多个文档在进程池中并行切分
+    import random
+    import sys
+    from concurrent.futures import ProcessPoolExecutor
+
+    def split_texts_recursive(texts, min_tokens=20, max_tokens=100):
+        # 原实现: 每断一句递归一次并复制剩余文本
+        def search_punc_loop(text, punctuation, start, end, step):
+            for i in range(start, end, step):
+                if text[i] in punctuation:
+                    return i
+            return None
+
+        def punc_index(text, punctuation, start, mid, end, reverse=False):
+            if reverse:
+                idx = search_punc_loop(text, punctuation, end - 1, start - 1, -1)
+                return idx if idx is not None else end - 1
+            idx = search_punc_loop(text, punctuation, mid, end, 1)
+            if idx is not None:
+                return idx
+            idx = search_punc_loop(text, punctuation, mid - 1, start - 1, -1)
+            return idx if idx is not None else end - 1
+
+        def split_text(text, sentences):
+            if len(text) <= max_tokens:
+                sentences.append(text) if text.strip() else None
+                return sentences
+            start, mid, end = min_tokens, (len(text)) // 2, min(max_tokens, len(text) - min_tokens)
+            mid = max(start, min(mid, end))
+            reverse = False if len(text) <= min_tokens + max_tokens else True
+            punc = get_punctuation(text[mid:end])
+            index = punc_index(text, punc, start, mid, end, reverse=reverse)
+            sentences.append(text[:index + 1])
+            return split_text(text[index + 1:], sentences)
+        return [split_text(text, []) for text in ([texts] if isinstance(texts, str) else texts)]
+
     test_text = (
         "在夜幕降临之际星星闪烁着微光月亮静静地悬挂在天空."
         "一阵微风拂过树叶沙沙作响似乎说着未来的故事!"
@@ -203,9 +344,6 @@ if __name__ == "__main__":
         "突然闪电划破了夜空随之而来的是雷声的轰鸣！"
         "雨滴敲打着窗户节奏有序而明快在这样的夜晚任何故事都有可能发生任何梦想都有可能实现。"
     )
-    # with open("content_1600.txt") as f:
-    # with open("exam_1000.txt") as f:
-    #     test_text = f.read()  #  680 微秒/次，  1240 微秒/5次
     test_texts = [test_text] * 5
     split_min_tokens = 20
     split_max_tokens = 100
@@ -214,6 +352,52 @@ if __name__ == "__main__":
     end_time = time.perf_counter()
     for sen in sens:
         print(f"sen:{sen}\n")
-    print(f"Execution time: {end_time - start_time} seconds")   # 1次约 37微秒, 5次 145 微秒
+    print(f"Execution time: {end_time - start_time} seconds")
+
+    # 金样: 随机文本 (含无标点长段、纯空白、各种 min/max) 与原实现逐句一致
+    rng = random.Random(0)
+    alphabet = "天地玄黄宇宙洪荒abcdefg xyz" * 3 + ".,!?;:。，！？；：、 \n"
+    samples = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 2000))) for _ in range(300)]
+    samples += ["x" * 999, " " * 500, "a." * 400, test_text * 7]
+    ranges = [(20, 100), (0, 10), (50, 60), (1, 1), (100, 500), (30, 40)]
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(20000)  # 原实现每句一层递归, 对比时临时放宽
+    identical = all(split_texts(samples, lo, hi) == split_texts_recursive(samples, lo, hi) for lo, hi in ranges)
+    sys.setrecursionlimit(recursion_limit)
+    print(f"identical to recursive implementation: {identical} ({len(samples)} samples x {len(ranges)} ranges)")
+    assert identical, "iterative split differs from the recursive implementation"
 
+    unit = test_text + "\n" + "The quick brown fox jumps over the lazy dog, again and again; " * 3 + "\n"
+    print(f"{'size':>8}{'recursive':>16}{'iterative':>14}{'sentences':>12}")
+    for size in (10 * 1024, 1024 * 1024, 50 * 1024 * 1024):
+        document = unit * (size // len(unit) + 1)
+        old_text = "(skipped)"
+        if size <= 1024 * 1024:
+            try:
+                start_time = time.perf_counter()
+                split_texts_recursive(document, split_min_tokens, split_max_tokens)
+                old_text = f"{(time.perf_counter() - start_time) * 1000:.1f} ms"
+            except RecursionError:
+                old_text = "RecursionError"
+        start_time = time.perf_counter()
+        offsets = list(iter_split_offsets(document, split_min_tokens, split_max_tokens))
+        count = len(offsets)
+        print(f"{size // 1024:>6}KB{old_text:>16}{(time.perf_counter() - start_time) * 1000:>11.1f} ms{count:>12}")
+        # 句子首尾相接覆盖全文, 且都不超过 max_tokens
+        assert offsets[0][0] == 0 and offsets[-1][1] == len(document), "sentences do not cover the document"
+        assert all(end == next_start for (_, end), (next_start, _) in zip(offsets, offsets[1:])), "sentences overlap or skip"
+        assert all(end - start <= split_max_tokens for start, end in offsets), "sentence longer than max_tokens"
+    print(f"(sys.getrecursionlimit() = {sys.getrecursionlimit()})")
 
+    documents = [unit * (1024 * 1024 // len(unit))] * 8
+    start_time = time.perf_counter()
+    serial = split_texts(documents, split_min_tokens, split_max_tokens)
+    serial_seconds = time.perf_counter() - start_time
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        split_texts(documents[:1], split_min_tokens, split_max_tokens, executor=pool)  # 预热工作进程
+        start_time = time.perf_counter()
+        parallel = split_texts(documents, split_min_tokens, split_max_tokens, executor=pool)
+        parallel_seconds = time.perf_counter() - start_time
+    print(f"8 x 1MB documents: serial {serial_seconds:.3f} s, process pool ({os.cpu_count()} cpu) {parallel_seconds:.3f} s, "
+          f"identical: {serial == parallel}")
+    assert serial == parallel, "process pool split differs from serial split"
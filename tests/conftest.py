@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings 在导入时读取环境变量; 未配置 .env 时用测试默认值, 静态目录与数据库放在临时目录中
+_static_root = tempfile.mkdtemp(prefix="docflow_tests_")
+_defaults = {
+    "PROJECT_NAME": "DocFlow", "PROJECT_DESCRIPTION": "DocFlow tests", "PROJECT_VERSION": "0.0.0",
+    "SECRET_KEY": "test-secret", "API_KEY": "test-key", "ACCESS_TOKEN_EXPIRE_MINUTES": "10",
+    "HOST": "127.0.0.1", "PORT": "8000", "CORS_ORIGINS": "*", "API_PREFIX_V1": "/v1",
+    "CONFIG_FILE": "app/core/configs/config.json", "WHITELIST_PATHS": "[]",
+    "MP_MODEL_NAME": "x", "FS_MODEL_NAME": "x", "WECHAT_MP_SECRET": "x", "DIFY_MP_SECRET": "x", "DIFY_FS_SECRET": "x",
+    "APP_ID": "x", "APP_SECRET": "x", "MAX_RETRIES": "1",
+    "DATABASE_URL": f"sqlite:///{_static_root}/app.db", "STATIC_ROOT": _static_root,
+    "STATIC_URL": "http://127.0.0.1:8000/static",
+}
+for _key, _value in _defaults.items():
+    os.environ.setdefault(_key, _value)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """整个测试会话共用一个应用实例 (lifespan 只启动一次)"""
+    from fastapi.testclient import TestClient
+    from app.f_main import app
+    from app.core.configs.settings import settings
+
+    with TestClient(app, headers={"Authorization": f"Bearer {settings.secret_key}"}) as test_client:
+        yield test_client
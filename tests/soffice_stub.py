@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""soffice 桩脚本, 供 soffice 实例池的检查使用 (python -m app.services.soffice_pool).
+
+带 --accept 参数启动时模拟常驻 soffice: 监听 UNO 端口直到被终止, 端口已被占用时启动失败 (同一端口重复启动会暴露出来);
+以 convert 子命令运行时作为 soffice_convert_cmd 客户端: 连接实例端口后把输入复制到输出,
+输入内容包含 b"sleep" 时挂起, 用于模拟卡住的转换.
+"""
+import shutil
+import socket
+import sys
+import time
+
+
+def serve(args: list) -> None:
+    accept = next(arg for arg in args if arg.startswith("--accept="))
+    port = int(accept.split("port=", 1)[1].split(";", 1)[0])
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # 允许复用 TIME_WAIT 状态的端口, 但另一个进程仍在监听时 bind 依然失败
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", port))
+    server.listen()
+    while True:
+        connection, _ = server.accept()
+        connection.close()
+
+def convert(port: str, input_path: str, output_path: str) -> None:
+    with socket.create_connection(("127.0.0.1", int(port)), timeout=5):
+        pass
+    with open(input_path, "rb") as f:
+        if b"sleep" in f.read():
+            time.sleep(3600)
+    shutil.copyfile(input_path, output_path)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["convert"]:
+        convert(*sys.argv[2:5])
+    else:
+        serve(sys.argv[1:])
@@ -0,0 +1,74 @@
+import io
+import os
+import uuid
+
+import openpyxl
+
+from app.core.configs.settings import settings
+from app.utils.file import link_or_copy_file
+
+
+def convert_url(convert_type: str) -> str:
+    return f"{settings.api_prefix_v1}/file_manager/convert_file/{convert_type}"
+
+def xlsx_bytes(value: str) -> bytes:
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["key", value])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def convert_saved(client, convert_type: str, name: str, content: bytes) -> dict:
+    response = client.post(convert_url(convert_type), files={"file": (name, content)},
+                           data={"do_save": "true", "return_raw": "true"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def read_text(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_link_or_copy_file_same_or_existing_target(tmp_path):
+    src, other = tmp_path / "src.bin", tmp_path / "other.bin"
+    src.write_bytes(b"source")
+    other.write_bytes(b"other")
+    dst = tmp_path / "out" / "dst.bin"
+    link_or_copy_file(str(src), str(dst))
+    link_or_copy_file(str(src), str(dst))  # 已是同一文件
+    link_or_copy_file(str(dst), str(src))
+    assert dst.read_bytes() == b"source"
+    link_or_copy_file(str(other), str(dst))  # 已有其他文件时替换
+    assert dst.read_bytes() == b"other" and src.read_bytes() == b"source"
+
+
+def test_file_only_hit_after_saved_output_deleted(client):
+    # xlsx2csv 流式转换只把结果写到文件, 缓存条目只有磁盘层文件
+    content = xlsx_bytes(uuid.uuid4().hex)
+    first = convert_saved(client, "xlsx2csv", "deleted.xlsx", content)
+    assert first["extra"]["cache"] == "miss"
+    os.remove(first["data"]["file_path"])
+    second = convert_saved(client, "xlsx2csv", "deleted.xlsx", content)
+    assert second["extra"]["cache"] == "hit"
+    assert second["data"]["file_raw"] == first["data"]["file_raw"]
+    assert read_text(second["data"]["file_path"]) == first["data"]["file_raw"]
+
+
+def test_hit_does_not_return_output_overwritten_by_other_input(client):
+    # 同名输入在同一分钟内的输出路径相同, 转换 Y 会替换 X 的输出文件
+    x, y = xlsx_bytes(f"x-{uuid.uuid4().hex}"), xlsx_bytes(f"y-{uuid.uuid4().hex}")
+    first_x = convert_saved(client, "xlsx2csv", "same.xlsx", x)
+    convert_saved(client, "xlsx2csv", "same.xlsx", y)
+    second_x = convert_saved(client, "xlsx2csv", "same.xlsx", x)
+    assert second_x["extra"]["cache"] == "hit"
+    assert second_x["data"]["file_raw"] == first_x["data"]["file_raw"]
+    assert read_text(second_x["data"]["file_path"]) == first_x["data"]["file_raw"]
+
+
+def test_in_memory_hit_after_saved_output_deleted(client):
+    markdown = f"# {uuid.uuid4().hex}".encode()
+    first = convert_saved(client, "md2html", "memory.md", markdown)
+    os.remove(first["data"]["file_path"])
+    second = convert_saved(client, "md2html", "memory.md", markdown)
+    assert second["extra"]["cache"] == "hit"
+    assert read_text(second["data"]["file_path"]) == first["data"]["file_raw"]
@@ -0,0 +1,41 @@
+import asyncio
+import os
+
+from app.models.exception_model import ConverterCrashError
+from app.services.conversion_executor import ConversionExecutor
+
+
+def crash() -> None:
+    os._exit(1)
+
+def square(value: int) -> int:
+    return value * value
+
+
+class CountingExecutor(ConversionExecutor):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.pools = []
+
+    def start(self) -> None:
+        super().start()
+        if self._process_pool is not None and (not self.pools or self.pools[-1] is not self._process_pool):
+            self.pools.append(self._process_pool)
+
+
+def test_broken_pool_is_rebuilt_once_for_concurrent_failures():
+    executor = CountingExecutor(kind="process", max_workers=2)
+
+    async def main():
+        executor.start()
+        results = await asyncio.gather(*(executor.run_blocking(crash) for _ in range(4)), return_exceptions=True)
+        assert all(isinstance(result, ConverterCrashError) for result in results), results
+        # 重建后的进程池可以继续使用, 没有被后续失败的调用关掉
+        assert await asyncio.gather(*(executor.run_blocking(square, i) for i in range(4))) == [0, 1, 4, 9]
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert len(executor.pools) == 2, f"process pool rebuilt {len(executor.pools) - 1} times"
+
@@ -0,0 +1,59 @@
+import os
+import time
+import uuid
+
+from app.core.configs.settings import settings
+from app.services.job_manager import job_manager
+
+
+def run_job(client, convert_type: str, name: str, content: bytes) -> dict:
+    response = client.post(f"{settings.api_prefix_v1}/jobs/convert", params={"convert_type": convert_type},
+                           files={"file": (name, content)}, data={"return_raw": "true"})
+    assert response.status_code == 202, response.text
+    job_id = response.json()["job_id"]
+    for _ in range(100):
+        job = client.get(f"{settings.api_prefix_v1}/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done", job
+    return job["result"]
+
+def convert_saved(client, convert_type: str, name: str, content: bytes) -> dict:
+    response = client.post(f"{settings.api_prefix_v1}/file_manager/convert_file/{convert_type}",
+                           files={"file": (name, content)}, data={"do_save": "true", "return_raw": "true"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def purge_all_jobs(client) -> int:
+    return client.portal.call(job_manager.purge_expired, time.time() + 1)
+
+
+def test_job_cleanup_keeps_outputs_shared_through_the_cache(client):
+    # 同步请求先转换 (输出登记进缓存), 任务命中缓存时应写出自己的文件
+    shared_md = f"# shared {uuid.uuid4().hex}".encode()
+    request_result = convert_saved(client, "md2html", "shared.md", shared_md)
+    job_result = run_job(client, "md2html", "shared.md", shared_md)
+    assert job_result["extra"]["cache"] == "hit"
+    assert job_result["data"]["file_path"] != request_result["data"]["file_path"]
+
+    # 任务先转换 (未命中), 之后命中缓存的同步请求不能拿到任务的输出文件
+    job_md = f"# job {uuid.uuid4().hex}".encode()
+    first_job = run_job(client, "md2html", "job.md", job_md)
+    later_request = convert_saved(client, "md2html", "job.md", job_md)
+    assert later_request["extra"]["cache"] == "hit"
+    assert later_request["data"]["file_path"] != first_job["data"]["file_path"]
+
+    assert purge_all_jobs(client) >= 2
+    assert not os.path.exists(job_result["data"]["file_path"])
+    assert not os.path.exists(first_job["data"]["file_path"])
+    for result in (request_result, later_request):
+        assert os.path.exists(result["data"]["file_path"])
+    again = convert_saved(client, "md2html", "shared.md", shared_md)
+    assert again["extra"]["cache"] == "hit" and again["data"]["file_path"] == request_result["data"]["file_path"]
+
+
+def test_job_result_does_not_persist_large_inline_content(client, monkeypatch):
+    monkeypatch.setattr(settings, "job_result_inline_max", 16)
+    result = run_job(client, "md2html", "large.md", f"# {uuid.uuid4().hex}".encode())
+    assert result["data"]["file_raw"] == "" and result["data"]["file_url"]
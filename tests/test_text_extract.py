@@ -0,0 +1,27 @@
+import json
+
+from app.core.configs.settings import settings
+from app.services import text_extract
+from app.services.conversion_executor import conversion_executor
+from app.utils.text import chunk_text
+
+
+def test_extract_text_chunks_off_the_event_loop(client, monkeypatch):
+    # 断句须交给工作池执行, 不能在事件循环上同步处理整段文本
+    calls = []
+    run_blocking = conversion_executor.run_blocking
+
+    async def recording_run_blocking(func, *args, **kwargs):
+        calls.append(func)
+        return await run_blocking(func, *args, **kwargs)
+
+    monkeypatch.setattr(text_extract.conversion_executor, "run_blocking", recording_run_blocking)
+    text = "第一句话。第二句话！\n" * 50
+    response = client.post(f"{settings.api_prefix_v1}/file_manager/extract_text",
+                           files={"file": ("notes.txt", text.encode())}, data={"extra": json.dumps({"min_tokens": 5, "max_tokens": 40})})
+    assert response.status_code == 200, response.text
+    records = [json.loads(line) for line in response.text.splitlines()]
+    summary = records.pop()
+    assert summary["done"] and summary["code"] == 0, summary
+    assert chunk_text in calls
+    assert [record["text"] for record in records] == chunk_text(text, 5, 40)
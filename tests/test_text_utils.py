@@ -0,0 +1,27 @@
+import asyncio
+import base64
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils import text
+
+PNG = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==")
+
+
+def test_import_does_not_load_services_or_start_threads():
+    # utils 不能依赖 services 层, 导入时也不创建图片线程池
+    code = ("import sys, threading, app.utils.text as t; "
+            "assert 'app.services.engines' not in sys.modules; assert t._image_pool is None; "
+            "assert not [th for th in threading.enumerate() if th.name.startswith('image')]")
+    subprocess.run([sys.executable, "-c", code], check=True, env=os.environ.copy())
+
+def test_save_base64_images_uses_the_given_executor(tmp_path):
+    src = "data:image/png;base64," + base64.b64encode(PNG).decode()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="caller") as executor:
+        saved = asyncio.run(text.save_base64_images([src, src], str(tmp_path), executor=executor))
+    hash_name, save_path = saved[src]
+    assert save_path.startswith(str(tmp_path)) and hash_name in save_path
+    with open(save_path, "rb") as f:
+        assert f.read() == PNG